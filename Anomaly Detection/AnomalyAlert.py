@@ -1 +1,190 @@
-from AnomalyDetection import AnomalyDetection
\ No newline at end of file
+import json
+import os
+import socket
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from BaselineStore import BaselineStore, MEAN, VARIANCE, store_dir
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Pravah'))
+from segment_registry import REGISTRY_FILE, SEEDS_FILE, load_registry
+from sweep_replay import live_csv_sweeps
+
+live_file = os.path.join('Pravah', 'pravah_live_from_historical_segments.csv')
+registry_file = os.path.join('Pravah', REGISTRY_FILE)
+seeds_file = os.path.join('Pravah', SEEDS_FILE)
+alerts_file = os.path.join('Anomaly Detection', 'anomaly_alerts.jsonl')
+
+LATENCY_BUDGET_S = 1.0
+
+
+# ===================== SINKS =====================
+# A sink only needs publish(alerts), where alerts is a list of dicts.
+
+class FileSink:
+    """Append alerts as JSON lines."""
+
+    def __init__(self, path=alerts_file):
+        self.path = path
+
+    def publish(self, alerts):
+        with open(self.path, 'a') as f:
+            for alert in alerts:
+                f.write(json.dumps(alert) + '\n')
+
+
+class SocketSink:
+    """Send each batch of alerts as one JSON datagram to a local UDP port."""
+
+    def __init__(self, host='127.0.0.1', port=9870):
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def publish(self, alerts):
+        self.sock.sendto(json.dumps(alerts).encode('utf-8'), self.address)
+
+
+class CallbackSink:
+    def __init__(self, callback):
+        self.callback = callback
+
+    def publish(self, alerts):
+        self.callback(alerts)
+
+
+# ===================== ALERTING =====================
+
+class AnomalyAlert:
+    """
+    Streaming per-segment anomaly alerts over live sweeps.
+
+    State is a handful of flat arrays indexed like the BaselineStore segments
+    (EWMA speed, consecutive violations, active flag, cooldown deadline), so
+    memory does not grow with the number of sweeps. A segment raises an
+    alert once its smoothed speed has been below mean - enter_z * std for
+    `consecutive` sweeps, and only clears after it climbs back above
+    mean - exit_z * std. Re-raising is suppressed for `cooldown` seconds.
+    """
+
+    def __init__(self, store, sink, alpha=0.3, enter_z=None, exit_z=None,
+                 consecutive=3, cooldown=600, registry=None):
+        self.store = store
+        self.registry = registry
+        self.store_rows = None if registry is None else store.registry_rows(registry)
+        self.sink = sink
+        self.alpha = alpha
+        self.enter_z = store.z if enter_z is None else enter_z
+        self.exit_z = self.enter_z - 1.0 if exit_z is None else exit_z
+        self.consecutive = consecutive
+        self.cooldown = cooldown
+
+        n = len(store.segment_ids)
+        self.ewma = np.full(n, np.nan)
+        self.violations = np.zeros(n, dtype=np.int32)
+        self.active = np.zeros(n, dtype=bool)
+        self.cooldown_until = np.zeros(n)
+
+        self.latencies = deque(maxlen=1000)
+
+    def segment_indices(self, segment_ids):
+        if self.registry is not None:
+            r = self.registry.indices(segment_ids)
+            known = (r >= 0) & (r < len(self.store_rows))
+            return np.where(known, self.store_rows[np.where(known, r, 0)], -1)
+        index = self.store.segment_index
+        return np.fromiter((index.get(str(seg), -1) for seg in segment_ids),
+                           dtype=np.int64, count=len(segment_ids))
+
+    def process_sweep(self, segment_ids, speeds, timestamp, arrived=None):
+        """
+        Score one sweep and publish the alerts it raises or clears.
+
+        Args:
+            segment_ids: Segment IDs observed in the sweep.
+            speeds: Current speeds (km/h), aligned with segment_ids.
+            timestamp: datetime of the sweep; picks the weekday/hour baseline.
+            arrived: time.perf_counter() value when the sweep was received.
+                Defaults to now, i.e. only scoring time is measured.
+        """
+        if arrived is None:
+            arrived = time.perf_counter()
+
+        idx = self.segment_indices(segment_ids)
+        speeds = np.asarray(speeds, dtype=np.float64)
+        known = idx >= 0
+        idx, speeds = idx[known], speeds[known]
+
+        rows = self.store.array[idx, timestamp.weekday(), timestamp.hour]
+        mean = rows[:, MEAN]
+        std = np.sqrt(rows[:, VARIANCE])
+
+        prev = self.ewma[idx]
+        ewma = np.where(np.isnan(prev), speeds, self.alpha * speeds + (1 - self.alpha) * prev)
+        self.ewma[idx] = ewma
+
+        has_baseline = std > 0
+        z = np.zeros_like(ewma)
+        np.divide(ewma - mean, std, out=z, where=has_baseline)
+
+        violations = np.where(has_baseline & (z < -self.enter_z), self.violations[idx] + 1, 0)
+        self.violations[idx] = violations
+
+        now = timestamp.timestamp()
+        active = self.active[idx]
+        raised = ~active & (violations >= self.consecutive) & (now >= self.cooldown_until[idx])
+        cleared = active & (z > -self.exit_z)
+
+        self.active[idx[raised]] = True
+        self.active[idx[cleared]] = False
+        self.cooldown_until[idx[raised]] = now + self.cooldown
+
+        alerts = []
+        ts = timestamp.isoformat()
+        for kind, mask in (('anomaly', raised), ('recovered', cleared)):
+            for i in np.flatnonzero(mask):
+                alerts.append({
+                    'type': kind,
+                    'timestamp': ts,
+                    'segment_id': self.store.segment_ids[idx[i]],
+                    'speed': round(float(ewma[i]), 2),
+                    'baseline_mean': round(float(mean[i]), 2),
+                    'z': round(float(z[i]), 2),
+                })
+        if alerts:
+            self.sink.publish(alerts)
+
+        latency = time.perf_counter() - arrived
+        self.latencies.append(latency)
+        if latency > LATENCY_BUDGET_S:
+            print(f"⚠️  Sweep at {ts} took {latency:.3f}s (budget {LATENCY_BUDGET_S}s)")
+        return alerts
+
+    def latency_stats(self):
+        if not self.latencies:
+            return {}
+        lat = np.array(self.latencies)
+        return {'p50_ms': float(np.percentile(lat, 50) * 1000),
+                'p99_ms': float(np.percentile(lat, 99) * 1000),
+                'max_ms': float(lat.max() * 1000)}
+
+
+def sweeps_from_csv(file_path=live_file):
+    """Sweeps of the live logger CSV as (timestamp, segment_ids, current_speeds)."""
+    for timestamp, observations in live_csv_sweeps(file_path):
+        yield timestamp, [o['segment_id'] for o in observations], [o['current_speed'] for o in observations]
+
+
+if __name__ == "__main__":
+    store = BaselineStore.load(store_dir)
+    registry = load_registry(registry_file, seeds_file)
+    alerter = AnomalyAlert(store, FileSink(alerts_file), registry=registry)
+
+    n_alerts = 0
+    for timestamp, segment_ids, speeds in sweeps_from_csv(live_file):
+        n_alerts += len(alerter.process_sweep(segment_ids, speeds, timestamp))
+
+    print(f"Published {n_alerts} alerts to {alerts_file}")
+    print(f"Sweep latency: {alerter.latency_stats()}")
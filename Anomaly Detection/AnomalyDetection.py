@@ -2,16 +2,27 @@
 import numpy as np
 #from scipy.stats import multivariate_normal
 import csv
+from BaselineStore import day_index, hour_bucket
 
 class AnomalyDetection:
 
-    def __init__(self, dataframe):
+    def __init__(self, dataframe, baseline_store=None):
         self.time_set_name= dataframe['time_Set_name']
         self.speed_stddev = dataframe['speed_stddev']
         self.average_speed= dataframe['average_speed']
         self.segment_id= dataframe['segment_id']        
+        self.day = dataframe['day'] if 'day' in dataframe else None
+        self.baseline_store = baseline_store
 
     def estimate_gaussian_params(self): 
+        # Prefer the time-of-day baseline for this segment's weekday and hour
+        if self.baseline_store is not None and self.day is not None:
+            # Exports spell days inconsistently ('Wed', 'Thurs', 'fri'), so match by prefix
+            day = day_index({'day': str(self.day)})
+            params = None if day is None else \
+                self.baseline_store.gaussian_params(self.segment_id, day, hour_bucket(self.time_set_name))
+            if params is not None:
+                return params
         file_path= 'Anomaly Detection\Processed_CSV_Data.csv'
         with open (file_path, 'r') as csvfile :
             csvReader = csv.DictReader(csvfile)
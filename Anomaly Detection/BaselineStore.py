@@ -0,0 +1,251 @@
+import csv
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+
+from cvsProcessing import merge_stats
+
+folder_dir = os.path.join('Anomaly Detection', 'AnomalyDetectionTraining')
+store_dir = os.path.join('Anomaly Detection', 'baselines')
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+HOURS = 24
+
+# Last axis of the store array
+FIELDS = ['count', 'mean', 'm2', 'variance', 'lower', 'upper']
+COUNT, MEAN, M2, VARIANCE, LOWER, UPPER = range(len(FIELDS))
+
+ARRAY_FILE = 'baselines.npy'
+SEGMENTS_FILE = 'segments.csv'
+MANIFEST_FILE = 'manifest.json'
+
+
+def day_index(row):
+    """Weekday index (Monday=0) of an export row, from 'day' or 'date_range_name'."""
+    day = row.get('day') or row.get('date_range_name') or ''
+    prefix = day.strip()[:3].lower()
+    for i, name in enumerate(DAYS):
+        if name[:3].lower() == prefix:
+            return i
+    return None
+
+
+def hour_bucket(time_set_name):
+    """Start hour of a time set such as '17:15-17:30' or '9:00-10:00'."""
+    try:
+        return int(time_set_name.split('-')[0].split(':')[0]) % HOURS
+    except (ValueError, AttributeError):
+        return None
+
+
+def accumulate_file_by_hour(file_path):
+    """
+    Stream one export and return {(segment_id, day, hour): [count, mean, M2]}.
+
+    Same per-row treatment as cvsProcessing.accumulate_file, but the
+    statistics are split by weekday and hour bucket instead of pooled.
+    """
+    stats = {}
+    with open(file_path, 'r', newline='') as csvfile:
+        for row in csv.DictReader(csvfile):
+            if row['sample_size'] == '' or row['average_speed'] == '':
+                continue
+            n = float(row['sample_size'])
+            if n <= 0:
+                continue
+            day = day_index(row)
+            hour = hour_bucket(row['time_set_name'])
+            if day is None or hour is None:
+                continue
+            stddiv_speed = float(row['speed_stddev']) if row['speed_stddev'] != '' else 0.0
+            row_stats = [n, float(row['average_speed']), n * stddiv_speed * stddiv_speed]
+
+            key = (row['segment_id'], day, hour)
+            if key in stats:
+                merge_stats(stats[key], row_stats)
+            else:
+                stats[key] = row_stats
+    return stats
+
+
+class BaselineStore:
+    """
+    Per-(segment, weekday, hour) speed baselines backed by a memory-mapped array.
+
+    The array has shape (segments, len(DAYS), HOURS, len(FIELDS)). Alongside the
+    sufficient statistics it keeps precomputed lower/upper speed thresholds
+    (mean -/+ z * stddev), so live scoring is a dict lookup plus array indexing.
+    """
+
+    def __init__(self, directory=store_dir, z=3.0):
+        self.directory = directory
+        self.z = z
+        self._reset()
+
+    def _reset(self):
+        """Forget every folded export, keeping directory and z."""
+        self.segment_ids = []
+        self.segment_index = {}
+        self.files = {}
+        self.array = np.zeros((0, len(DAYS), HOURS, len(FIELDS)), dtype=np.float64)
+
+    @classmethod
+    def load(cls, directory=store_dir, mode='r'):
+        with open(os.path.join(directory, MANIFEST_FILE), 'r') as f:
+            manifest = json.load(f)
+        store = cls(directory, z=manifest['z'])
+        store.files = manifest['files']
+        with open(os.path.join(directory, SEGMENTS_FILE), 'r', newline='') as f:
+            store.segment_ids = [row['segment_id'] for row in csv.DictReader(f)]
+        store.segment_index = {seg: i for i, seg in enumerate(store.segment_ids)}
+        store.array = np.load(os.path.join(directory, ARRAY_FILE), mmap_mode=mode)
+        return store
+
+    @classmethod
+    def open_or_create(cls, directory=store_dir, z=3.0):
+        if os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+            return cls.load(directory, mode='r+')
+        return cls(directory, z=z)
+
+    # ---------------- building ----------------
+
+    def pending_files(self, folder_dir):
+        """Exports in folder_dir that are new or changed since the last update."""
+        pending = []
+        for file_dir in sorted(os.listdir(folder_dir)):
+            if not file_dir.endswith('.csv'):
+                continue
+            file_path = os.path.join(folder_dir, file_dir)
+            st = os.stat(file_path)
+            if self.files.get(file_dir) != [st.st_size, st.st_mtime]:
+                pending.append(file_path)
+        return pending
+
+    def update(self, folder_dir=folder_dir, workers=None):
+        """
+        Fold new or changed exports into the store and rewrite thresholds.
+
+        Only files that are not yet in the manifest are read, so adding a new
+        hourly export costs one pass over that file. A file whose size or
+        mtime changed, or that is no longer in folder_dir, triggers a full
+        rebuild, since its old contribution cannot be subtracted back out.
+        """
+        pending = self.pending_files(folder_dir)
+        removed = set(self.files) - set(os.listdir(folder_dir))
+        if removed or any(os.path.basename(p) in self.files for p in pending):
+            self._reset()
+            pending = self.pending_files(folder_dir)
+        if not pending and not removed:
+            return 0
+
+        workers = min(workers or os.cpu_count() or 1, len(pending))
+        if workers <= 1:
+            partials = [accumulate_file_by_hour(path) for path in pending]
+        else:
+            with Pool(processes=workers) as pool:
+                partials = pool.map(accumulate_file_by_hour, pending)
+
+        new_stats = {}
+        for partial in partials:
+            for key, key_stats in partial.items():
+                if key in new_stats:
+                    merge_stats(new_stats[key], key_stats)
+                else:
+                    new_stats[key] = key_stats
+        self._merge(new_stats)
+
+        for file_path in pending:
+            st = os.stat(file_path)
+            self.files[os.path.basename(file_path)] = [st.st_size, st.st_mtime]
+        self.save()
+        return len(pending)
+
+    def _merge(self, new_stats):
+        for segment_id, _, _ in new_stats:
+            if segment_id not in self.segment_index:
+                self.segment_index[segment_id] = len(self.segment_ids)
+                self.segment_ids.append(segment_id)
+
+        array = np.zeros((len(self.segment_ids), len(DAYS), HOURS, len(FIELDS)), dtype=np.float64)
+        array[:len(self.array)] = self.array
+        self.array = array
+
+        keys = list(new_stats)
+        seg = np.fromiter((self.segment_index[k[0]] for k in keys), dtype=np.int64, count=len(keys))
+        day = np.fromiter((k[1] for k in keys), dtype=np.int64, count=len(keys))
+        hour = np.fromiter((k[2] for k in keys), dtype=np.int64, count=len(keys))
+        b = np.array([new_stats[k] for k in keys], dtype=np.float64).reshape(-1, 3)
+
+        # Chan's merge of the stored (count, mean, M2) with the new batch
+        a = array[seg, day, hour, :3]
+        n = a[:, 0] + b[:, 0]
+        delta = b[:, 1] - a[:, 1]
+        mean = a[:, 1] + delta * b[:, 0] / n
+        m2 = a[:, 2] + b[:, 2] + delta * delta * a[:, 0] * b[:, 0] / n
+        array[seg, day, hour, COUNT] = n
+        array[seg, day, hour, MEAN] = mean
+        array[seg, day, hour, M2] = m2
+        self._thresholds()
+
+    def _thresholds(self):
+        array = self.array
+        count = array[..., COUNT]
+        variance = np.divide(array[..., M2], count, out=np.zeros_like(count), where=count > 0)
+        std = np.sqrt(variance)
+        array[..., VARIANCE] = variance
+        array[..., LOWER] = np.where(count > 0, array[..., MEAN] - self.z * std, np.nan)
+        array[..., UPPER] = np.where(count > 0, array[..., MEAN] + self.z * std, np.nan)
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        array_path = os.path.join(self.directory, ARRAY_FILE)
+        out = np.lib.format.open_memmap(array_path + '.tmp', mode='w+', dtype=np.float64,
+                                        shape=self.array.shape)
+        out[:] = self.array
+        out.flush()
+        del out
+        os.replace(array_path + '.tmp', array_path)
+        self.array = np.load(array_path, mmap_mode='r+')
+
+        with open(os.path.join(self.directory, SEGMENTS_FILE), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['segment_id'])
+            writer.writerows([seg] for seg in self.segment_ids)
+        with open(os.path.join(self.directory, MANIFEST_FILE), 'w') as f:
+            json.dump({'z': self.z, 'days': DAYS, 'hours': HOURS, 'fields': FIELDS,
+                       'files': self.files}, f, indent=2)
+
+    # ---------------- lookup ----------------
+
+    def lookup(self, segment_id, day, hour):
+        """Baseline row (see FIELDS) for one segment, or None if unseen."""
+        i = self.segment_index.get(str(segment_id))
+        if i is None:
+            return None
+        return self.array[i, day, hour]
+
+    def gaussian_params(self, segment_id, day, hour):
+        row = self.lookup(segment_id, day, hour)
+        if row is None or row[COUNT] == 0:
+            return None
+        return row[MEAN], row[VARIANCE]
+
+    def registry_rows(self, registry):
+        """Store row for every index of a SegmentRegistry (-1 where the store has none)."""
+        rows = np.full(len(registry), -1, dtype=np.int64)
+        idx = registry.indices(self.segment_ids)
+        rows[idx[idx >= 0]] = np.flatnonzero(idx >= 0)
+        return rows
+
+    def thresholds(self, segment_idx, day, hour):
+        """Vectorized (lower, upper) thresholds for an array of store indices."""
+        rows = self.array[segment_idx, day, hour]
+        return rows[:, LOWER], rows[:, UPPER]
+
+
+if __name__ == "__main__":
+    store = BaselineStore.open_or_create(store_dir)
+    updated = store.update(folder_dir)
+    print(f"Folded {updated} new export(s); {len(store.segment_ids)} segments in {store_dir}")
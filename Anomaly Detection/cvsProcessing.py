@@ -1,80 +1,110 @@
 import csv
 import os
-import math
-
-folder_dir='Anomaly Detection\AnomalyDetectionTraining'
-dir_list = os.listdir(folder_dir)
-data = {}
-data_headings = ['segment_id','average_speed', 'speed_stddev', 'sample_size']
-for file_dir in dir_list:
-    fields= []
-    file_path=os.path.join(folder_dir, file_dir)
-    with open (file_path, 'r') as csvfile :
+from multiprocessing import Pool
+
+folder_dir = os.path.join('Anomaly Detection', 'AnomalyDetectionTraining')
+file_name = os.path.join('Anomaly Detection', 'Processed_CSV_Data.csv')
+
+finald_csv_fields = ["segment_id", "avg_speed", "variance"]
+
+# Per-segment sufficient statistics are kept as [count, mean, M2], where
+# count is the summed sample_size and M2 the summed squared deviation from
+# the mean. Each CSV row is already an aggregate of sample_size probes with
+# its own mean and (population) stddev, so a row enters as
+# [n, average_speed, n * speed_stddev ** 2] and is folded in with Chan's
+# parallel update. Partial results from different workers merge the same way.
+
+
+def merge_stats(a, b):
+    """Fold the [count, mean, M2] triple b into a (in place) and return a."""
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    n = n_a + n_b
+    if n == 0:
+        return a
+    delta = mean_b - mean_a
+    a[0] = n
+    a[1] = mean_a + delta * n_b / n
+    a[2] = m2_a + m2_b + delta * delta * n_a * n_b / n
+    return a
+
+
+def accumulate_file(file_path):
+    """Stream one training CSV and return {segment_id: [count, mean, M2]}."""
+    stats = {}
+    with open(file_path, 'r', newline='') as csvfile:
         csvReader = csv.DictReader(csvfile)
-        while True:
-            for row in csvReader:
-                segment_id = row['segment_id']
-                avg_speed = row['average_speed']
-                stddiv_speed = row['speed_stddev']
-                sample_size = row['sample_size']
-                if segment_id not in data:
-                    data[segment_id]={}
-                    data[segment_id]['average_speed']= {}
-                    data[segment_id]['speed_stddev']= {}
-                    data[segment_id]['sample_size']= {}
-                    data[segment_id]['average_speed']= [avg_speed]
-                    data[segment_id]['speed_stddev']= [stddiv_speed]
-                    data[segment_id]['sample_size']= [sample_size]
-                else:
-                    data[segment_id]['average_speed'].append(avg_speed)
-                    data[segment_id]['speed_stddev'].append(stddiv_speed)
-                    data[segment_id]['sample_size'].append(sample_size)
-            break
-
-final_data= []
-numerator=0
-denominator=0
-for key in data.keys():
-    data_dict= data[key]
-    avg_speed = data_dict['average_speed']
-    stddiv_speed = data_dict['speed_stddev']
-    sample_size = data_dict['sample_size']
-    n= len(sample_size)
-    sum_avg_speed=0
-    for speed in avg_speed:
-        sum_avg_speed+=float(speed)
-    overall_mean= sum_avg_speed/n
-    for i in range(n):
-        if stddiv_speed[i]=='':
-            stddiv_speed[i]=0
-        denominator+=float(sample_size[i])
-        numerator+= float(sample_size[i])*((float(stddiv_speed[i])**2)+((float(avg_speed[i])-(overall_mean))**2))
-        
-    overall_variance= numerator/denominator
-    final_data.append({'segment_id':key, 'avg_speed': overall_mean, 'variance': overall_variance})
-
-finald_csv_fields= ["segment_id", "avg_speed", "variance"]
-
-file_name ='Anomaly Detection/Processed_CSV_Data.csv'
-
-
-with open(file_name, 'w', newline='') as csvfile:
-    writer = csv.DictWriter(csvfile, fieldnames=finald_csv_fields)
-    writer.writeheader()
-    writer.writerows(final_data)
-
-
-
-
-
-
-
-   
-
-
-                    
-
-            
-
-
-
+        for row in csvReader:
+            sample_size = row['sample_size']
+            avg_speed = row['average_speed']
+            if sample_size == '' or avg_speed == '':
+                continue
+            n = float(sample_size)
+            if n <= 0:
+                continue
+            stddiv_speed = row['speed_stddev']
+            stddiv_speed = float(stddiv_speed) if stddiv_speed != '' else 0.0
+            row_stats = [n, float(avg_speed), n * stddiv_speed * stddiv_speed]
+
+            segment_id = row['segment_id']
+            if segment_id in stats:
+                merge_stats(stats[segment_id], row_stats)
+            else:
+                stats[segment_id] = row_stats
+    return stats
+
+
+def reduce_stats(partials):
+    """Merge the per-file results of accumulate_file into one dict."""
+    data = {}
+    for partial in partials:
+        for segment_id, seg_stats in partial.items():
+            if segment_id in data:
+                merge_stats(data[segment_id], seg_stats)
+            else:
+                data[segment_id] = seg_stats
+    return data
+
+
+def train(folder_dir, workers=None):
+    """
+    One-pass pooled mean/variance per segment over every CSV in folder_dir.
+
+    Files are streamed in parallel by a process pool and the partial
+    statistics are reduced as they come back, so memory stays proportional
+    to the number of segments rather than the number of rows.
+    """
+    file_paths = [
+        os.path.join(folder_dir, file_dir)
+        for file_dir in sorted(os.listdir(folder_dir))
+        if file_dir.endswith('.csv')
+    ]
+    if not file_paths:
+        return {}
+
+    workers = min(workers or os.cpu_count() or 1, len(file_paths))
+    if workers == 1:
+        return reduce_stats(accumulate_file(path) for path in file_paths)
+
+    with Pool(processes=workers) as pool:
+        # imap keeps file order, so rows and merged floats match the serial run
+        return reduce_stats(pool.imap(accumulate_file, file_paths))
+
+
+def to_rows(data):
+    final_data = []
+    for segment_id, (n, mean, m2) in data.items():
+        final_data.append({'segment_id': segment_id, 'avg_speed': mean, 'variance': m2 / n})
+    return final_data
+
+
+if __name__ == "__main__":
+    data = train(folder_dir)
+    final_data = to_rows(data)
+
+    with open(file_name, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=finald_csv_fields)
+        writer.writeheader()
+        writer.writerows(final_data)
+
+    print(f"Processed {len(final_data)} segments into {file_name}")
@@ -0,0 +1,34 @@
+import csv
+
+INPUT = "pravah_monday_full.csv"
+OUTPUT = "pravah_seed_points.csv"
+
+
+def midpoint(wkt):
+    coords = wkt.replace("LINESTRING(", "").replace(")", "").split(",")
+    mid = coords[len(coords) // 2]
+    lon, lat = mid.strip().split(" ")
+    return lat, lon
+
+
+def extract_seed_points(input_csv=INPUT, output_csv=OUTPUT):
+    """One seed point (middle vertex of the geometry) per segment of an export; returns the seeds."""
+    seeds = {}
+    with open(input_csv, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            seg = row["segment_id"]
+            if seg not in seeds:
+                seeds[seg] = midpoint(row["geometry_wkt"])
+
+    with open(output_csv, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["segment_id", "lat", "lon"])
+        for seg, (lat, lon) in seeds.items():
+            writer.writerow([seg, lat, lon])
+    return seeds
+
+
+if __name__ == "__main__":
+    extract_seed_points()
+    print("Created:", OUTPUT)
@@ -0,0 +1,302 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from extract_pravah_seed_points import midpoint
+
+# ===================== CONFIG =====================
+
+EXPORT_CSV = "pravah_monday_full.csv"
+JUNCTIONS_CSV = "junctions.csv"
+ASSIGNMENT_CSV = "seed_points_with_junctions.csv"
+ENDPOINTS_CSV = "junction_endpoints.csv"
+
+EPS_M = 25.0
+MIN_SAMPLES = 1
+
+METRES_PER_DEG_LAT = 111320.0
+START, END = 0, 1
+
+
+def segment_endpoints(export_df):
+    """One row per segment with its first/last vertex and seed point, from geometry_wkt."""
+    segs = export_df.drop_duplicates("segment_id")[["segment_id", "geometry_wkt"]]
+    coords = segs["geometry_wkt"].str.replace("LINESTRING(", "", regex=False).str.rstrip(")")
+    first = coords.str.split(",", n=1).str[0].str.strip().str.split(" ", expand=True).astype(float)
+    last = coords.str.rsplit(",", n=1).str[-1].str.strip().str.split(" ", expand=True).astype(float)
+    seeds = [midpoint(w) for w in segs["geometry_wkt"]]
+    return pd.DataFrame({
+        "segment_id": segs["segment_id"].astype(str).to_numpy(),
+        "start_lon": first[0].to_numpy(), "start_lat": first[1].to_numpy(),
+        "end_lon": last[0].to_numpy(), "end_lat": last[1].to_numpy(),
+        "lat": [float(lat) for lat, _ in seeds], "lon": [float(lon) for _, lon in seeds],
+    })
+
+
+class JunctionIndex:
+    """
+    Grid-hashed DBSCAN over segment endpoints, with incremental inserts.
+
+    Endpoints are projected to local metres and bucketed into eps-sized
+    grid cells, so the eps-neighbours of a point are found by a binary
+    search over the sorted cell keys of the 3x3 cells around it: near-linear
+    in the number of endpoints instead of all pairs. Core points (at least
+    min_samples endpoints within eps, counting themselves) are joined with a
+    vectorized union-find; other endpoints attach to a core neighbour or are
+    left as noise (-1).
+
+    add() only queries the new endpoints and the ones they turned into core
+    points, and junction ids are stable: a cluster keeps the smallest id of
+    the junctions it absorbed, and only clusters without any known endpoint
+    get a new id.
+    """
+
+    def __init__(self, eps_m=EPS_M, min_samples=MIN_SAMPLES, origin=None):
+        self.eps = eps_m
+        self.min_samples = min_samples
+        self.origin = origin
+        self.segment_ids = np.empty(0, dtype=object)
+        self.known = set()
+        self.end = np.empty(0, dtype=np.int8)
+        self.lat = np.empty(0)
+        self.lon = np.empty(0)
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+        self.parent = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.junction = np.empty(0, dtype=np.int64)
+        self.next_junction = 0
+
+    # ---------------- geometry ----------------
+
+    def _project(self, lat, lon):
+        if self.origin is None:
+            self.origin = (float(np.mean(lat)), float(np.mean(lon)))
+        lat0, lon0 = self.origin
+        x = (lon - lon0) * METRES_PER_DEG_LAT * np.cos(np.radians(lat0))
+        y = (lat - lat0) * METRES_PER_DEG_LAT
+        return x, y
+
+    def _cells(self, x, y):
+        return np.floor(x / self.eps).astype(np.int64), np.floor(y / self.eps).astype(np.int64)
+
+    def _neighbours(self, query):
+        """(i, j) for every query point i and every other point j within eps."""
+        cx, cy = self._cells(self.x, self.y)
+        key = (cx << 32) + cy
+        order = np.argsort(key, kind="stable")
+        sorted_key = key[order]
+
+        pairs_i, pairs_j = [], []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                qkey = ((cx[query] + dx) << 32) + (cy[query] + dy)
+                lo = np.searchsorted(sorted_key, qkey, side="left")
+                n = np.searchsorted(sorted_key, qkey, side="right") - lo
+                if not n.any():
+                    continue
+                i = np.repeat(query, n)
+                j = order[np.repeat(lo, n) + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)]
+                close = (self.x[i] - self.x[j]) ** 2 + (self.y[i] - self.y[j]) ** 2 <= self.eps ** 2
+                close &= i != j
+                pairs_i.append(i[close])
+                pairs_j.append(j[close])
+        if not pairs_i:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(pairs_i), np.concatenate(pairs_j)
+
+    # ---------------- union-find ----------------
+
+    def _find(self, nodes):
+        roots = self.parent[nodes]
+        while True:
+            up = self.parent[roots]
+            if np.array_equal(up, roots):
+                return roots
+            roots = up
+
+    def _union(self, a, b):
+        while len(a):
+            ra, rb = self._find(a), self._find(b)
+            differ = ra != rb
+            if not differ.any():
+                break
+            ra, rb = ra[differ], rb[differ]
+            # Point the larger root at the smaller; clashing writes are settled next round
+            self.parent[np.maximum(ra, rb)] = np.minimum(ra, rb)
+            a, b = a[differ], b[differ]
+        self.parent = self._find(np.arange(len(self.parent)))
+
+    # ---------------- building ----------------
+
+    def add(self, segment_ids, start_lat, start_lon, end_lat, end_lon):
+        """Insert the endpoints of new segments (already known IDs are skipped)."""
+        segment_ids = np.asarray(segment_ids, dtype=str).astype(object)
+        fresh = np.array([s not in self.known for s in segment_ids], dtype=bool)
+        if not fresh.any():
+            return 0
+        segment_ids = segment_ids[fresh]
+        self.known.update(segment_ids)
+        lat = np.concatenate([np.asarray(start_lat, dtype=float)[fresh], np.asarray(end_lat, dtype=float)[fresh]])
+        lon = np.concatenate([np.asarray(start_lon, dtype=float)[fresh], np.asarray(end_lon, dtype=float)[fresh]])
+        x, y = self._project(lat, lon)
+
+        n_old, n_new = len(self.x), len(lat)
+        self.segment_ids = np.concatenate([self.segment_ids, np.tile(segment_ids, 2)])
+        self.end = np.concatenate([self.end, np.repeat(np.int8([START, END]), len(segment_ids))])
+        self.lat = np.concatenate([self.lat, lat])
+        self.lon = np.concatenate([self.lon, lon])
+        self.x = np.concatenate([self.x, x])
+        self.y = np.concatenate([self.y, y])
+        self.parent = np.concatenate([self.parent, np.arange(n_old, n_old + n_new)])
+        self.junction = np.concatenate([self.junction, np.full(n_new, -1, dtype=np.int64)])
+
+        new = np.arange(n_old, n_old + n_new)
+        was_core = self.counts >= self.min_samples
+        i, j = self._neighbours(new)
+        # Neighbour counts include the point itself; old points gain one per new neighbour
+        self.counts = np.concatenate([self.counts, np.ones(n_new, dtype=np.int64)])
+        np.add.at(self.counts, i, 1)
+        old_j = j[j < n_old]
+        np.add.at(self.counts, old_j, 1)
+
+        core = self.counts >= self.min_samples
+        promoted = np.flatnonzero(~np.concatenate([was_core, np.zeros(n_new, dtype=bool)]) & core)
+        promoted = promoted[promoted < n_old]
+        if len(promoted):
+            pi, pj = self._neighbours(promoted)
+            i, j = np.concatenate([i, pi]), np.concatenate([j, pj])
+        linked = core[i] & core[j]
+        self._union(i[linked], j[linked])
+        self._assign_junctions()
+        return int(fresh.sum())
+
+    def _assign_junctions(self):
+        """Stable junction number per endpoint (-1 for noise)."""
+        n = len(self.x)
+        core = self.counts >= self.min_samples
+        root = self.parent.copy()
+
+        # Border points take the cluster of any core neighbour
+        border = np.flatnonzero(~core)
+        if len(border):
+            bi, bj = self._neighbours(border)
+            ok = core[bj]
+            root[border] = -1
+            root[bi[ok]] = self.parent[bj[ok]]
+
+        clustered = root >= 0
+        sentinel = np.iinfo(np.int64).max
+        known = np.full(n, sentinel)
+        had = clustered & (self.junction >= 0)
+        np.minimum.at(known, root[had], self.junction[had])
+
+        members = root[clustered]
+        unnamed = np.unique(members[known[members] == sentinel])
+        known[unnamed] = self.next_junction + np.arange(len(unnamed))
+        self.next_junction += len(unnamed)
+
+        self.junction = np.where(clustered, known[np.maximum(root, 0)], -1)
+
+    # ---------------- output ----------------
+
+    def junctions(self):
+        """junction_id, centroid lat/lon and number of endpoints per junction."""
+        ok = self.junction >= 0
+        df = pd.DataFrame({"junction": self.junction[ok], "lat": self.lat[ok], "lon": self.lon[ok]})
+        table = df.groupby("junction").agg(lat=("lat", "mean"), lon=("lon", "mean"),
+                                           endpoints=("lat", "size")).reset_index()
+        table.insert(0, "junction_id", "J" + table["junction"].astype(str))
+        return table.drop(columns="junction")
+
+    def endpoints(self):
+        return pd.DataFrame({
+            "segment_id": self.segment_ids, "end": np.where(self.end == START, "start", "end"),
+            "lat": self.lat, "lon": self.lon,
+            "junction_id": np.where(self.junction >= 0, "J" + self.junction.astype(str), ""),
+        })
+
+    def assignment(self, seeds):
+        """
+        Segment -> junction table in the seed_points_with_junctions layout.
+
+        junction_cluster/junction_id are the junction the segment flows into
+        (its end point); from_junction is where it starts.
+        """
+        ends = pd.DataFrame({"segment_id": self.segment_ids, "end": self.end, "junction": self.junction})
+        wide = ends.pivot_table(index="segment_id", columns="end", values="junction", aggfunc="first")
+        wide = wide.rename(columns={START: "from", END: "to"}).reset_index()
+        out = seeds[["segment_id", "lat", "lon"]].astype({"segment_id": str}).merge(wide, on="segment_id",
+                                                                                   how="left")
+        to = out["to"].fillna(-1).astype(np.int64)
+        frm = out["from"].fillna(-1).astype(np.int64)
+        out["junction_cluster"] = to
+        out["junction_id"] = np.where(to >= 0, "J" + to.astype(str), "")
+        out["from_junction_id"] = np.where(frm >= 0, "J" + frm.astype(str), "")
+        return out.drop(columns=["from", "to"])
+
+    def junction_mapping(self):
+        """{junction_id: {'upstream': [segment ids ending there], 'downstream': [segment ids starting there]}}"""
+        mapping = {}
+        for seg, end, junction in zip(self.segment_ids, self.end, self.junction):
+            if junction < 0:
+                continue
+            side = "upstream" if end == END else "downstream"
+            mapping.setdefault(f"J{junction}", {"upstream": [], "downstream": []})[side].append(seg)
+        return mapping
+
+    # ---------------- persistence ----------------
+
+    @classmethod
+    def from_endpoints(cls, endpoints, eps_m=EPS_M, min_samples=MIN_SAMPLES):
+        """
+        Rebuild an index from a saved endpoints table, keeping its junction ids.
+
+        Clustering is recomputed (it is near-linear), then every cluster takes
+        the smallest saved id among its endpoints.
+        """
+        index = cls(eps_m, min_samples)
+        starts = endpoints[endpoints["end"] == "start"].set_index("segment_id")
+        stops = endpoints[endpoints["end"] == "end"].set_index("segment_id").loc[starts.index]
+        index.add(starts.index.to_numpy(), starts["lat"], starts["lon"], stops["lat"], stops["lon"])
+        saved = pd.concat([starts["junction_id"], stops["junction_id"]]).fillna("").astype(str)
+        saved = saved.str.lstrip("J").replace("", "-1").astype(np.int64).to_numpy()
+        index.junction = np.full(len(saved), -1, dtype=np.int64)
+        index.next_junction = int(saved.max()) + 1 if len(saved) else 0
+        # Same order as add(): all starts, then all ends
+        index.junction[:] = saved
+        index._assign_junctions()
+        return index
+
+
+def discover_junctions(export_csv=EXPORT_CSV, out_dir=".", eps_m=EPS_M, min_samples=MIN_SAMPLES):
+    """
+    Cluster the endpoints of every segment in an export into junctions.
+
+    When out_dir already holds an endpoints table from an earlier run, only
+    segments not seen before are added and existing junction ids are kept.
+    Writes junctions.csv, seed_points_with_junctions.csv and the endpoints
+    table; returns the index.
+    """
+    segments = segment_endpoints(pd.read_csv(export_csv, usecols=["segment_id", "geometry_wkt"],
+                                             dtype={"segment_id": str}))
+    endpoints_path = os.path.join(out_dir, ENDPOINTS_CSV)
+    if os.path.exists(endpoints_path):
+        index = JunctionIndex.from_endpoints(pd.read_csv(endpoints_path, dtype={"segment_id": str},
+                                                         keep_default_na=False), eps_m, min_samples)
+    else:
+        index = JunctionIndex(eps_m, min_samples)
+    added = index.add(segments["segment_id"], segments["start_lat"], segments["start_lon"],
+                      segments["end_lat"], segments["end_lon"])
+
+    junctions = index.junctions()
+    junctions[["junction_id", "lat", "lon"]].to_csv(os.path.join(out_dir, JUNCTIONS_CSV), index=False)
+    index.assignment(segments).to_csv(os.path.join(out_dir, ASSIGNMENT_CSV), index=False)
+    index.endpoints().to_csv(endpoints_path, index=False)
+    print(f"✅ {added} new segments; {len(junctions)} junctions over {len(index.segment_ids) // 2} segments")
+    return index
+
+
+if __name__ == "__main__":
+    discover_junctions(EXPORT_CSV)
@@ -71,14 +71,15 @@ def analyze_junction_flow(file_path, junction_lat, junction_lon, threshold_meter
     }
 
 # --- USAGE EXAMPLE ---
-# Create a dummy CSV for testing
-# (You can skip this block if you use your actual file)
-data = output_csv_file("pravah_seed_points.csv")
-# Segment 1: Ends at 12.91, 77.61 (Upstream)
-# Segment 2: Starts at 12.91, 77.61 (Downstream)
-# Segment 3: Starts at 12.91, 77.61 (Downstream)
-pd.DataFrame(data).to_csv('traffic_data.csv', index=False)
+if __name__ == "__main__":
+    # Create a dummy CSV for testing
+    # (You can skip this block if you use your actual file)
+    data = output_csv_file("pravah_seed_points.csv")
+    # Segment 1: Ends at 12.91, 77.61 (Upstream)
+    # Segment 2: Starts at 12.91, 77.61 (Downstream)
+    # Segment 3: Starts at 12.91, 77.61 (Downstream)
+    pd.DataFrame(data).to_csv('traffic_data.csv', index=False)
 
-# Run the function
-# We use 12.91, 77.61 as our target junction
-results = analyze_junction_flow('traffic_data.csv', 28.628180, 77.246868)
\ No newline at end of file
+    # Run the function
+    # We use 12.91, 77.61 as our target junction
+    results = analyze_junction_flow('traffic_data.csv', 28.628180, 77.246868)
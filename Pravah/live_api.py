@@ -0,0 +1,288 @@
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import struct
+import sys
+import time
+
+import numpy as np
+
+from congestion_ratio_finder import congestion_ratio
+from pravah_live_logger import OUT, SEEDS_FILE, LivePoller, load_seeds
+from sweep_replay import SweepReplay
+
+# ===================== CONFIG =====================
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+# Same thresholds as map_related_file_generator
+ANOMALY_RATIO = 0.4
+CONGESTION_RATIO = 0.6
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+CLIENT_SEND_TIMEOUT_S = 5.0
+
+
+# ===================== SNAPSHOTS =====================
+
+def build_snapshot(timestamp, observations):
+    """Per-segment congestion and city stats for one sweep, in the data.js shape."""
+    current = np.array([o["current_speed"] for o in observations], dtype=float)
+    free = np.array([o["free_flow_speed"] for o in observations], dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.nan_to_num(congestion_ratio(current, free))
+    relative = 1 - ratio
+
+    segments = {}
+    for o, c, f, r, rel in zip(observations, current, free, ratio, relative):
+        segments[str(o["segment_id"])] = {
+            "id": str(o["segment_id"]),
+            "coords": [[float(o["lon"]), float(o["lat"])]],
+            "avgSpeed": round(float(c), 2),
+            "freeFlow": round(float(f), 2),
+            "ratio": round(float(r), 4),
+            "anomaly": bool(rel < ANOMALY_RATIO),
+            "congestion": bool(rel < CONGESTION_RATIO),
+            "closed": bool(o.get("road_closure", False)),
+        }
+    n = len(segments)
+    stats = {
+        "timestamp": timestamp.isoformat(),
+        "avgSpeed": round(float(current.mean()), 2) if n else 0.0,
+        "anomalyCount": sum(s["anomaly"] for s in segments.values()),
+        "congestionCount": sum(s["congestion"] for s in segments.values()),
+        "totalSegments": n,
+    }
+    return segments, stats
+
+
+class Resource:
+    """One precomputed response body: raw, gzipped and its ETag."""
+
+    def __init__(self, body, content_type="application/json"):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=6)
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.content_type = content_type
+
+
+def _json(value):
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+class SnapshotCache:
+    """
+    Everything the API serves, rebuilt once per sweep.
+
+    update() turns a sweep into finished response bodies (plain + gzip +
+    ETag) for every endpoint, and into one WebSocket diff frame holding only
+    the segments that changed since the previous sweep. Requests then only
+    pick a prebuilt body, so serving cost does not grow with the number of
+    dashboard clients.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.segments = {}
+        self.stats = {}
+        self.resources = {}
+        self.full_frame = None
+        self.diff_frame = None
+        self.build_s = 0.0
+
+    def update(self, timestamp, observations):
+        start = time.perf_counter()
+        segments, stats = build_snapshot(timestamp, observations)
+        changed = {k: v for k, v in segments.items() if self.segments.get(k) != v}
+        removed = [k for k in self.segments if k not in segments]
+        self.version += 1
+        self.segments, self.stats = segments, stats
+
+        seg_list = list(segments.values())
+        anomalies = [s for s in seg_list if s["anomaly"]]
+        self.resources = {
+            "/api/segments": Resource(_json({"version": self.version, "segments": seg_list})),
+            "/api/anomalies": Resource(_json({"version": self.version, "segments": anomalies})),
+            "/api/stats": Resource(_json({"version": self.version, **stats})),
+            "/data.js": Resource(
+                b"// AUTO-GENERATED FILE \xe2\x80\x94 served live by live_api.py\n"
+                b"export const segments = " + _json(seg_list) + b";\n"
+                b"export const anomalySegments = segments.filter(s => s.anomaly);\n"
+                b"export const congestedSegments = segments.filter(s => s.congestion);\n"
+                b"export const cityStats = " + _json(stats) + b";\n",
+                content_type="application/javascript"),
+        }
+        self.full_frame = ws_frame(_json({"type": "snapshot", "version": self.version, "stats": stats,
+                                          "segments": seg_list}))
+        self.diff_frame = ws_frame(_json({"type": "diff", "version": self.version, "stats": stats,
+                                          "changed": list(changed.values()), "removed": removed}))
+        self.build_s = time.perf_counter() - start
+
+
+# ===================== WEBSOCKET =====================
+
+def ws_frame(payload, opcode=0x1):
+    """A single unmasked server frame."""
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return header + payload
+
+
+async def ws_read_frame(reader):
+    """(opcode, payload) of the next client frame; clients always mask."""
+    b1, b2 = await reader.readexactly(2)
+    n = b2 & 0x7F
+    if n == 126:
+        n = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif n == 127:
+        n = struct.unpack("!Q", await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if b2 & 0x80 else b"\0\0\0\0"
+    data = await reader.readexactly(n)
+    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+    return b1 & 0x0F, payload
+
+
+# ===================== SERVER =====================
+
+class LiveApi:
+    """
+    Asyncio HTTP + WebSocket server over a sweep source.
+
+    GET /api/segments, /api/anomalies, /api/stats and /data.js return the
+    current snapshot, with If-None-Match -> 304 and gzip when accepted.
+    /ws upgrades to a WebSocket that gets the full snapshot on connect and
+    one diff frame per sweep afterwards.
+    """
+
+    def __init__(self, source, host=HOST, port=PORT):
+        self.source = source
+        self.host = host
+        self.port = port
+        self.cache = SnapshotCache()
+        self.clients = set()
+        self.requests = 0
+
+    async def feed(self):
+        """Pull sweeps from the (blocking) source in a thread and publish each one."""
+        sweeps = self.source.sweeps()
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await loop.run_in_executor(None, next, sweeps, None)
+            if item is None:
+                return
+            timestamp, observations = item
+            self.cache.update(timestamp, observations)
+            await self.broadcast(self.cache.diff_frame)
+            print(f"📡 sweep {self.cache.version} at {timestamp:%Y-%m-%d %H:%M:%S}: "
+                  f"{self.cache.stats['totalSegments']} segments, {self.cache.stats['anomalyCount']} anomalies, "
+                  f"built in {self.cache.build_s * 1e3:.1f} ms, {len(self.clients)} ws clients")
+
+    async def broadcast(self, frame):
+        async def send(writer):
+            try:
+                writer.write(frame)
+                await asyncio.wait_for(writer.drain(), CLIENT_SEND_TIMEOUT_S)
+            except (ConnectionError, asyncio.TimeoutError):
+                self.clients.discard(writer)
+                writer.close()
+        await asyncio.gather(*(send(w) for w in list(self.clients)))
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                self.requests += 1
+
+                path = path.split("?", 1)[0]
+                if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                    await self.websocket(reader, writer, headers)
+                    return
+                self.respond(writer, method, path, headers)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    return
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def respond(self, writer, method, path, headers):
+        resource = self.cache.resources.get(path)
+        if resource is None:
+            status = "404 Not Found" if self.cache.version else "503 Service Unavailable"
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\n\r\n".encode("latin-1"))
+            return
+        if method not in ("GET", "HEAD"):
+            writer.write(b"HTTP/1.1 405 Method Not Allowed\r\nAllow: GET, HEAD\r\nContent-Length: 0\r\n\r\n")
+            return
+
+        lines = [f"ETag: {resource.etag}", "Cache-Control: no-cache", "Access-Control-Allow-Origin: *",
+                 "Vary: Accept-Encoding"]
+        if resource.etag in headers.get("if-none-match", ""):
+            writer.write(("HTTP/1.1 304 Not Modified\r\n" + "\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+            return
+        body = resource.body
+        if "gzip" in headers.get("accept-encoding", ""):
+            body = resource.gzipped
+            lines.append("Content-Encoding: gzip")
+        lines += [f"Content-Type: {resource.content_type}; charset=utf-8", f"Content-Length: {len(body)}"]
+        head = ("HTTP/1.1 200 OK\r\n" + "\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        writer.write(head + body if method == "GET" else head)
+
+    async def websocket(self, reader, writer, headers):
+        accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + WS_GUID).encode()).digest())
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        if self.cache.full_frame:
+            writer.write(self.cache.full_frame)
+        # Register before yielding, so a sweep published during the drain still reaches this client
+        self.clients.add(writer)
+        try:
+            await writer.drain()
+            while True:
+                opcode, payload = await ws_read_frame(reader)
+                if opcode == 0x8:
+                    writer.write(ws_frame(payload[:2], opcode=0x8))
+                    return
+                if opcode == 0x9:
+                    writer.write(ws_frame(payload, opcode=0xA))
+                    await writer.drain()
+        finally:
+            self.clients.discard(writer)
+
+    async def serve(self):
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"🌐 Live congestion API on http://{self.host}:{self.port} (ws://{self.host}:{self.port}/ws)")
+        async with server:
+            await self.feed()
+            # Keep serving the last snapshot once a finite replay is exhausted
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    # python live_api.py            -> live TomTom polling
+    # python live_api.py replay [speedup] [csv ...]
+    if len(sys.argv) > 1 and sys.argv[1] == "replay":
+        speedup = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+        source = SweepReplay(sys.argv[3:] or [OUT], speedup=speedup or None)
+    else:
+        source = LivePoller(load_seeds(SEEDS_FILE))
+    asyncio.run(LiveApi(source).serve())
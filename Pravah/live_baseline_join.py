@@ -0,0 +1,133 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from segment_registry import SegmentRegistry
+from speed_profile_cube import (CUBE_DIR, METRICS, PERCENTILES, WEEKDAYS, SpeedProfileCube, time_set_end,
+                                time_set_start)
+
+# ===================== CONFIG =====================
+
+LIVE_CSV = "pravah_live_from_historical_segments.csv"
+
+PERCENTILE_LEVELS = np.array([int(p[1:]) for p in PERCENTILES], dtype=np.float32)
+
+
+class LiveBaselineJoin:
+    """
+    Attaches historical baselines to live observations.
+
+    The (weekday, hour) -> time-set mapping and the percentile columns are
+    resolved once up front, so each sweep costs one registry lookup and one
+    fancy-index gather from the memory-mapped cube, with no pandas merge.
+    """
+
+    def __init__(self, cube):
+        self.cube = cube
+        self.percentile_cols = np.array([cube.metric_index[p] for p in PERCENTILES])
+        self.p50 = PERCENTILES.index("p50")
+        self.p90 = PERCENTILES.index("p90")
+        # hour of day -> index of the time set covering it, -1 where no time set does
+        self.hour_to_time_set = np.full(24, -1)
+        for i, name in enumerate(cube.time_sets):
+            start, end = time_set_start(name), time_set_end(name)
+            for h in range(24):
+                if start <= h * 60 < end:
+                    self.hour_to_time_set[h] = i
+
+    @classmethod
+    def load(cls, cube_dir=CUBE_DIR):
+        return cls(SpeedProfileCube.load(cube_dir))
+
+    def baselines(self, segment_ids, weekday, hour):
+        """Percentile rows (n, len(PERCENTILES)); NaN for unknown segments, uncovered hours or empty cells."""
+        idx = self.cube.segment_indices(segment_ids)
+        ts = np.broadcast_to(self.hour_to_time_set[hour], idx.shape)
+        q = np.asarray(self.cube.cube[np.maximum(idx, 0), weekday, np.maximum(ts, 0)][:, self.percentile_cols],
+                       dtype=np.float32)
+        q[(idx < 0) | (ts < 0)] = np.nan
+        return q
+
+    def join(self, segment_ids, current_speed, weekday, hour):
+        """
+        Enrich one sweep with its historical context.
+
+        weekday and hour may be scalars (one sweep time) or arrays aligned
+        with segment_ids. Returns a DataFrame with the percentile rank of the
+        live speed, the historical median, deviation from it and p90.
+        """
+        v = np.asarray(current_speed, dtype=np.float32)
+        q = self.baselines(segment_ids, weekday, hour)
+
+        # Linear interpolation of v within each row's p5..p95 ladder
+        rows = np.arange(len(v))
+        k = (q <= v[:, None]).sum(axis=1)
+        lo = np.clip(k - 1, 0, len(PERCENTILES) - 1)
+        hi = np.clip(k, 0, len(PERCENTILES) - 1)
+        q_lo, q_hi = q[rows, lo], q[rows, hi]
+        span = q_hi - q_lo
+        frac = np.divide(v - q_lo, span, out=np.zeros_like(v), where=span > 0)
+        rank = PERCENTILE_LEVELS[lo] + 5 * np.clip(frac, 0, 1)
+
+        below = k == 0
+        rank[below] = 5 * np.clip(np.divide(v[below], q[below, 0], out=np.zeros(below.sum(), np.float32),
+                                            where=q[below, 0] > 0), 0, 1)
+        above = k == len(PERCENTILES)
+        tail = q[above, -1] - q[above, -2]
+        rank[above] = 95 + 5 * np.clip(np.divide(v[above] - q[above, -1], tail,
+                                                 out=np.ones(above.sum(), np.float32), where=tail > 0), 0, 1)
+        rank[np.isnan(q).any(axis=1)] = np.nan
+
+        median = q[:, self.p50]
+        return pd.DataFrame({
+            "segment_id": np.asarray(segment_ids),
+            "current_speed": v,
+            "percentile_rank": rank,
+            "hist_median": median,
+            "deviation_from_median": v - median,
+            "hist_p90": q[:, self.p90],
+        })
+
+    def join_live_csv(self, live_csv=LIVE_CSV):
+        """Join every row of the live logger CSV, using each row's own weekday and hour."""
+        live = pd.read_csv(live_csv, dtype={"segment_id": str})
+        ts = pd.to_datetime(live["timestamp_ist"], format="ISO8601")
+        joined = self.join(live["segment_id"], live["current_speed"],
+                           ts.dt.weekday.to_numpy(), ts.dt.hour.to_numpy())
+        joined.insert(0, "timestamp_ist", live["timestamp_ist"])
+        return joined
+
+
+def benchmark(n_segments=50000, n_sweeps=20, seed=0):
+    """Time join() on a synthetic cube of n_segments; returns ms per sweep."""
+    rng = np.random.default_rng(seed)
+    time_sets = [f"{h}:00-{h + 1}:00" for h in range(24)]
+    ids = rng.integers(10 ** 18, 2 * 10 ** 18, n_segments)
+
+    cube = np.empty((n_segments, len(WEEKDAYS), len(time_sets), len(METRICS)), dtype=np.float32)
+    base = rng.uniform(10, 60, size=cube.shape[:3] + (1,)).astype(np.float32)
+    cube[...] = base
+    pct = [METRICS.index(p) for p in PERCENTILES]
+    cube[..., pct] = base * np.linspace(0.4, 1.4, len(PERCENTILES), dtype=np.float32)
+
+    profile = SpeedProfileCube(cube, pd.DataFrame({"segment_id": ids.astype(str)}),
+                               time_sets, METRICS, SegmentRegistry(ids))
+    joiner = LiveBaselineJoin(profile)
+
+    timings = []
+    for i in range(n_sweeps):
+        order = rng.permutation(n_segments)
+        speeds = rng.uniform(5, 70, n_segments)
+        start = time.perf_counter()
+        joiner.join(ids[order], speeds, i % 7, i % 24)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+if __name__ == "__main__":
+    joiner = LiveBaselineJoin.load(CUBE_DIR)
+    print(joiner.join_live_csv(LIVE_CSV).to_string(index=False))
+
+    for n in (10000, 50000):
+        print(f"⏱  {n} segments: {benchmark(n):.1f} ms per sweep")
@@ -0,0 +1,290 @@
+import time
+from datetime import datetime
+from multiprocessing import Process, resource_tracker, shared_memory
+
+import numpy as np
+
+from segment_registry import REGISTRY_FILE, SEEDS_FILE, load_registry
+
+# ===================== CONFIG =====================
+
+SHM_NAME = "pravah_live_state"
+DEPTH = 16
+
+MAGIC = 0x50524156  # "PRAV"
+# Header words: magic, capacity, depth, global sequence, sweeps written
+HEADER_WORDS = 5
+H_MAGIC, H_CAPACITY, H_DEPTH, H_SEQ, H_SWEEPS = range(HEADER_WORDS)
+
+LATEST_FIELDS = ["speed", "free_flow", "confidence", "timestamp"]
+
+
+def _layout(capacity, depth):
+    """(name, dtype, shape, byte offset) of every array, and the total size, 8-byte aligned."""
+    fields = [
+        ("header", np.uint64, (HEADER_WORDS,)),
+        ("seq", np.uint64, (capacity,)),
+        ("writes", np.uint64, (capacity,)),
+        ("speed", np.float32, (capacity,)),
+        ("free_flow", np.float32, (capacity,)),
+        ("confidence", np.float32, (capacity,)),
+        ("timestamp", np.float64, (capacity,)),
+        ("ring_speed", np.float32, (capacity, depth)),
+        ("ring_timestamp", np.float64, (capacity, depth)),
+    ]
+    layout, offset = [], 0
+    for name, dtype, shape in fields:
+        layout.append((name, dtype, shape, offset))
+        offset += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 8) * 8
+    return layout, offset
+
+
+def _untrack(shm):
+    """
+    Keep a block out of the resource tracker. Before Python 3.13 every
+    process that opens a block registers it, and the tracker unlinks it
+    when that process exits, which would pull the store out from under the
+    writer whenever a reader stops. The creator removes it in close().
+    """
+    resource_tracker.unregister(shm._name, "shared_memory")
+
+
+class LiveStateStore:
+    """
+    Latest live observation per segment, plus a ring of recent speeds, in shared memory.
+
+    Every field is a fixed-size numpy array laid over one SharedMemory block
+    and indexed by SegmentRegistry index, so any process that attaches sees
+    the writer's values without copying or parsing anything.
+
+    There is one writer. Consistency uses seqlocks: the writer makes each
+    touched segment's sequence number odd while it writes and even again
+    afterwards, and brackets a whole sweep with the global sequence the
+    same way. latest()/history() retry the segments whose sequence moved
+    while they were read; begin_read()/end_read() let a reader work directly
+    on the shared arrays and check afterwards that no sweep landed meanwhile.
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        header = np.ndarray((HEADER_WORDS,), dtype=np.uint64, buffer=shm.buf)
+        if header[H_MAGIC] != MAGIC:
+            raise ValueError(f"Shared memory block {shm.name} is not a live state store")
+        self.capacity = int(header[H_CAPACITY])
+        self.depth = int(header[H_DEPTH])
+        layout, _ = _layout(self.capacity, self.depth)
+        for name, dtype, shape, offset in layout:
+            setattr(self, name, np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset))
+
+    @classmethod
+    def create(cls, capacity, depth=DEPTH, name=SHM_NAME):
+        _, size = _layout(capacity, depth)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a writer that died without close()
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _untrack(shm)
+        np.ndarray((size,), dtype=np.uint8, buffer=shm.buf)[:] = 0
+        header = np.ndarray((HEADER_WORDS,), dtype=np.uint64, buffer=shm.buf)
+        header[H_CAPACITY], header[H_DEPTH] = capacity, depth
+        header[H_MAGIC] = MAGIC
+        store = cls(shm, owner=True)
+        store.speed[:] = store.free_flow[:] = store.confidence[:] = np.nan
+        store.timestamp[:] = np.nan
+        return store
+
+    @classmethod
+    def attach(cls, name=SHM_NAME):
+        shm = shared_memory.SharedMemory(name=name)
+        _untrack(shm)
+        return cls(shm, owner=False)
+
+    def close(self):
+        """Detach; the writer that created the block also removes it."""
+        for name, _, _, _ in _layout(self.capacity, self.depth)[0]:
+            setattr(self, name, None)
+        self.shm.close()
+        if self.owner:
+            # unlink() unregisters from the tracker, so register first to keep it balanced
+            resource_tracker.register(self.shm._name, "shared_memory")
+            self.shm.unlink()
+
+    # ---------------- writer ----------------
+
+    def write(self, indices, speed, free_flow, confidence, timestamp):
+        """
+        Store one sweep. All arguments are arrays aligned with indices
+        (registry indices < capacity); timestamp is epoch seconds.
+        """
+        idx = np.asarray(indices, dtype=np.int64)
+        self.header[H_SEQ] += 1
+        self.seq[idx] += 1
+
+        self.speed[idx] = speed
+        self.free_flow[idx] = free_flow
+        self.confidence[idx] = confidence
+        self.timestamp[idx] = timestamp
+        slot = (self.writes[idx] % self.depth).astype(np.int64)
+        self.ring_speed[idx, slot] = speed
+        self.ring_timestamp[idx, slot] = timestamp
+        self.writes[idx] += 1
+
+        self.seq[idx] += 1
+        self.header[H_SWEEPS] += 1
+        self.header[H_SEQ] += 1
+
+    # ---------------- readers ----------------
+
+    def begin_read(self):
+        """Global sequence to pass to end_read(); waits out a sweep being written."""
+        while True:
+            seq = int(self.header[H_SEQ])
+            if seq % 2 == 0:
+                return seq
+            time.sleep(0)
+
+    def end_read(self, token):
+        """True if no sweep was written since begin_read() returned token."""
+        return int(self.header[H_SEQ]) == token
+
+    def latest(self, indices, retries=1000):
+        """
+        Consistent copy of the latest fields for the given segments.
+
+        Returns {field: array} for LATEST_FIELDS; never-written segments are NaN.
+        """
+        idx = np.asarray(indices, dtype=np.int64)
+        out = {f: np.empty(len(idx), dtype=getattr(self, f).dtype) for f in LATEST_FIELDS}
+        todo = np.arange(len(idx))
+        for _ in range(retries):
+            sub = idx[todo]
+            before = self.seq[sub].copy()
+            for f in LATEST_FIELDS:
+                out[f][todo] = getattr(self, f)[sub]
+            ok = (before % 2 == 0) & (self.seq[sub] == before)
+            todo = todo[~ok]
+            if not len(todo):
+                return out
+            # Let the writer finish the sweep it is in the middle of
+            time.sleep(0.0001)
+        raise RuntimeError(f"{len(todo)} segments kept changing while being read")
+
+    def history(self, index, retries=1000):
+        """(timestamps, speeds) of the segment's recent observations, oldest first."""
+        for _ in range(retries):
+            before = int(self.seq[index])
+            if before % 2:
+                time.sleep(0.0001)
+                continue
+            n = int(self.writes[index])
+            order = (np.arange(max(n - self.depth, 0), n) % self.depth)
+            ts, speed = self.ring_timestamp[index, order], self.ring_speed[index, order]
+            if int(self.seq[index]) == before:
+                return ts, speed
+        raise RuntimeError(f"Segment {index} kept changing while being read")
+
+    @property
+    def sweeps(self):
+        return int(self.header[H_SWEEPS])
+
+
+class SharedStateLogger:
+    """
+    Sweep sink with the CsvLogger interface that writes into a LiveStateStore.
+
+    Use with pravah_live_logger.log_sweeps(source, SharedStateLogger(...)),
+    where source is the LivePoller or a SweepReplay.
+    """
+
+    def __init__(self, store, registry):
+        self.store = store
+        self.registry = registry
+
+    def write(self, observations):
+        if not observations:
+            return
+        idx = self.registry.indices([o["segment_id"] for o in observations])
+        known = (idx >= 0) & (idx < self.store.capacity)
+        obs = [o for o, k in zip(observations, known) if k]
+        self.store.write(
+            idx[known],
+            np.array([o["current_speed"] for o in obs], dtype=np.float32),
+            np.array([o["free_flow_speed"] for o in obs], dtype=np.float32),
+            np.array([o["confidence"] for o in obs], dtype=np.float32),
+            np.array([datetime.fromisoformat(o["timestamp_ist"]).timestamp() for o in obs]),
+        )
+
+
+# ===================== BENCHMARK =====================
+
+def _summary(name=SHM_NAME):
+    store = LiveStateStore.attach(name)
+    latest = store.latest(np.arange(store.capacity))
+    seen = np.isfinite(latest["speed"])
+    print(f"✅ {store.sweeps} sweep(s) in shared memory; {seen.sum()} of {store.capacity} segments live, "
+          f"mean speed {np.nanmean(latest['speed']):.1f} km/h")
+    store.close()
+
+
+def _reader(name, n_reads, batch, result):
+    store = LiveStateStore.attach(name)
+    rng = np.random.default_rng(1)
+    start = time.perf_counter()
+    for _ in range(n_reads):
+        latest = store.latest(rng.integers(0, store.capacity, batch))
+        assert np.all(np.isnan(latest["speed"]) | (latest["speed"] >= 0))
+    result.put((time.perf_counter() - start) / n_reads)
+    store.close()
+
+
+def benchmark(capacity=100000, n_sweeps=200, interval=0.01, readers=2, batch=1000, name=SHM_NAME + "_bench"):
+    """
+    A writer storing a full sweep every interval seconds while reader
+    processes pull random batches; prints per-write and per-read times.
+    """
+    from multiprocessing import Queue
+
+    store = LiveStateStore.create(capacity, name=name)
+    try:
+        result = Queue()
+        procs = [Process(target=_reader, args=(name, 500, batch, result)) for _ in range(readers)]
+        for p in procs:
+            p.start()
+        rng = np.random.default_rng(0)
+        idx = np.arange(capacity)
+        write_s = 0.0
+        for k in range(n_sweeps):
+            speed = rng.uniform(5, 60, capacity).astype(np.float32)
+            start = time.perf_counter()
+            store.write(idx, speed, np.float32(60), np.float32(1), time.time())
+            write_s += time.perf_counter() - start
+            time.sleep(interval)
+        write_us = write_s / n_sweeps * 1e6
+        read_us = [result.get(timeout=60) * 1e6 for _ in procs]
+        for p in procs:
+            p.join()
+    finally:
+        store.close()
+    print(f"⏱  {capacity} segments: {write_us:.0f} µs per full sweep write, "
+          f"{np.mean(read_us):.0f} µs per {batch}-segment consistent read ({readers} reader processes)")
+
+
+if __name__ == "__main__":
+    from pravah_live_logger import OUT, log_sweeps
+    from sweep_replay import SweepReplay
+
+    registry = load_registry(REGISTRY_FILE, SEEDS_FILE)
+    store = LiveStateStore.create(len(registry))
+    try:
+        log_sweeps(SweepReplay(OUT), SharedStateLogger(store, registry), verbose=False)
+        reader = Process(target=_summary)
+        reader.start()
+        reader.join()
+    finally:
+        store.close()
+    benchmark()
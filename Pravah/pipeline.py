@@ -0,0 +1,260 @@
+"""
+Incremental runner for the Pravah data pipeline.
+
+    python Pravah/pipeline.py                 # bring every output up to date
+    python Pravah/pipeline.py data_js         # one stage (and whatever it needs)
+    python Pravah/pipeline.py --force seeds   # rerun even if nothing changed
+
+Each stage is one of the existing scripts, declared with the files it reads
+and writes. A stage's cache key is the SHA-256 of its script, extra code
+files and inputs; its outputs are kept in a content-addressed cache under
+that key. A stage whose key has been seen before is not rerun: its outputs
+are left alone when they still match, or restored from the cache when they
+do not. Stages depend on the stages that write their inputs and run in
+parallel as soon as those are done.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(ROOT, "Pravah", ".pipeline_cache")
+
+
+@dataclass
+class Stage:
+    """A script run from cwd; all paths are relative to the repository root."""
+    name: str
+    script: str
+    inputs: list
+    outputs: list
+    cwd: str = "Pravah"
+    code: list = field(default_factory=list)
+    args: list = field(default_factory=list)
+
+
+STAGES = [
+    Stage("seeds", "Pravah/extract_pravah_seed_points.py",
+          inputs=["Pravah/pravah_monday_full.csv"],
+          outputs=["Pravah/pravah_seed_points.csv"]),
+    Stage("junction_flow", "Pravah/junction_finder.py",
+          inputs=["Pravah/pravah_seed_points.csv"],
+          outputs=["Pravah/traffic_data.csv"],
+          code=["Pravah/csv_to_dict_maker.py"]),
+    Stage("junctions", "Pravah/junction_clusters.py",
+          inputs=["Pravah/pravah_monday_full.csv"],
+          outputs=["Pravah/junctions.csv", "Pravah/seed_points_with_junctions.csv",
+                   "Pravah/junction_endpoints.csv"],
+          code=["Pravah/extract_pravah_seed_points.py"]),
+    Stage("segments_map", "Pravah/data_arranger.py",
+          inputs=["Pravah/pravah_seed_points.csv", "Pravah/pravah_900to1000_balanced.csv"],
+          outputs=["Pravah/segments_visualizer.html"]),
+    Stage("data_js", "Pravah/map_related_file_generator.py",
+          inputs=["Pravah/pravah_seed_points.csv", "Pravah/pravah_900to1000_balanced.csv"],
+          outputs=["Pravah/data.js"]),
+    Stage("anomaly_table", "Anomaly Detection/cvsProcessing.py",
+          inputs=["Anomaly Detection/AnomalyDetectionTraining"],
+          outputs=["Anomaly Detection/Processed_CSV_Data.csv"],
+          cwd="."),
+]
+
+
+class ContentCache:
+    """
+    Content-addressed blobs plus one manifest per (stage, key).
+
+    File hashes are memoised by (size, mtime_ns), so an unchanged multi-MB
+    CSV is not reread just to find out that it is unchanged.
+    """
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+        self.objects = os.path.join(directory, "objects")
+        os.makedirs(self.objects, exist_ok=True)
+        self.stat_file = os.path.join(directory, "file_hashes.json")
+        self.file_hashes = {}
+        if os.path.exists(self.stat_file):
+            with open(self.stat_file, "r") as f:
+                self.file_hashes = json.load(f)
+
+    def save(self):
+        with open(self.stat_file + ".tmp", "w") as f:
+            json.dump(self.file_hashes, f)
+        os.replace(self.stat_file + ".tmp", self.stat_file)
+
+    def hash_file(self, path):
+        st = os.stat(path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        known = self.file_hashes.get(path)
+        if known and known[0] == stamp:
+            return known[1]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self.file_hashes[path] = [stamp, digest]
+        return digest
+
+    def hash_path(self, path):
+        """Hash of a file, of a directory's files (names + contents), or of 'missing'."""
+        if os.path.isdir(path):
+            h = hashlib.sha256()
+            for name in sorted(os.listdir(path)):
+                child = os.path.join(path, name)
+                if os.path.isfile(child):
+                    h.update(f"{name}\0{self.hash_file(child)}\0".encode("utf-8"))
+            return h.hexdigest()
+        if os.path.isfile(path):
+            return self.hash_file(path)
+        return "missing"
+
+    def manifest_path(self, stage_name, key):
+        return os.path.join(self.directory, "stages", stage_name, f"{key}.json")
+
+    def load_manifest(self, stage_name, key):
+        path = self.manifest_path(stage_name, key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            manifest = json.load(f)
+        if all(os.path.exists(os.path.join(self.objects, d)) for d in manifest.values()):
+            return manifest
+        return None
+
+    def store(self, stage_name, key, outputs):
+        manifest = {}
+        for rel, path in outputs:
+            digest = self.hash_file(path)
+            blob = os.path.join(self.objects, digest)
+            if not os.path.exists(blob):
+                shutil.copyfile(path, blob + ".tmp")
+                os.replace(blob + ".tmp", blob)
+            manifest[rel] = digest
+        path = self.manifest_path(stage_name, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    def restore(self, manifest):
+        """Copy cached outputs back where they differ; returns how many were restored."""
+        restored = 0
+        for rel, digest in manifest.items():
+            path = os.path.join(ROOT, rel)
+            if os.path.isfile(path) and self.hash_file(path) == digest:
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copyfile(os.path.join(self.objects, digest), path)
+            restored += 1
+        return restored
+
+
+class Pipeline:
+    def __init__(self, stages=STAGES, cache=None, workers=None):
+        self.stages = {s.name: s for s in stages}
+        self.cache = cache or ContentCache()
+        self.workers = workers or os.cpu_count() or 1
+        writers = {out: s.name for s in stages for out in s.outputs}
+        self.deps = {s.name: sorted({writers[i] for i in s.inputs if i in writers and writers[i] != s.name})
+                     for s in stages}
+
+    def closure(self, targets):
+        """targets plus every stage they transitively depend on."""
+        needed, todo = set(), list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in needed:
+                needed.add(name)
+                todo.extend(self.deps[name])
+        return needed
+
+    def key(self, stage):
+        h = hashlib.sha256()
+        h.update(json.dumps([stage.script, stage.cwd, stage.args, stage.outputs]).encode("utf-8"))
+        for rel in [stage.script] + stage.code + stage.inputs:
+            h.update(f"{rel}\0{self.cache.hash_path(os.path.join(ROOT, rel))}\0".encode("utf-8"))
+        return h.hexdigest()
+
+    def _execute(self, stage):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, os.path.join(ROOT, stage.script)] + stage.args,
+                              cwd=os.path.join(ROOT, stage.cwd), capture_output=True, text=True)
+        return proc, time.perf_counter() - start
+
+    def run(self, targets=None, force=False):
+        """
+        Bring the targets' outputs up to date.
+
+        Returns {stage: (status, seconds)} with status one of 'fresh',
+        'restored', 'ran', 'failed' or 'blocked' (a dependency failed).
+        """
+        needed = self.closure(targets or list(self.stages))
+        forced = set(targets or needed) if force else set()
+        results = {}
+        running = {}
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while len(results) < len(needed):
+                for name in sorted(needed - set(results) - {n for n, _ in running.values()}):
+                    deps = self.deps[name]
+                    if any(results.get(d, ("",))[0] in ("failed", "blocked") for d in deps):
+                        results[name] = ("blocked", 0.0)
+                        print(f"   ⛔ {name}: skipped, a dependency failed")
+                        continue
+                    if not all(d in results for d in deps):
+                        continue
+                    stage = self.stages[name]
+                    key = self.key(stage)
+                    manifest = None if name in forced else self.cache.load_manifest(name, key)
+                    if manifest is not None:
+                        restored = self.cache.restore(manifest)
+                        results[name] = ("restored" if restored else "fresh", 0.0)
+                        print(f"   {'♻️ ' if restored else '✅'} {name}: "
+                              f"{'restored from cache' if restored else 'up to date'}")
+                        continue
+                    running[pool.submit(self._execute, stage)] = (name, key)
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, key = running.pop(future)
+                    stage = self.stages[name]
+                    proc, seconds = future.result()
+                    outputs = [(rel, os.path.join(ROOT, rel)) for rel in stage.outputs]
+                    missing = [rel for rel, path in outputs if not os.path.isfile(path)]
+                    if proc.returncode != 0 or missing:
+                        results[name] = ("failed", seconds)
+                        reason = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() \
+                            else f"missing outputs {missing}"
+                        print(f"   ❌ {name}: failed after {seconds:.2f}s ({reason})")
+                        continue
+                    self.cache.store(name, key, outputs)
+                    results[name] = ("ran", seconds)
+                    print(f"   ⚙️  {name}: ran in {seconds:.2f}s")
+
+        self.cache.save()
+        print(f"Pipeline finished in {time.perf_counter() - start:.2f}s")
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("stages", nargs="*", help=f"Any of {', '.join(s.name for s in STAGES)}")
+    parser.add_argument("--force", action="store_true", help="Rerun the selected stages regardless of the cache")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+    unknown = set(args.stages) - {s.name for s in STAGES}
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    results = Pipeline(workers=args.workers).run(args.stages or None, force=args.force)
+    sys.exit(1 if any(status in ("failed", "blocked") for status, _ in results.values()) else 0)
@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# ===================== CONFIG =====================
+
+SEEDS_FILE = "pravah_seed_points.csv"
+REGISTRY_FILE = "pravah_segment_registry.npy"
+
+
+def as_ids(segment_ids):
+    """TomTom segment IDs (str, int or pandas) as an int64 array."""
+    if isinstance(segment_ids, (pd.Series, pd.Index)):
+        segment_ids = segment_ids.to_numpy()
+    return np.asarray(segment_ids).astype(np.int64).ravel()
+
+
+class SegmentRegistry:
+    """
+    Interns 19-digit TomTom segment IDs into dense int32 indices.
+
+    Indices are assigned in first-seen order and never change, so anything
+    keyed by index (cube rows, state arrays) stays valid as the registry
+    grows. Translation both ways is vectorized: index -> ID is a gather,
+    ID -> index a binary search over a sorted copy of the IDs.
+    """
+
+    def __init__(self, ids=None):
+        self._ids = np.empty(0, dtype=np.int64) if ids is None else as_ids(ids)
+        self._reindex()
+
+    def _reindex(self):
+        self._order = np.argsort(self._ids, kind="stable").astype(np.int32)
+        self._sorted = self._ids[self._order]
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def segment_ids(self):
+        return self._ids
+
+    def indices(self, segment_ids):
+        """Index per ID, -1 where the ID is not registered."""
+        ids = as_ids(segment_ids)
+        if len(self._sorted) == 0:
+            return np.full(len(ids), -1, dtype=np.int32)
+        pos = np.minimum(np.searchsorted(self._sorted, ids), len(self._sorted) - 1)
+        return np.where(self._sorted[pos] == ids, self._order[pos], -1).astype(np.int32)
+
+    def ids(self, indices):
+        return self._ids[np.asarray(indices)]
+
+    def intern(self, segment_ids):
+        """Register any unseen IDs and return the index of every ID."""
+        ids = as_ids(segment_ids)
+        idx = self.indices(ids)
+        missing = ids[idx < 0]
+        if len(missing):
+            _, first = np.unique(missing, return_index=True)
+            self._ids = np.concatenate([self._ids, missing[np.sort(first)]])
+            self._reindex()
+            idx = self.indices(ids)
+        return idx
+
+    def save(self, path=REGISTRY_FILE):
+        np.save(path, self._ids)
+
+    @classmethod
+    def load(cls, path=REGISTRY_FILE):
+        return cls(np.load(path))
+
+
+def load_registry(path=REGISTRY_FILE, seeds_file=SEEDS_FILE):
+    """Open the shared registry, creating it from the seeds file on first use."""
+    if os.path.exists(path):
+        return SegmentRegistry.load(path)
+    registry = SegmentRegistry()
+    registry.intern(pd.read_csv(seeds_file, usecols=["segment_id"], dtype={"segment_id": str})["segment_id"])
+    registry.save(path)
+    return registry
+
+
+if __name__ == "__main__":
+    registry = load_registry(REGISTRY_FILE, SEEDS_FILE)
+    print(f"✅ {REGISTRY_FILE}: {len(registry)} segments")
@@ -0,0 +1,156 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from segment_registry import REGISTRY_FILE, load_registry
+
+# ===================== CONFIG =====================
+
+EXPORT_CSVS = ["pravah_900to1000_balanced.csv", "pravah_monday_full.csv"]
+CUBE_DIR = "speed_profile_cube"
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+PERCENTILES = [f"p{p}" for p in range(5, 100, 5)]
+METRICS = [
+    "harmonic_avg_speed", "average_speed", "median_speed", "speed_stddev",
+    "sample_size", "average_travel_time", "median_travel_time", "travel_time_ratio",
+] + PERCENTILES
+
+# Stored once per segment instead of once per row
+SEGMENT_COLUMNS = ["segment_id", "street_name", "frc", "speed_limit", "distance_m", "geometry_wkt"]
+# Identical for every row of an export; stored once per file
+EXPORT_COLUMNS = ["job_name", "creation_time", "network_name", "zone_id", "probe_source",
+                  "map_version", "date_from", "date_to"]
+
+CUBE_FILE = "cube.npy"
+SEGMENTS_FILE = "segments.csv"
+META_FILE = "meta.json"
+
+
+def time_set_start(name):
+    """Minutes after midnight at which a time set such as '9:00-10:00' starts."""
+    hours, minutes = name.split("-")[0].split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def time_set_end(name):
+    """Minutes after midnight at which a time set such as '9:00-10:00' ends ('23:00-0:00' ends at 1440)."""
+    hours, minutes = name.split("-")[1].split(":")
+    end = int(hours) * 60 + int(minutes)
+    return end if end > time_set_start(name) else end + 24 * 60
+
+
+def weekday_of(df):
+    """Weekday index per row, from 'day' or, failing that, 'date_range_name'."""
+    day = df["day"] if "day" in df.columns else df["date_range_name"]
+    lookup = {name[:3].lower(): i for i, name in enumerate(WEEKDAYS)}
+    return day.astype(str).str[:3].str.lower().map(lookup)
+
+
+# ===================== BUILD =====================
+
+def build_cube(export_csvs=EXPORT_CSVS, out_dir=CUBE_DIR, registry_file=REGISTRY_FILE):
+    """
+    Ingest TomTom stats exports into a float32 segment x weekday x time-set x metric cube.
+
+    The segment axis follows the shared segment registry, so cube row i is
+    registry index i. Cells without data are NaN. If the same (segment,
+    weekday, time set) appears in several exports, the later file wins.
+    """
+    frames, exports = [], []
+    for path in export_csvs:
+        df = pd.read_csv(path, dtype={"segment_id": str})
+        df["weekday"] = weekday_of(df)
+        df = df.dropna(subset=["weekday"])
+        frames.append(df[SEGMENT_COLUMNS + ["weekday", "time_set_name"] + METRICS])
+        first = df.iloc[0]
+        exports.append({"file": os.path.basename(path),
+                        **{c: str(first[c]) for c in EXPORT_COLUMNS if c in df.columns}})
+
+    rows = pd.concat(frames, ignore_index=True)
+
+    registry = load_registry(registry_file)
+    seg_idx = registry.intern(rows["segment_id"])
+    registry.save(registry_file)
+
+    segments = pd.DataFrame({"segment_id": registry.segment_ids.astype(str)})
+    first = rows.drop_duplicates("segment_id", keep="first")
+    segments.loc[registry.indices(first["segment_id"]), SEGMENT_COLUMNS[1:]] = first[SEGMENT_COLUMNS[1:]].to_numpy()
+    time_sets = sorted(rows["time_set_name"].unique(), key=time_set_start)
+
+    day_idx = rows["weekday"].to_numpy(dtype=np.int64)
+    ts_idx = pd.Index(time_sets).get_indexer(rows["time_set_name"])
+
+    os.makedirs(out_dir, exist_ok=True)
+    shape = (len(segments), len(WEEKDAYS), len(time_sets), len(METRICS))
+    cube = np.lib.format.open_memmap(os.path.join(out_dir, CUBE_FILE), mode="w+",
+                                     dtype=np.float32, shape=shape)
+    cube[:] = np.nan
+    cube[seg_idx, day_idx, ts_idx] = rows[METRICS].to_numpy(dtype=np.float32)
+    cube.flush()
+
+    segments.to_csv(os.path.join(out_dir, SEGMENTS_FILE), index=False)
+    with open(os.path.join(out_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"weekdays": WEEKDAYS, "time_sets": time_sets, "metrics": METRICS,
+                   "exports": exports}, f, indent=2)
+
+    return SpeedProfileCube.load(out_dir, registry_file)
+
+
+# ===================== QUERY =====================
+
+class SpeedProfileCube:
+    def __init__(self, cube, segments, time_sets, metrics, registry):
+        self.cube = cube
+        self.segments = segments
+        self.time_sets = time_sets
+        self.metrics = metrics
+        self.metric_index = {m: i for i, m in enumerate(metrics)}
+        self.registry = registry
+        self.time_set_starts = np.array([time_set_start(t) for t in time_sets])
+
+    @classmethod
+    def load(cls, cube_dir=CUBE_DIR, registry_file=REGISTRY_FILE):
+        with open(os.path.join(cube_dir, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        segments = pd.read_csv(os.path.join(cube_dir, SEGMENTS_FILE), dtype={"segment_id": str})
+        cube = np.load(os.path.join(cube_dir, CUBE_FILE), mmap_mode="r")
+        return cls(cube, segments, meta["time_sets"], meta["metrics"], load_registry(registry_file))
+
+    def segment_indices(self, segment_ids):
+        """Cube row per segment ID (-1 where unknown or interned after the cube was built)."""
+        idx = self.registry.indices(segment_ids)
+        return np.where(idx < len(self.cube), idx, -1)
+
+    def time_set_index(self, hour, minute=0):
+        """Index of the latest time set starting at or before hour:minute (clamped to the first)."""
+        return max(int(np.searchsorted(self.time_set_starts, hour * 60 + minute, side="right")) - 1, 0)
+
+    def baseline(self, segment_ids, weekday, time_set, metrics=("median_speed",)):
+        """
+        Metric values for many segments at one weekday and time set.
+
+        Returns an array of shape (len(segment_ids), len(metrics)); unknown
+        segments and missing cells are NaN.
+        """
+        idx = self.segment_indices(segment_ids)
+        cols = [self.metric_index[m] for m in metrics]
+        out = np.asarray(self.cube[np.maximum(idx, 0), weekday, time_set][:, cols], dtype=np.float32)
+        out[idx < 0] = np.nan
+        return out
+
+    def profile(self, segment_id, metric="median_speed"):
+        """Weekday x time-set profile of one metric for a single segment."""
+        i = self.segment_indices([segment_id])[0]
+        if i < 0:
+            raise KeyError(segment_id)
+        return self.cube[i, :, :, self.metric_index[metric]]
+
+
+if __name__ == "__main__":
+    cube = build_cube(EXPORT_CSVS, CUBE_DIR)
+    size_mb = cube.cube.nbytes / 1e6
+    print(f"✅ {CUBE_DIR}/ built: {cube.cube.shape} cube ({size_mb:.2f} MB), "
+          f"{len(cube.segments)} segments, time sets {cube.time_sets}")
@@ -0,0 +1,236 @@
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from congestion_ratio_finder import congestion_ratio
+from extract_pravah_seed_points import midpoint
+from pravah_live_logger import IST, OUT, SWEEP_INTERVAL_S, parse_observation
+from speed_profile_cube import time_set_start, weekday_of
+
+ANOMALY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Anomaly Detection")
+sys.path.append(ANOMALY_DIR)
+
+# ===================== CONFIG =====================
+
+# Exports only carry weekday + time set; replayed sweeps are placed in the
+# week of this Monday (inside the exports' own date range)
+REFERENCE_MONDAY = date(2024, 8, 5)
+
+BASELINE_DIR = os.path.join(ANOMALY_DIR, "baselines")
+TRAINING_DIR = os.path.join(ANOMALY_DIR, "AnomalyDetectionTraining")
+
+
+def live_csv_sweeps(path=OUT):
+    """
+    (timestamp, observations) per sweep of a live logger CSV.
+
+    The logger visits every seed once per sweep, so a sweep ends as soon as
+    a segment repeats; its timestamp is that of its first row.
+    """
+    seen, observations, first_ts = set(), [], None
+    with open(path, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            if row["segment_id"] in seen:
+                yield first_ts, observations
+                seen, observations, first_ts = set(), [], None
+            if first_ts is None:
+                first_ts = datetime.fromisoformat(row["timestamp_ist"])
+            seen.add(row["segment_id"])
+            observations.append(parse_observation(row))
+    if observations:
+        yield first_ts, observations
+
+
+def export_sweeps(paths):
+    """
+    (timestamp, observations) per (weekday, time set) of historical exports.
+
+    Each export row becomes one live-style observation: average_speed as the
+    current speed, p85 as free flow, and the geometry's middle vertex as the
+    seed point. Sweeps come out in time order, rows within a sweep in file
+    order, so the replay is deterministic.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    df = pd.concat([pd.read_csv(p, dtype={"segment_id": str}) for p in paths], ignore_index=True)
+    df = df.dropna(subset=["average_speed", "time_set_name"])
+    df["weekday"] = weekday_of(df)
+    df = df.dropna(subset=["weekday"])
+    df["minute"] = df["time_set_name"].map(time_set_start)
+    df["order"] = np.arange(len(df))
+    df = df.sort_values(["weekday", "minute", "order"], kind="stable")
+
+    free_flow = df["p85"].where(df["p85"] > 0, df["average_speed"])
+    df["free_flow_speed"] = free_flow
+    df["free_flow_travel_time"] = df["distance_m"] / (free_flow / 3.6)
+    seeds = {seg: midpoint(wkt) for seg, wkt in zip(df["segment_id"], df["geometry_wkt"])}
+
+    for (weekday, minute), group in df.groupby(["weekday", "minute"], sort=False):
+        day = REFERENCE_MONDAY + timedelta(days=int(weekday))
+        timestamp = datetime(day.year, day.month, day.day, tzinfo=IST) + timedelta(minutes=int(minute))
+        ts = timestamp.isoformat()
+        observations = []
+        for seg, speed, ff, tt, fftt in zip(group["segment_id"], group["average_speed"], group["free_flow_speed"],
+                                           group["average_travel_time"], group["free_flow_travel_time"]):
+            lat, lon = seeds[seg]
+            observations.append({
+                "timestamp_ist": ts,
+                "segment_id": seg,
+                "lat": lat,
+                "lon": lon,
+                "current_speed": float(speed),
+                "free_flow_speed": float(ff),
+                "current_travel_time": float(tt),
+                "free_flow_travel_time": float(fftt),
+                "confidence": 1.0,
+                "road_closure": False
+            })
+        yield timestamp, observations
+
+
+class SweepReplay:
+    """
+    Re-emits recorded sweeps through the same sweeps() interface as LivePoller.
+
+    Sources are a live logger CSV or one or more historical exports (the
+    format is picked from the header). With speedup=k the gaps between
+    recorded sweep timestamps are replayed k times faster; speedup=None
+    emits as fast as the consumer takes them. Pacing is against absolute
+    deadlines, so a slow consumer does not make the replay drift.
+    """
+
+    def __init__(self, paths=OUT, speedup=None, loops=1):
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.speedup = speedup
+        self.loops = loops
+        self.lag_s = 0.0
+
+    def _recorded(self):
+        with open(self.paths[0], "r", newline="") as f:
+            header = next(csv.reader(f))
+        if "timestamp_ist" in header:
+            for path in self.paths:
+                yield from live_csv_sweeps(path)
+        else:
+            yield from export_sweeps(self.paths)
+
+    def sweeps(self):
+        start_wall = time.perf_counter()
+        first_ts = None
+        offset = timedelta(0)
+        for _ in range(self.loops):
+            loop_first = loop_last = None
+            for timestamp, observations in self._recorded():
+                loop_first = loop_first or timestamp
+                loop_last = timestamp
+                timestamp = timestamp + offset
+                first_ts = first_ts or timestamp
+                if self.speedup:
+                    due = start_wall + (timestamp - first_ts).total_seconds() / self.speedup
+                    wait = due - time.perf_counter()
+                    if wait > 0:
+                        time.sleep(wait)
+                    else:
+                        self.lag_s = max(self.lag_s, -wait)
+                yield timestamp, observations
+            if loop_last is None:
+                return
+            # Later loops continue the clock instead of jumping back
+            offset += loop_last - loop_first + timedelta(seconds=SWEEP_INTERVAL_S)
+
+
+# ===================== STAGES =====================
+
+def ratio_stage(timestamp, observations):
+    """Congestion ratio per observation."""
+    current = np.array([o["current_speed"] for o in observations], dtype=float)
+    free = np.array([o["free_flow_speed"] for o in observations], dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = congestion_ratio(current, free)
+    return [round(float(r), 4) for r in ratios]
+
+
+def anomaly_stage(store, **params):
+    """
+    AnomalyAlert stage scored against a BaselineStore.
+
+    The alerter keeps per-segment state across sweeps, so each replay needs
+    a stage of its own. Alerts come back through a CallbackSink and are the
+    output of the sweep that raised or cleared them.
+    """
+    # AnomalyAlert imports this module, so it is only imported once needed
+    from AnomalyAlert import AnomalyAlert, CallbackSink
+
+    published = []
+    alerter = AnomalyAlert(store, CallbackSink(published.extend), **params)
+
+    def stage(timestamp, observations):
+        published.clear()
+        alerter.process_sweep([o["segment_id"] for o in observations],
+                              [o["current_speed"] for o in observations], timestamp)
+        return list(published)
+    return stage
+
+
+def run_stages(source, stages):
+    """
+    Drive every stage with each sweep of source and time it.
+
+    Args:
+        source: anything with a sweeps() generator (LivePoller, SweepReplay)
+        stages: {name: callable(timestamp, observations) -> JSON-serialisable output}
+    Returns:
+        Report dict with sweep/observation counts, simulated vs wall time,
+        per-stage seconds and a SHA-256 digest of each stage's outputs, so
+        two replays of the same input can be checked for identical results.
+    """
+    digests = {name: hashlib.sha256() for name in stages}
+    seconds = dict.fromkeys(stages, 0.0)
+    n_sweeps = n_obs = 0
+    first_ts = last_ts = None
+    start = time.perf_counter()
+    for timestamp, observations in source.sweeps():
+        first_ts = first_ts or timestamp
+        last_ts = timestamp
+        n_sweeps += 1
+        n_obs += len(observations)
+        for name, stage in stages.items():
+            t = time.perf_counter()
+            output = stage(timestamp, observations)
+            seconds[name] += time.perf_counter() - t
+            digests[name].update(json.dumps(output, sort_keys=True, default=str).encode("utf-8"))
+    wall = time.perf_counter() - start
+    simulated = (last_ts - first_ts).total_seconds() if n_sweeps else 0.0
+    return {
+        "sweeps": n_sweeps,
+        "observations": n_obs,
+        "simulated_s": simulated,
+        "wall_s": wall,
+        "speedup": simulated / wall if wall > 0 else None,
+        "stage_s": seconds,
+        "digests": {name: d.hexdigest() for name, d in digests.items()},
+    }
+
+
+if __name__ == "__main__":
+    # python sweep_replay.py [speedup] [live csv or export csvs ...]
+    speedup = float(sys.argv[1]) if len(sys.argv) > 1 else 100.0
+    paths = sys.argv[2:] or [OUT]
+    from BaselineStore import BaselineStore
+
+    store = BaselineStore.open_or_create(BASELINE_DIR)
+    store.update(TRAINING_DIR)
+    reports = [run_stages(SweepReplay(paths, speedup=speedup or None),
+                          {"ratio": ratio_stage, "anomaly": anomaly_stage(store)}) for _ in range(2)]
+    for report in reports:
+        print(f"{report['sweeps']} sweeps / {report['observations']} observations: "
+              f"{report['simulated_s']:.0f}s replayed in {report['wall_s']:.2f}s")
+    same = reports[0]["digests"] == reports[1]["digests"]
+    print("✅ Deterministic" if same else "❌ Outputs differ between replays", reports[0]["digests"])
@@ -0,0 +1,38 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from live_baseline_join import LiveBaselineJoin  # noqa: E402
+from segment_registry import SegmentRegistry  # noqa: E402
+from speed_profile_cube import METRICS, PERCENTILES, WEEKDAYS, SpeedProfileCube  # noqa: E402
+
+
+def make_joiner():
+    ids = np.array([1285520201747431424, 1285520201784623104])
+    time_sets = ["8:00-9:00", "9:00-10:00"]
+    cube = np.zeros((len(ids), len(WEEKDAYS), len(time_sets), len(METRICS)), dtype=np.float32)
+    pct = [METRICS.index(p) for p in PERCENTILES]
+    cube[..., pct] = np.linspace(10, 50, len(PERCENTILES), dtype=np.float32)
+    profile = SpeedProfileCube(cube, pd.DataFrame({"segment_id": ids.astype(str)}),
+                               time_sets, METRICS, SegmentRegistry(ids))
+    return LiveBaselineJoin(profile), ids
+
+
+def test_hours_map_only_to_covering_time_sets():
+    joiner, _ = make_joiner()
+    assert joiner.hour_to_time_set[8] == 0
+    assert joiner.hour_to_time_set[9] == 1
+    assert (joiner.hour_to_time_set[[0, 3, 7, 10, 17, 23]] == -1).all()
+
+
+def test_out_of_range_hour_gives_nan_rows():
+    joiner, ids = make_joiner()
+    assert np.isnan(joiner.baselines(ids, 0, 17)).all()
+
+    joined = joiner.join(ids, [30.0, 30.0], 0, np.array([9, 3]))
+    assert np.isfinite(joined["percentile_rank"].iloc[0])
+    assert joined[["percentile_rank", "hist_median", "hist_p90"]].iloc[1].isna().all()
@@ -0,0 +1,188 @@
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import traci
+import traci.constants as tc
+
+REPORT_DIR = "calibration_reports"
+
+
+class EdgeSpeedCollector:
+    """
+    Simulated speed and flow per edge on a fixed time grid.
+
+    Edges are subscribed once, so each sample is a read of values SUMO
+    already sent with the step. Samples are accumulated per interval into
+    (n_edges, n_intervals) arrays; speeds are weighted by the vehicles on
+    the edge so empty samples do not pull them to zero.
+    """
+
+    def __init__(self, edge_ids, interval=300, horizon=86400):
+        self.edge_ids = list(edge_ids)
+        self.edge_index = {e: i for i, e in enumerate(self.edge_ids)}
+        self.interval = interval
+        n_intervals = int(np.ceil(horizon / interval))
+        shape = (len(self.edge_ids), n_intervals)
+        self.speed_x_vehicles = np.zeros(shape)
+        self.vehicles = np.zeros(shape)
+        self.flow_sum = np.zeros(shape)
+        self.samples = np.zeros(n_intervals)
+        self.lengths = np.ones(len(self.edge_ids))
+
+    def subscribe(self):
+        """Subscribe the edges; call once after traci.start()."""
+        for i, edge_id in enumerate(self.edge_ids):
+            self.lengths[i] = traci.lane.getLength(f"{edge_id}_0")
+            traci.edge.subscribe(edge_id, [tc.LAST_STEP_MEAN_SPEED, tc.LAST_STEP_VEHICLE_NUMBER])
+
+    def sample(self, sim_time):
+        results = traci.edge.getAllSubscriptionResults()
+        speed = np.array([results.get(e, {}).get(tc.LAST_STEP_MEAN_SPEED, 0.0) for e in self.edge_ids])
+        count = np.array([results.get(e, {}).get(tc.LAST_STEP_VEHICLE_NUMBER, 0) for e in self.edge_ids],
+                         dtype=float)
+        k = min(int(sim_time // self.interval), len(self.samples) - 1)
+        self.speed_x_vehicles[:, k] += speed * count
+        self.vehicles[:, k] += count
+        # q = k * v, vehicles per hour
+        self.flow_sum[:, k] += count / self.lengths * speed * 3600
+        self.samples[k] += 1
+
+    def speeds(self):
+        """(n_edges, n_intervals) mean speed in m/s; NaN where no vehicle was seen."""
+        return np.divide(self.speed_x_vehicles, self.vehicles,
+                         out=np.full(self.vehicles.shape, np.nan), where=self.vehicles > 0)
+
+    def flows(self):
+        """(n_edges, n_intervals) mean flow in veh/h; NaN for intervals never sampled."""
+        return np.divide(self.flow_sum, self.samples, out=np.full(self.flow_sum.shape, np.nan),
+                         where=self.samples > 0)
+
+
+def observation_grid(observations, edge_index, n_intervals, interval, column):
+    """
+    Average long-format observations onto the (edge, interval) grid.
+
+    Args:
+        observations: DataFrame with edge_id, time (s) and `column`
+    """
+    obs = observations[observations['edge_id'].isin(edge_index.keys())]
+    obs = obs[np.isfinite(obs[column])]
+    rows = obs['edge_id'].map(edge_index).to_numpy()
+    cols = np.minimum((obs['time'].to_numpy() // interval).astype(int), n_intervals - 1)
+    flat = rows * n_intervals + cols
+    size = len(edge_index) * n_intervals
+    total = np.bincount(flat, obs[column].to_numpy(dtype=float), minlength=size)
+    count = np.bincount(flat, minlength=size)
+    return np.divide(total, count, out=np.full(size, np.nan), where=count > 0).reshape(-1, n_intervals)
+
+
+def geh(simulated, observed):
+    """GEH statistic for hourly flows, element-wise."""
+    total = simulated + observed
+    return np.sqrt(np.divide(2 * (simulated - observed) ** 2, total,
+                             out=np.full(np.shape(total), np.nan), where=total > 0))
+
+
+def calibration_metrics(simulated, observed, axis):
+    """RMSE, MAPE (%) and count of pairs along `axis` of two aligned grids, ignoring missing cells."""
+    valid = np.isfinite(simulated) & np.isfinite(observed)
+    n = valid.sum(axis=axis)
+    err = np.where(valid, simulated - observed, 0.0)
+    ape = np.where(valid & (observed != 0), np.abs(err) / np.where(observed != 0, np.abs(observed), 1), 0.0)
+    n_ape = (valid & (observed != 0)).sum(axis=axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rmse = np.sqrt((err ** 2).sum(axis=axis) / n)
+        mape = ape.sum(axis=axis) / n_ape * 100
+    return rmse, mape, n
+
+
+def observed_grids(collector, observations):
+    """
+    (speed grid, flow grid or None) of the observations on the collector's grid.
+
+    The grids only depend on the observations and the collector's edges and
+    interval, so a run can build them once and pass them to every report.
+    """
+    n_intervals = len(collector.samples)
+    speed = observation_grid(observations, collector.edge_index, n_intervals, collector.interval, 'speed')
+    flow = None
+    if 'flow' in observations.columns:
+        flow = observation_grid(observations, collector.edge_index, n_intervals, collector.interval, 'flow')
+    return speed, flow
+
+
+class CalibrationReport:
+    """
+    Simulated-vs-observed speeds per edge and per interval.
+
+    GEH needs observed flows: it is only reported when the observations
+    carry a flow column (e.g. loop counts). TomTom exports have speeds only.
+    """
+
+    def __init__(self, collector, observations=None, grids=None):
+        """
+        Args:
+            collector: EdgeSpeedCollector after the run
+            observations: DataFrame with edge_id, time (s), speed (m/s) and optionally flow (veh/h)
+            grids: Precomputed observed_grids(collector, observations), instead of observations
+        """
+        self.collector = collector
+        self.sim_speed = collector.speeds()
+        self.obs_speed, self.obs_flow = grids if grids is not None else observed_grids(collector, observations)
+        self.sim_flow = collector.flows() if self.obs_flow is not None else None
+
+    def per_edge(self):
+        rmse, mape, n = calibration_metrics(self.sim_speed, self.obs_speed, axis=1)
+        table = pd.DataFrame({'edge_id': self.collector.edge_ids, 'speed_rmse': rmse, 'speed_mape': mape,
+                              'pairs': n})
+        if self.sim_flow is not None:
+            g = geh(self.sim_flow, self.obs_flow)
+            n_geh = np.isfinite(g).sum(axis=1)
+            table['mean_geh'] = np.divide(np.nansum(g, axis=1), n_geh, out=np.full(len(n_geh), np.nan),
+                                          where=n_geh > 0)
+        return table
+
+    def per_interval(self):
+        rmse, mape, n = calibration_metrics(self.sim_speed, self.obs_speed, axis=0)
+        table = pd.DataFrame({'interval_start': np.arange(len(rmse)) * self.collector.interval,
+                              'speed_rmse': rmse, 'speed_mape': mape, 'pairs': n})
+        if self.sim_flow is not None:
+            g = geh(self.sim_flow, self.obs_flow)
+            table['geh_below_5_%'] = (g < 5).sum(axis=0) / np.isfinite(g).sum(axis=0).clip(min=1) * 100
+        return table[table['pairs'] > 0]
+
+    def summary(self):
+        rmse, mape, n = calibration_metrics(self.sim_speed.ravel(), self.obs_speed.ravel(), axis=0)
+        summary = {'speed_rmse': float(rmse), 'speed_mape': float(mape), 'pairs': int(n)}
+        if self.sim_flow is not None:
+            g = geh(self.sim_flow, self.obs_flow)
+            g = g[np.isfinite(g)]
+            summary['geh_below_5_%'] = float((g < 5).mean() * 100) if len(g) else float('nan')
+        return summary
+
+    def write(self, run_name=None, params=None, report_dir=REPORT_DIR):
+        """Write per-edge / per-interval CSVs and a summary JSON under report_dir/run_name."""
+        run_name = run_name or datetime.now().strftime("%Y%m%d_%H%M%S")
+        out_dir = os.path.join(report_dir, run_name)
+        os.makedirs(out_dir, exist_ok=True)
+        self.per_edge().to_csv(os.path.join(out_dir, "per_edge.csv"), index=False)
+        self.per_interval().to_csv(os.path.join(out_dir, "per_interval.csv"), index=False)
+        with open(os.path.join(out_dir, "summary.json"), 'w') as f:
+            json.dump({'run': run_name, 'params': params or {}, **self.summary()}, f, indent=2)
+        return out_dir
+
+
+def compare_reports(report_dir=REPORT_DIR):
+    """One row per run found in report_dir, from each run's summary.json and its params."""
+    rows = []
+    for run in sorted(os.listdir(report_dir)):
+        path = os.path.join(report_dir, run, "summary.json")
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            params = data.pop('params', {})
+            rows.append({**data, **{f"param_{k}": v for k, v in params.items()}})
+    return pd.DataFrame(rows).sort_values('speed_rmse') if rows else pd.DataFrame()
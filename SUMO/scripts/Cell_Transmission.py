@@ -0,0 +1,345 @@
+import os
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+import sumolib
+
+SATURATION_FLOW = 1800.0  # veh/h/lane
+JAM_DENSITY = 0.14        # veh/m/lane
+WAVE_SPEED = 5.5          # m/s, backward congestion wave
+
+TOMTOM_EXPORT = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "Pravah", "pravah_900to1000_balanced.csv")
+TOMTOM_TIME_SET = "9:00-10:00"
+
+
+def read_tls_plans(xml_file, program_ids=None):
+    """
+    Fixed-time plans from the <tlLogic> elements of a net or additional file.
+
+    Returns:
+        {tls_id: {'offset': s, 'phases': [(duration_s, state), ...]}}; with
+        several programs per TLS the last one wins, as when SUMO loads them
+    """
+    plans = {}
+    for _, elem in ET.iterparse(xml_file):
+        if elem.tag == 'tlLogic':
+            if program_ids is None or elem.get('programID') in program_ids:
+                plans[elem.get('id')] = {
+                    'offset': float(elem.get('offset', 0)),
+                    'phases': [(float(p.get('duration')), p.get('state')) for p in elem.findall('phase')],
+                }
+            elem.clear()
+    return plans
+
+
+WEEKDAY_MASK = ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY']
+
+
+def matching_days(date_from, date_to, time_set_days):
+    """Days in date_from..date_to (inclusive) that fall on one of the time set's weekdays."""
+    days = {d.strip().upper() for d in str(time_set_days).split(',')}
+    weekmask = [int(name in days) for name in WEEKDAY_MASK]
+    if not any(weekmask):
+        return 0
+    end = np.datetime64(date_to, 'D') + np.timedelta64(1, 'D')
+    return int(np.busday_count(np.datetime64(date_from, 'D'), end, weekmask=weekmask))
+
+
+def time_set_hours(time_set_name):
+    """Length in hours of a time set such as '8:00-9:00'."""
+    start, end = [int(h) * 60 + int(m) for h, m in (t.split(':') for t in time_set_name.split('-'))]
+    return ((end - start) % (24 * 60) or 24 * 60) / 60
+
+
+def tomtom_mapping(export_csv, network_file, store_file=None):
+    """
+    {segment_id: {'sumo_edges': [...]}} for the segments of an export.
+
+    Reuses a MappingStore file when one exists; otherwise the export's
+    geometries are matched to the network with PathMatcher.
+    """
+    from Mapping_Store import MappingStore
+    from Path_Matcher import PathMatcher
+    from Projection import NetProjection
+
+    df = pd.read_csv(export_csv, usecols=['segment_id', 'geometry_wkt'], dtype={'segment_id': str})
+    df = df.drop_duplicates('segment_id')
+    if store_file and os.path.exists(store_file):
+        mapping, _ = MappingStore(store_file).mapping_for(df['segment_id'])
+        if mapping:
+            return mapping
+
+    geometries = {}
+    for segment_id, wkt in zip(df['segment_id'], df['geometry_wkt']):
+        points = wkt[wkt.index('(') + 1:wkt.rindex(')')].split(',')
+        geometries[segment_id] = [tuple(float(v) for v in p.split()) for p in points]
+    matcher = PathMatcher(sumolib.net.readNet(network_file), NetProjection.from_net_file(network_file))
+    return {segment_id: {'sumo_edges': match['edges']} for segment_id, match in matcher.match(geometries).items()}
+
+
+def tomtom_edge_inputs(export_csv, mapping, time_set_name, probe_share=0.05):
+    """
+    Free-flow speeds and demand per SUMO edge from a TomTom stats export.
+
+    Free flow is the p85 speed of the time set. sample_size counts probes
+    over every matching day of the export's date range, so it is divided by
+    those days and the time set's length to get probes per hour, then scaled
+    up by the assumed probe share of all traffic. A segment exported for
+    several date ranges gets the mean over them.
+
+    Args:
+        export_csv: TomTom traffic stats export (Pravah/*.csv)
+        mapping: {segment_id: {'sumo_edges': [...]}} as produced by GPSMapper / MappingStore
+        time_set_name: e.g. '8:00-9:00'
+    Returns:
+        ({edge_id: free_flow_mps}, {edge_id: demand_vph})
+    """
+    df = pd.read_csv(export_csv, dtype={'segment_id': str})
+    df = df[(df['time_set_name'] == time_set_name) & (df['p85'] > 0)].copy()
+    days = [matching_days(f, t, d) for f, t, d in zip(df['date_from'], df['date_to'], df['time_set_days'])]
+    df['vph'] = df['sample_size'] / np.maximum(days, 1) / time_set_hours(time_set_name) / probe_share
+    per_segment = df.groupby('segment_id')[['p85', 'vph']].mean()
+
+    speeds, demand = {}, {}
+    for segment_id, p85, vph in zip(per_segment.index, per_segment['p85'], per_segment['vph']):
+        entry = mapping.get(segment_id)
+        if entry is None:
+            continue
+        for edge_id in entry.get('sumo_edges', [entry.get('sumo_edge')]):
+            speeds[edge_id] = p85 / 3.6
+            demand[edge_id] = max(demand.get(edge_id, 0.0), vph)
+    return speeds, demand
+
+
+class CellTransmissionModel:
+    """
+    Macroscopic cell-transmission surrogate of the SUMO network.
+
+    Every edge is cut into cells no shorter than free-flow speed * dt, and
+    the state of the whole network is a handful of flat arrays over cells:
+    occupancy, capacity per step and jam storage. Each step computes
+    sending and receiving flows for all cells at once; edge-to-edge links
+    split an edge's sending flow by turning ratios, are gated by the signal
+    state of their TLS link and scaled down when the receiving cell cannot
+    take everything. Demand enters at boundary edges through entry queues.
+    """
+
+    def __init__(self, network_file, edges=None, dt=2.0, default_demand=300.0):
+        """
+        Args:
+            network_file: SUMO .net.xml
+            edges: Edge IDs to model; defaults to every edge passenger cars may use
+            dt: Step length in seconds
+            default_demand: Entry demand (veh/h/lane) of boundary edges without TomTom demand
+        """
+        self.dt = dt
+        self.net = sumolib.net.readNet(network_file, withPrograms=True)
+        self.default_tls_plans = {}
+        for tls in self.net.getTrafficLights():
+            for program in tls.getPrograms().values():
+                self.default_tls_plans[tls.getID()] = {
+                    'offset': float(getattr(program, '_offset', 0) or 0),
+                    'phases': [(float(p.duration), p.state) for p in program.getPhases()],
+                }
+
+        if edges is None:
+            edges = [e.getID() for e in self.net.getEdges() if e.allows('passenger')]
+        self.edge_ids = list(edges)
+        self.edge_index = {e: i for i, e in enumerate(self.edge_ids)}
+        sumo_edges = [self.net.getEdge(e) for e in self.edge_ids]
+
+        length = np.array([e.getLength() for e in sumo_edges])
+        lanes = np.array([e.getLaneNumber() for e in sumo_edges], dtype=float)
+        self.net_speed = np.array([e.getSpeed() for e in sumo_edges])
+        n_cells = np.maximum(1, np.floor(length / (self.net_speed * dt))).astype(int)
+
+        # Cell arrays; edge e owns cells first[e] .. last[e]
+        self.first = np.concatenate([[0], np.cumsum(n_cells)[:-1]])
+        self.last = self.first + n_cells - 1
+        self.cell_edge = np.repeat(np.arange(len(sumo_edges)), n_cells)
+        self.cell_length = (length / n_cells)[self.cell_edge]
+        self.cell_lanes = lanes[self.cell_edge]
+        self.capacity = SATURATION_FLOW / 3600 * dt * self.cell_lanes
+        # Very short edges would otherwise hold less than a step's worth of
+        # flow and turn into artificial bottlenecks
+        self.storage = np.maximum(JAM_DENSITY * self.cell_length * self.cell_lanes, 2 * self.capacity)
+        self.back_ratio = np.minimum(1.0, WAVE_SPEED * dt / self.cell_length)
+
+        within = np.ones(len(self.cell_edge), dtype=bool)
+        within[self.last] = False
+        self.up_internal = np.flatnonzero(within)
+        self.down_internal = self.up_internal + 1
+
+        self._build_links(sumo_edges)
+        self.set_free_flow({})
+        self.set_demand({}, default_demand)
+
+    def _build_links(self, sumo_edges):
+        """Edge-to-edge links with turning ratios and the TLS link that controls them."""
+        from_edge, to_edge, weight, tls, tl_index = [], [], [], [], []
+        for i, edge in enumerate(sumo_edges):
+            for target, connections in edge.getOutgoing().items():
+                j = self.edge_index.get(target.getID())
+                if j is None or not any(c.allows('passenger') for c in connections):
+                    continue
+                conn = connections[0]
+                from_edge.append(i)
+                to_edge.append(j)
+                # Proportional to receiving lanes; U-turns are rare
+                weight.append(target.getLaneNumber() * (0.1 if conn.getDirection() == 't' else 1.0))
+                tls.append(conn.getTLSID() or None)
+                tl_index.append(conn.getTLLinkIndex())
+
+        from_edge, to_edge, weight = np.array(from_edge), np.array(to_edge), np.array(weight, dtype=float)
+        share = weight / np.bincount(from_edge, weight, minlength=len(sumo_edges))[from_edge]
+
+        self.link_from = self.last[from_edge]
+        self.link_to = self.first[to_edge]
+        self.link_share = share
+        self.link_tls = tls
+        self.link_tl_index = np.array(tl_index)
+        self.signal_links = np.array([k for k, t in enumerate(tls) if t is not None], dtype=int)
+        self.signal_tls = sorted({t for t in tls if t is not None})
+
+        has_out = np.zeros(len(sumo_edges), dtype=bool)
+        has_out[from_edge] = True
+        has_in = np.zeros(len(sumo_edges), dtype=bool)
+        has_in[to_edge] = True
+        self.sink_cells = self.last[~has_out]
+        self.source_edges = np.flatnonzero(~has_in)
+        self.source_cells = self.first[self.source_edges]
+
+    def set_free_flow(self, edge_speeds):
+        """Override free-flow speeds (m/s) per edge, e.g. from TomTom p85 speeds."""
+        speed = self.net_speed.copy()
+        for edge_id, v in edge_speeds.items():
+            i = self.edge_index.get(edge_id)
+            if i is not None and v > 0:
+                speed[i] = v
+        self.free_speed = speed[self.cell_edge]
+        self.forward_ratio = np.minimum(1.0, self.free_speed * self.dt / self.cell_length)
+
+    def set_demand(self, edge_demand, default_demand=300.0):
+        """Entry demand in veh/h per boundary edge; others get default_demand per lane."""
+        lanes = self.cell_lanes[self.source_cells]
+        rate = default_demand * lanes
+        for k, e in enumerate(self.source_edges):
+            rate[k] = edge_demand.get(self.edge_ids[e], rate[k])
+        self.source_rate = rate / 3600 * self.dt
+
+    def green_schedule(self, plans, n_steps):
+        """(n_steps, n_signal_links) green fractions for the given plans (missing TLS keep the net's program)."""
+        green = np.ones((n_steps, len(self.signal_links)), dtype=float)
+        t = np.arange(n_steps) * self.dt
+        tls_of = np.array([self.link_tls[k] for k in self.signal_links])
+        for tl_id in self.signal_tls:
+            plan = plans.get(tl_id) or self.default_tls_plans.get(tl_id)
+            cols = np.flatnonzero(tls_of == tl_id)
+            if plan is None or not len(cols):
+                continue
+            durations = np.array([d for d, _ in plan['phases']])
+            bounds = np.cumsum(durations)
+            phase = np.searchsorted(bounds, (t - plan['offset']) % bounds[-1], side='right')
+            states = np.array([[c in 'Gg' for c in s] for _, s in plan['phases']] if plan['phases'] else [[]])
+            idx = self.link_tl_index[self.signal_links[cols]]
+            valid = idx < states.shape[1]
+            gate = np.zeros((len(bounds), len(cols)))
+            gate[:, valid] = states[:, idx[valid]]
+            green[:, cols] = gate[phase]
+        return green
+
+    def simulate(self, duration=3600.0, plans=None, warmup=0.0):
+        """
+        Run the model.
+
+        Args:
+            duration: Simulated seconds
+            plans: {tls_id: {'offset', 'phases'}} overriding the net's signal programs
+            warmup: Seconds simulated before measurement starts
+        Returns:
+            dict with vehicle-hours, vehicle-km, delay (veh-h), throughput
+            (veh), mean speed (km/h), final entry queue (veh) and wall time (s)
+        """
+        start = time.perf_counter()
+        n_steps = int(round((duration + warmup) / self.dt))
+        measure_from = int(round(warmup / self.dt))
+        green = self.green_schedule(plans or {}, n_steps)
+
+        n_cells = len(self.cell_edge)
+        occupancy = np.zeros(n_cells)
+        entry_queue = np.zeros(len(self.source_cells))
+        link_gate = np.ones(len(self.link_from))
+        link_from, link_to, share = self.link_from, self.link_to, self.link_share
+        up, down = self.up_internal, self.down_internal
+        free_time = self.cell_length / self.free_speed
+
+        vehicle_seconds = vehicle_metres = free_seconds = throughput = 0.0
+        for step in range(n_steps):
+            send = np.minimum(self.forward_ratio * occupancy, self.capacity)
+            receive = np.minimum(self.capacity, self.back_ratio * (self.storage - occupancy))
+
+            internal = np.minimum(send[up], receive[down])
+
+            link_gate[self.signal_links] = green[step]
+            wanted = send[link_from] * share * link_gate
+            demand_at = np.bincount(link_to, wanted, minlength=n_cells)
+            scale = np.divide(receive, demand_at, out=np.ones(n_cells), where=demand_at > receive)
+            link_flow = wanted * scale[link_to]
+
+            sink_flow = send[self.sink_cells]
+            entry_queue += self.source_rate
+            entering = np.minimum(entry_queue, receive[self.source_cells] - demand_at[self.source_cells] * scale[self.source_cells])
+            entering = np.maximum(entering, 0)
+            entry_queue -= entering
+
+            outflow = np.bincount(link_from, link_flow, minlength=n_cells)
+            outflow[up] += internal
+            outflow[self.sink_cells] += sink_flow
+            occupancy -= outflow
+            occupancy[down] += internal
+            occupancy += np.bincount(link_to, link_flow, minlength=n_cells)
+            occupancy[self.source_cells] += entering
+
+            if step >= measure_from:
+                vehicle_seconds += (occupancy.sum() + entry_queue.sum()) * self.dt
+                vehicle_metres += outflow @ self.cell_length
+                free_seconds += outflow @ free_time
+                throughput += sink_flow.sum()
+
+        # Final state, for inspection or to seed a follow-up run
+        self.occupancy = occupancy
+        vehicle_hours = vehicle_seconds / 3600
+        return {
+            'vehicle_hours': vehicle_hours,
+            'vehicle_km': vehicle_metres / 1000,
+            'delay_vh': max(vehicle_hours - free_seconds / 3600, 0.0),
+            'throughput': throughput,
+            'mean_speed_kmh': vehicle_metres / 1000 / vehicle_hours if vehicle_hours > 0 else 0.0,
+            'entry_queue': float(entry_queue.sum()),
+            'wall_s': time.perf_counter() - start,
+        }
+
+
+if __name__ == "__main__":
+    sumo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    network_file = os.path.join(sumo_dir, "network.net.xml")
+    ctm = CellTransmissionModel(network_file)
+    mapping = tomtom_mapping(TOMTOM_EXPORT, network_file, os.path.join(sumo_dir, "segment_mapping_store.json"))
+    free_flow, demand = tomtom_edge_inputs(TOMTOM_EXPORT, mapping, TOMTOM_TIME_SET)
+    ctm.set_free_flow(free_flow)
+    ctm.set_demand(demand)
+    fed = sum(ctm.edge_ids[e] in demand for e in ctm.source_edges)
+    print(f"TomTom {TOMTOM_TIME_SET}: {len(mapping)} segments mapped, free flow on {len(free_flow)} edges, "
+          f"demand on {fed} of {len(ctm.source_edges)} entry edges")
+    print(f"{len(ctm.edge_ids)} edges, {len(ctm.cell_edge)} cells, {len(ctm.link_from)} links, "
+          f"{len(ctm.source_cells)} entry edges")
+
+    base = ctm.simulate(3600)
+    custom = ctm.simulate(3600, read_tls_plans(os.path.join(sumo_dir, "lights.add.xml")))
+    for name, result in (("net programs", base), ("lights.add.xml", custom)):
+        print(f"{name:>15}: {result['vehicle_hours']:.0f} veh-h, delay {result['delay_vh']:.0f} veh-h, "
+              f"{result['throughput']:.0f} veh out, {result['mean_speed_kmh']:.1f} km/h, "
+              f"simulated 1 h in {result['wall_s'] * 1000:.0f} ms")
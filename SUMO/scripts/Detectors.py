@@ -0,0 +1,191 @@
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import traci
+import traci.constants as tc
+
+DETECTOR_FILE = "detectors.add.xml"
+# Relative to the detector file, next to the summary output of run.sumocfg
+OUTPUT_DIR = "config/output"
+TLS_FILES = ["lights.add.xml", "traffic_lights.add.xml"]
+
+
+def tls_ids_from_additional(additional_files):
+    """IDs of every <tlLogic> defined in the given additional files."""
+    tls_ids = []
+    for path in additional_files:
+        for _, elem in ET.iterparse(path):
+            if elem.tag == 'tlLogic' and elem.get('id') not in tls_ids:
+                tls_ids.append(elem.get('id'))
+    return tls_ids
+
+
+def controlled_approaches(network_file, tls_ids):
+    """
+    Incoming lanes of each traffic light, from the net's <connection> elements.
+
+    Returns:
+        {tls_id: [(lane_id, lane_length), ...]} in link order
+    """
+    wanted = set(tls_ids)
+    approach_lanes = {}
+    lane_length = {}
+    for _, elem in ET.iterparse(network_file):
+        if elem.tag == 'lane':
+            lane_length[elem.get('id')] = float(elem.get('length'))
+        elif elem.tag == 'connection' and elem.get('tl') in wanted and not elem.get('from').startswith(':'):
+            lane_id = f"{elem.get('from')}_{elem.get('fromLane')}"
+            lanes = approach_lanes.setdefault(elem.get('tl'), [])
+            if lane_id not in lanes:
+                lanes.append(lane_id)
+        if elem.tag in ('edge', 'connection'):
+            elem.clear()
+    return {tl_id: [(lane, lane_length[lane]) for lane in approach_lanes.get(tl_id, [])]
+            for tl_id in tls_ids}
+
+
+def generate_detectors(network_file, tls_files, out_file=DETECTOR_FILE, e1_setback=5.0, e2_length=80.0,
+                       period=60, output_dir=OUTPUT_DIR):
+    """
+    Write E1 (induction loop) and E2 (lane area) detectors for every approach
+    lane of the traffic lights defined in tls_files.
+
+    The E1 loop sits e1_setback metres before the stop line and counts flow;
+    the E2 detector covers the last e2_length metres of the lane and measures
+    the queue. Aggregated output goes to detector_output.xml and
+    detector_e2_output.xml in output_dir, which SUMO resolves relative to
+    out_file.
+
+    Returns:
+        Number of approach lanes equipped
+    """
+    approaches = controlled_approaches(network_file, tls_ids_from_additional(tls_files))
+
+    root = ET.Element('additional')
+    n_lanes = 0
+    for tl_id, lanes in approaches.items():
+        root.append(ET.Comment(f" traffic light {tl_id} "))
+        for lane_id, length in lanes:
+            e1_pos = max(length - e1_setback, 0.0)
+            e2_pos = max(length - e2_length, 0.0)
+            ET.SubElement(root, 'inductionLoop', id=f"e1_{tl_id}_{lane_id}", lane=lane_id,
+                          pos=f"{e1_pos:.2f}", period=str(period),
+                          file=f"{output_dir}/detector_output.xml")
+            ET.SubElement(root, 'laneAreaDetector', id=f"e2_{tl_id}_{lane_id}", lane=lane_id,
+                          pos=f"{e2_pos:.2f}", length=f"{length - e2_pos:.2f}", period=str(period),
+                          file=f"{output_dir}/detector_e2_output.xml")
+            n_lanes += 1
+
+    ET.indent(root, space='    ')
+    ET.ElementTree(root).write(out_file, encoding='UTF-8', xml_declaration=True)
+    print(f"Wrote {2 * n_lanes} detectors on {n_lanes} approach lanes of {len(approaches)} traffic lights "
+          f"to {out_file}")
+    return n_lanes
+
+
+class DetectorState:
+    """
+    Rolling queue, occupancy and flow per approach lane, read from the
+    detectors in a generated detector file.
+
+    Every detector is subscribed once, so the values arrive with each
+    simulation step instead of costing a TraCI round trip per lane. update()
+    copies them into (window, n_lanes) ring buffers; controllers read the
+    arrays or the per-lane / per-TLS helpers without touching TraCI.
+    """
+
+    def __init__(self, detector_file=DETECTOR_FILE, window=60):
+        self.window = window
+        self.lanes = []
+        self.e1_ids = []
+        self.e2_ids = []
+        self.tls_lanes = {}
+        for _, elem in ET.iterparse(detector_file):
+            if elem.tag == 'laneAreaDetector':
+                # IDs are e2_<tl>_<lane>; both parts may contain '_', so strip the known lane off the end
+                lane_id = elem.get('lane')
+                tl_id = elem.get('id')[len('e2_'):-len(lane_id) - 1]
+                self.tls_lanes.setdefault(tl_id, []).append(len(self.lanes))
+                self.lanes.append(lane_id)
+                self.e2_ids.append(elem.get('id'))
+                self.e1_ids.append(f"e1_{tl_id}_{lane_id}")
+        self.lane_index = {lane: i for i, lane in enumerate(self.lanes)}
+
+        n = len(self.lanes)
+        self.queue_history = np.zeros((window, n), dtype=np.float32)
+        self.occupancy_history = np.zeros((window, n), dtype=np.float32)
+        self.count_history = np.zeros((window, n), dtype=np.float32)
+        self.steps = 0
+        self.last_time = None
+        self.step_length = 1.0
+
+    def subscribe(self):
+        """Subscribe to all detectors; call once after traci.start()."""
+        self.step_length = traci.simulation.getDeltaT()
+        for det_id in self.e1_ids:
+            traci.inductionloop.subscribe(det_id, [tc.LAST_STEP_VEHICLE_DATA])
+        for det_id in self.e2_ids:
+            traci.lanearea.subscribe(det_id, [tc.JAM_LENGTH_VEHICLE, tc.LAST_STEP_OCCUPANCY])
+
+    def update(self):
+        """Record the current step; call once after every traci.simulationStep()."""
+        now = traci.simulation.getTime()
+        row = self.steps % self.window
+        e1 = traci.inductionloop.getAllSubscriptionResults()
+        e2 = traci.lanearea.getAllSubscriptionResults()
+
+        for i, (e1_id, e2_id) in enumerate(zip(self.e1_ids, self.e2_ids)):
+            area = e2.get(e2_id, {})
+            self.queue_history[row, i] = area.get(tc.JAM_LENGTH_VEHICLE, 0)
+            self.occupancy_history[row, i] = area.get(tc.LAST_STEP_OCCUPANCY, 0)
+            # Count vehicles that entered the loop since the previous update;
+            # a slow vehicle stays on the loop for several steps
+            entered = 0
+            for _, _, entry_time, _, _ in e1.get(e1_id, {}).get(tc.LAST_STEP_VEHICLE_DATA, ()):
+                if self.last_time is None or entry_time > self.last_time:
+                    entered += 1
+            self.count_history[row, i] = entered
+
+        self.last_time = now
+        self.steps += 1
+
+    def _filled(self, history):
+        return history[:min(self.steps, self.window)]
+
+    @property
+    def queue_length(self):
+        """Halting vehicles per lane in the latest step."""
+        if self.steps == 0:
+            return np.zeros(len(self.lanes), dtype=np.float32)
+        return self.queue_history[(self.steps - 1) % self.window]
+
+    @property
+    def occupancy(self):
+        """Mean occupancy (%) per lane over the window."""
+        filled = self._filled(self.occupancy_history)
+        return filled.mean(axis=0) if len(filled) else np.zeros(len(self.lanes), dtype=np.float32)
+
+    @property
+    def flow(self):
+        """Flow per lane over the window, in vehicles per hour."""
+        filled = self._filled(self.count_history)
+        seconds = max(len(filled), 1) * self.step_length
+        return filled.sum(axis=0) * 3600 / seconds
+
+    def lane_queue(self, lane_id):
+        i = self.lane_index.get(lane_id)
+        return 0 if i is None else float(self.queue_length[i])
+
+    def tls_summary(self, tl_id):
+        """{lane_id: (queue, occupancy, flow)} for the approaches of one traffic light."""
+        idx = self.tls_lanes.get(tl_id, [])
+        queue, occupancy, flow = self.queue_length, self.occupancy, self.flow
+        return {self.lanes[i]: (float(queue[i]), float(occupancy[i]), float(flow[i])) for i in idx}
+
+
+if __name__ == "__main__":
+    sumo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    generate_detectors(os.path.join(sumo_dir, "network.net.xml"),
+                       [os.path.join(sumo_dir, f) for f in TLS_FILES],
+                       os.path.join(sumo_dir, DETECTOR_FILE))
@@ -0,0 +1,166 @@
+import os
+import time
+import xml.etree.ElementTree as ET
+from multiprocessing import Pool
+
+import numpy as np
+
+from Cell_Transmission import (TOMTOM_EXPORT, TOMTOM_TIME_SET, CellTransmissionModel, read_tls_plans,
+                               tomtom_edge_inputs, tomtom_mapping)
+
+TARGET_TLS = ["838633406", "838495888", "838633634", "838495943"]
+CYCLE_RANGE = (40.0, 160.0)
+MIN_GREEN = 5.0
+
+_model = None
+
+
+def _init_worker(network_file, demand, free_flow, default_demand):
+    """Build one CTM per pool process so candidates are not pickled with the model."""
+    global _model
+    _model = CellTransmissionModel(network_file, default_demand=default_demand)
+    _model.set_free_flow(free_flow)
+    if demand:
+        _model.set_demand(demand, default_demand)
+
+
+def _evaluate(args):
+    plans, duration, warmup = args
+    result = _model.simulate(duration, plans, warmup=warmup)
+    # Vehicles still waiting to enter count as delay for the whole horizon
+    return result['delay_vh'] + result['entry_queue'] * duration / 3600 / 2
+
+
+class GreenWaveOptimizer:
+    """
+    Joint search over a common cycle length, per-junction splits and offsets
+    for the custom TLS programs in lights.add.xml.
+
+    Uses the cross-entropy method: every generation samples a population of
+    candidate plans from a Gaussian over (cycle, split logits, offsets),
+    evaluates them on the cell-transmission surrogate in a process pool, and
+    refits the Gaussian to the elite. Evaluations are independent, so a
+    generation scales with the number of workers.
+    """
+
+    def __init__(self, network_file, base_plans, tls_ids=TARGET_TLS, workers=None, duration=3600.0,
+                 warmup=600.0, demand=None, free_flow=None, default_demand=300.0, seed=0):
+        self.tls_ids = list(tls_ids)
+        self.base_plans = base_plans
+        self.n_phases = [len(base_plans[t]['phases']) for t in self.tls_ids]
+        self.duration = duration
+        self.warmup = warmup
+        self.workers = workers or os.cpu_count()
+        self.rng = np.random.default_rng(seed)
+        self.pool = Pool(self.workers, initializer=_init_worker,
+                         initargs=(network_file, demand or {}, free_flow or {}, default_demand))
+
+        # Search vector: [cycle, split logits per TLS ..., offset fraction per TLS ...]
+        self.n_params = 1 + sum(self.n_phases) + len(self.tls_ids)
+        self.mean, self.std = self.encode(base_plans)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def encode(self, plans):
+        cycle = np.mean([sum(d for d, _ in plans[t]['phases']) for t in self.tls_ids])
+        logits, offsets = [], []
+        for t in self.tls_ids:
+            durations = np.array([d for d, _ in plans[t]['phases']])
+            logits += list(np.log(durations / durations.sum()))
+            offsets.append((plans[t]['offset'] % cycle) / cycle)
+        mean = np.array([cycle] + logits + offsets)
+        std = np.concatenate([[30.0], np.full(len(logits), 0.5), np.full(len(offsets), 0.3)])
+        return mean, std
+
+    def decode(self, x):
+        """Search vector -> {tls_id: plan} with durations in whole seconds summing to the cycle."""
+        cycle = float(np.round(np.clip(x[0], *CYCLE_RANGE)))
+        plans = {}
+        pos = 1
+        for k, t in enumerate(self.tls_ids):
+            n = self.n_phases[k]
+            w = np.exp(x[pos:pos + n] - x[pos:pos + n].max())
+            pos += n
+            durations = np.maximum(MIN_GREEN, np.floor(w / w.sum() * cycle))
+            durations[np.argmax(durations)] += cycle - durations.sum()
+            states = [s for _, s in self.base_plans[t]['phases']]
+            plans[t] = {'offset': float(np.round((x[1 + sum(self.n_phases) + k] % 1.0) * cycle)),
+                        'phases': list(zip(durations.tolist(), states))}
+        return plans
+
+    def evaluate(self, candidates):
+        """Objective (delay veh-h, lower is better) for a list of plan dicts, in parallel."""
+        return np.array(self.pool.map(_evaluate, [(p, self.duration, self.warmup) for p in candidates]))
+
+    def optimize(self, generations=10, population=None, elite_frac=0.2):
+        population = population or max(16, 4 * self.workers)
+        n_elite = max(2, int(population * elite_frac))
+        best_x = self.mean.copy()
+        best_score = self.evaluate([self.decode(best_x)])[0]
+        self.history = [best_score]
+        print(f"Baseline delay: {best_score:.1f} veh-h")
+
+        for gen in range(generations):
+            start = time.perf_counter()
+            xs = self.mean + self.std * self.rng.standard_normal((population, self.n_params))
+            scores = self.evaluate([self.decode(x) for x in xs])
+            elite = xs[np.argsort(scores)[:n_elite]]
+            # Smoothed refit so the distribution does not collapse after a lucky generation
+            self.mean = 0.7 * elite.mean(axis=0) + 0.3 * self.mean
+            self.std = 0.7 * elite.std(axis=0) + 0.3 * self.std
+            if scores.min() < best_score:
+                best_score, best_x = scores.min(), xs[np.argmin(scores)].copy()
+            self.history.append(best_score)
+            print(f"  gen {gen + 1}: best {best_score:.1f} veh-h, generation mean {scores.mean():.1f} "
+                  f"({population} plans in {time.perf_counter() - start:.1f}s)")
+
+        return self.decode(best_x), best_score
+
+
+def write_plans(plans, out_file, program_id="green_wave"):
+    """Write plans as fixed-time <tlLogic> additionals, in the layout of lights.add.xml."""
+    root = ET.Element('additional')
+    for tl_id, plan in plans.items():
+        logic = ET.SubElement(root, 'tlLogic', id=tl_id, type="static", programID=program_id,
+                              offset=f"{plan['offset']:g}")
+        for duration, state in plan['phases']:
+            ET.SubElement(logic, 'phase', duration=f"{duration:g}", state=state)
+    ET.indent(root, space='    ')
+    ET.ElementTree(root).write(out_file, encoding='UTF-8', xml_declaration=True)
+
+
+def scaling_check(optimizer, n_plans=16):
+    """Wall time of one batch of evaluations with 1 worker vs the optimizer's pool."""
+    candidates = [optimizer.decode(optimizer.mean + optimizer.std * optimizer.rng.standard_normal(optimizer.n_params))
+                  for _ in range(n_plans)]
+    start = time.perf_counter()
+    optimizer.evaluate(candidates)
+    parallel = time.perf_counter() - start
+    start = time.perf_counter()
+    for p in candidates:
+        optimizer.pool.apply(_evaluate, ((p, optimizer.duration, optimizer.warmup),))
+    serial = time.perf_counter() - start
+    print(f"{n_plans} plans: {serial:.1f}s serial, {parallel:.1f}s on {optimizer.workers} workers "
+          f"({serial / parallel:.1f}x)")
+
+
+if __name__ == "__main__":
+    sumo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    network_file = os.path.join(sumo_dir, "network.net.xml")
+    base = read_tls_plans(os.path.join(sumo_dir, "lights.add.xml"))
+    mapping = tomtom_mapping(TOMTOM_EXPORT, network_file, os.path.join(sumo_dir, "segment_mapping_store.json"))
+    free_flow, demand = tomtom_edge_inputs(TOMTOM_EXPORT, mapping, TOMTOM_TIME_SET)
+    optimizer = GreenWaveOptimizer(network_file, base, demand=demand, free_flow=free_flow)
+    try:
+        scaling_check(optimizer)
+        best, score = optimizer.optimize(generations=8)
+    finally:
+        optimizer.close()
+
+    out_file = os.path.join(sumo_dir, "green_wave.add.xml")
+    write_plans(best, out_file)
+    print(f"Best delay {score:.1f} veh-h; plan written to {out_file}")
+    for tl_id, plan in best.items():
+        print(f"   {tl_id}: offset {plan['offset']:g}s, phases {[d for d, _ in plan['phases']]}")
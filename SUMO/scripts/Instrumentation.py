@@ -0,0 +1,159 @@
+import inspect
+import json
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+import traci
+
+# Upper bounds in seconds; the last bucket is +Inf
+LATENCY_BUCKETS = [1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25,
+                   0.5, 1.0, 2.5]
+TRACI_DOMAINS = ['simulation', 'vehicle', 'vehicletype', 'edge', 'lane', 'trafficlight', 'route', 'junction',
+                 'inductionloop', 'lanearea', 'person']
+
+_DISABLED = nullcontext()
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        total, out = 0, []
+        for c in self.counts:
+            total += c
+            out.append(total)
+        return out
+
+
+class Profiler:
+    """
+    Per-function TraCI call counts/latencies and per-phase loop timings.
+
+    instrument() replaces every public method of the TraCI domains (and
+    traci.simulationStep) with a timing wrapper; uninstrument() puts the
+    originals back. phase(name) times a block of the simulation loop. A
+    disabled profiler wraps nothing and phase() returns a shared no-op
+    context, so leaving the calls in the loops costs next to nothing.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.calls = {}
+        self.phases = {}
+        self._originals = []
+
+    def _wrap(self, owner, attr, label):
+        original = getattr(owner, attr)
+        histogram = self.calls.setdefault(label, Histogram())
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                histogram.observe(clock() - start)
+
+        # Domain methods live on the class; the wrapper shadows them on the instance
+        self._originals.append((owner, attr, original, attr in vars(owner)))
+        setattr(owner, attr, timed)
+
+    def instrument(self):
+        if not self.enabled or self._originals:
+            return self
+        for domain_name in TRACI_DOMAINS:
+            domain = getattr(traci, domain_name, None)
+            if domain is None:
+                continue
+            for attr in dir(domain):
+                if not attr.startswith('_') and inspect.ismethod(getattr(domain, attr)):
+                    self._wrap(domain, attr, f"{domain_name}.{attr}")
+        self._wrap(traci, 'simulationStep', 'simulationStep')
+        return self
+
+    def uninstrument(self):
+        for owner, attr, original, own_attribute in reversed(self._originals):
+            if own_attribute:
+                setattr(owner, attr, original)
+            else:
+                delattr(owner, attr)
+        self._originals = []
+
+    def phase(self, name):
+        if not self.enabled:
+            return _DISABLED
+        return self._timed_phase(name)
+
+    @contextmanager
+    def _timed_phase(self, name):
+        histogram = self.phases.get(name)
+        if histogram is None:
+            histogram = self.phases[name] = Histogram()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    def _series(self):
+        for name, h in self.calls.items():
+            if h.count:
+                yield 'traci_call_seconds', 'function', name, h
+        for name, h in self.phases.items():
+            yield 'loop_phase_seconds', 'phase', name, h
+
+    def export_prometheus(self, path):
+        """Write all histograms in the Prometheus text exposition format."""
+        lines = []
+        declared = set()
+        for metric, label, name, h in self._series():
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} histogram")
+                declared.add(metric)
+            for le, cum in zip([f"{b:g}" for b in h.buckets] + ["+Inf"], h.cumulative()):
+                lines.append(f'{metric}_bucket{{{label}="{name}",le="{le}"}} {cum}')
+            lines.append(f'{metric}_sum{{{label}="{name}"}} {h.sum:.9f}')
+            lines.append(f'{metric}_count{{{label}="{name}"}} {h.count}')
+        with open(path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+
+    def export_jsonl(self, path):
+        """Append one JSON line per histogram, tagged with the export time."""
+        now = time.time()
+        with open(path, 'a') as f:
+            for metric, label, name, h in self._series():
+                f.write(json.dumps({'ts': now, 'metric': metric, label: name, 'count': h.count, 'sum': h.sum,
+                                    'buckets': dict(zip([str(b) for b in h.buckets] + ['+Inf'], h.counts))})
+                        + "\n")
+
+    def export(self, path):
+        if not self.enabled:
+            return
+        if path.endswith('.jsonl'):
+            self.export_jsonl(path)
+        else:
+            self.export_prometheus(path)
+        print(f"📈 Profile written to {path}")
+
+    def report(self, top=10):
+        """Print loop phases and the TraCI functions with the most total time."""
+        if not self.enabled:
+            return
+        print("\n⏱  Loop phases:")
+        for name, h in sorted(self.phases.items(), key=lambda kv: -kv[1].sum):
+            print(f"   {name:<20} {h.sum:8.2f}s total, {h.count:7d} x, {h.sum / max(h.count, 1) * 1e3:8.3f} ms avg")
+        print(f"⏱  Top {top} TraCI calls by total time:")
+        busiest = sorted((kv for kv in self.calls.items() if kv[1].count), key=lambda kv: -kv[1].sum)[:top]
+        for name, h in busiest:
+            print(f"   {name:<36} {h.sum:8.2f}s total, {h.count:8d} calls, "
+                  f"{h.sum / h.count * 1e6:8.1f} µs avg")
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+
+# Bump when the mapping method changes so stores built by an older mapper are rebuilt
+STORE_VERSION = 3
+
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    """SHA-1 of a file's contents, read in chunks."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def geometry_hash(coords, precision=6):
+    """Stable hash of a segment polyline, insensitive to float noise below `precision` decimals."""
+    text = ';'.join(f"{float(x):.{precision}f},{float(y):.{precision}f}" for x, y in coords)
+    return hashlib.sha1(text.encode('ascii')).hexdigest()[:16]
+
+
+class MappingStore:
+    """
+    Persistent TomTom segment -> SUMO edge mapping.
+
+    Every entry remembers the hash of the geometry it was mapped from, and
+    the whole store is tied to a fingerprint of the network file. On a warm
+    start only segments that are new or whose geometry changed need to be
+    remapped; if network.net.xml changed, everything is invalidated.
+    """
+
+    def __init__(self, store_file="segment_mapping_store.json"):
+        self.store_file = store_file
+        self.network = {}
+        self.mapped = {}
+        self.unmapped = {}
+        if os.path.exists(store_file):
+            with open(store_file, 'r') as f:
+                data = json.load(f)
+            self.network = data.get('network', {})
+            self.mapped = data.get('mapped', {})
+            self.unmapped = data.get('unmapped', {})
+
+    def check_network(self, network_file):
+        """Invalidate the store if network_file differs from the one it was built on."""
+        st = os.stat(network_file)
+        # Size and mtime unchanged -> trust the stored fingerprint without rehashing
+        same_version = self.network.get('version') == STORE_VERSION
+        if same_version and self.network.get('size') == st.st_size and self.network.get('mtime') == st.st_mtime:
+            return True
+
+        fingerprint = file_fingerprint(network_file)
+        unchanged = same_version and self.network.get('fingerprint') == fingerprint
+        if not unchanged:
+            self.mapped = {}
+            self.unmapped = {}
+        self.network = {'fingerprint': fingerprint, 'size': st.st_size, 'mtime': st.st_mtime,
+                        'version': STORE_VERSION}
+        return unchanged
+
+    def stale_segments(self, network_file, geometries):
+        """
+        Segment IDs that must be (re)mapped.
+
+        Args:
+            network_file: Path to the SUMO network the mapping targets.
+            geometries: {segment_id: [(lon, lat), ...]} for the current TomTom data.
+        """
+        self.check_network(network_file)
+        stale = []
+        for segment_id, coords in geometries.items():
+            segment_id = str(segment_id)
+            h = geometry_hash(coords)
+            entry = self.mapped.get(segment_id)
+            if entry is not None and entry['geometry_hash'] == h:
+                continue
+            if self.unmapped.get(segment_id) == h:
+                continue
+            stale.append(segment_id)
+        return stale
+
+    def update(self, mapping, unmapped_segments, geometries):
+        """Record fresh results of GPSMapper.map_all_segments for the given geometries."""
+        # IDs are stored as str: JSON object keys are strings, and TomTom IDs read from CSV are int64
+        geometries = {str(k): v for k, v in geometries.items()}
+        for segment_id in map(str, unmapped_segments):
+            self.mapped.pop(segment_id, None)
+            if segment_id in geometries:
+                self.unmapped[segment_id] = geometry_hash(geometries[segment_id])
+        for segment_id, data in mapping.items():
+            segment_id = str(segment_id)
+            self.unmapped.pop(segment_id, None)
+            self.mapped[segment_id] = dict(data, geometry_hash=geometry_hash(geometries[segment_id]))
+
+    def mapping_for(self, segment_ids):
+        """(mapping, unmapped) restricted to the given segments, in GPSMapper's format."""
+        mapping, unmapped = {}, []
+        for segment_id in map(str, segment_ids):
+            if segment_id in self.mapped:
+                entry = dict(self.mapped[segment_id])
+                entry.pop('geometry_hash')
+                entry['coordinates'] = [tuple(c) for c in entry['coordinates']]
+                mapping[segment_id] = entry
+            else:
+                unmapped.append(segment_id)
+        return mapping, unmapped
+
+    def save(self):
+        tmp_file = self.store_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'network': self.network, 'mapped': self.mapped, 'unmapped': self.unmapped},
+                      f, default=float)
+        os.replace(tmp_file, self.store_file)
@@ -0,0 +1,46 @@
+import os
+import xml.etree.ElementTree as ET
+
+
+def net_file_from_config(config_file):
+    """Path of the net-file referenced by a .sumocfg, resolved against the config's directory."""
+    for _, elem in ET.iterparse(config_file):
+        if elem.tag == 'net-file':
+            return os.path.normpath(os.path.join(os.path.dirname(config_file), elem.get('value')))
+    raise ValueError(f"No net-file in {config_file}")
+
+
+class EdgeTlsIndex:
+    """
+    Reverse index from an incoming edge to the traffic lights and link
+    indices that control it, built once from the <connection> elements of
+    network.net.xml. Replaces scanning every TLS's controlled lanes over
+    TraCI whenever an edge needs to be matched to its signal.
+    """
+
+    def __init__(self, links):
+        # {edge_id: {tls_id: [link_index, ...]}}
+        self.links = links
+
+    @classmethod
+    def from_net_file(cls, network_file):
+        links = {}
+        for _, elem in ET.iterparse(network_file):
+            if elem.tag == 'connection' and elem.get('tl') is not None:
+                tls = links.setdefault(elem.get('from'), {}).setdefault(elem.get('tl'), [])
+                link_index = int(elem.get('linkIndex'))
+                if link_index not in tls:
+                    tls.append(link_index)
+            elem.clear()
+        return cls(links)
+
+    def lookup(self, edge_id):
+        return self.links.get(edge_id, {})
+
+    def group_by_tls(self, edge_ids):
+        """{tls_id: set(link indices)} serving any of the given edges."""
+        grouped = {}
+        for edge_id in edge_ids:
+            for tl_id, link_indices in self.links.get(edge_id, {}).items():
+                grouped.setdefault(tl_id, set()).update(link_indices)
+        return grouped
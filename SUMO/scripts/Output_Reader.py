@@ -0,0 +1,181 @@
+import os
+import sys
+import xml.etree.ElementTree as ET
+from array import array
+
+import numpy as np
+import pandas as pd
+
+SUMMARY_COLUMNS = ['time', 'loaded', 'inserted', 'running', 'waiting', 'ended', 'arrived', 'halting',
+                   'teleports', 'meanWaitingTime', 'meanTravelTime', 'meanSpeed']
+TRIPINFO_COLUMNS = ['depart', 'arrival', 'duration', 'routeLength', 'waitingTime', 'waitingCount',
+                    'timeLoss', 'departDelay']
+EDGEDATA_COLUMNS = ['sampledSeconds', 'traveltime', 'density', 'occupancy', 'waitingTime', 'speed',
+                    'entered', 'left']
+
+
+def iter_records(path, tag, parent_tag=None):
+    """
+    Stream the attributes of every <tag> element of a SUMO output file.
+
+    With parent_tag (e.g. <interval> around edgeData <edge>s) each record
+    is merged with its parent's attributes under a 'parent_' prefix.
+    Elements are cleared as soon as they are read and detached from the
+    root, so memory stays flat regardless of file size.
+    """
+    root = None
+    parent = {}
+    for event, elem in ET.iterparse(path, events=('start', 'end')):
+        if root is None:
+            root = elem
+            continue
+        if event == 'start':
+            if elem.tag == parent_tag:
+                parent = {f"parent_{k}": v for k, v in elem.attrib.items()}
+            continue
+        if elem.tag == tag:
+            yield {**parent, **elem.attrib} if parent_tag else elem.attrib
+            elem.clear()
+        elif elem.tag == parent_tag:
+            parent = {}
+            elem.clear()
+            root.clear()
+        if parent_tag is None:
+            root.clear()
+
+
+def read_table(path, tag, columns, key=None, parent_tag=None):
+    """
+    Columnar table of the numeric `columns` of every <tag> in a SUMO output.
+
+    Values go straight into typed arrays while streaming; only the
+    requested columns are kept. Missing attributes become NaN.
+
+    Args:
+        key: Optional string attribute (e.g. 'id') kept as an extra column
+    """
+    data = {c: array('d') for c in columns}
+    keys = []
+    nan = float('nan')
+    for record in iter_records(path, tag, parent_tag):
+        for c in columns:
+            value = record.get(c)
+            data[c].append(float(value) if value is not None else nan)
+        if key:
+            keys.append(record.get(key))
+
+    table = pd.DataFrame({c: np.frombuffer(v, dtype=np.float64) if len(v) else np.empty(0)
+                          for c, v in data.items()})
+    if key:
+        table.insert(0, key, keys)
+    return table
+
+
+def read_summary(path):
+    return read_table(path, 'step', SUMMARY_COLUMNS)
+
+
+def read_tripinfo(path):
+    return read_table(path, 'tripinfo', TRIPINFO_COLUMNS, key='id')
+
+
+def read_edgedata(path):
+    """edgeData rows, one per (interval, edge), with the interval's begin/end."""
+    return read_table(path, 'edge', ['parent_begin', 'parent_end'] + EDGEDATA_COLUMNS, key='id',
+                      parent_tag='interval').rename(columns={'parent_begin': 'begin', 'parent_end': 'end'})
+
+
+def interval_kpis(summary, interval=300):
+    """Per-interval running vehicles, mean speed, mean waiting time and arrivals from a summary table."""
+    if summary.empty:
+        return pd.DataFrame()
+    bins = (summary['time'] // interval * interval).astype(int)
+    grouped = summary.groupby(bins)
+    kpis = pd.DataFrame({
+        'running': grouped['running'].mean(),
+        'halting': grouped['halting'].mean(),
+        'mean_speed': grouped['meanSpeed'].mean(),
+        'mean_waiting_time': grouped['meanWaitingTime'].mean(),
+        # 'arrived' is cumulative
+        'throughput': grouped['arrived'].max().diff().fillna(grouped['arrived'].max().iloc[0]),
+    })
+    kpis.index.name = 'interval_start'
+    return kpis
+
+
+def edge_kpis(edgedata):
+    """Per-edge totals and sample-weighted mean speed over all intervals of an edgeData table."""
+    if edgedata.empty:
+        return pd.DataFrame()
+    weighted = edgedata.assign(speed_x_samples=edgedata['speed'] * edgedata['sampledSeconds'])
+    grouped = weighted.groupby('id')
+    samples = grouped['sampledSeconds'].sum()
+    return pd.DataFrame({
+        'mean_speed': grouped['speed_x_samples'].sum() / samples.where(samples > 0),
+        'waiting_time': grouped['waitingTime'].sum(),
+        'entered': grouped['entered'].sum(),
+        'left': grouped['left'].sum(),
+        'sampled_seconds': samples,
+    })
+
+
+def run_kpis(summary_file=None, tripinfo_file=None, edgedata_file=None):
+    """Flat KPI dict for one run, from whichever outputs it produced."""
+    kpis = {}
+    if summary_file and os.path.exists(summary_file):
+        summary = read_summary(summary_file)
+        running = summary['running']
+        kpis.update({
+            'sim_end': float(summary['time'].max()),
+            'arrived': float(summary['arrived'].max()),
+            'teleports': float(summary['teleports'].max()),
+            'mean_running': float(running.mean()),
+            'peak_running': float(running.max()),
+            # Weighted by vehicles on the road, so empty steps do not dilute it
+            'mean_speed': float((summary['meanSpeed'] * running).sum() / max(running.sum(), 1)),
+            'mean_waiting_time': float(summary['meanWaitingTime'].mean()),
+        })
+    if tripinfo_file and os.path.exists(tripinfo_file):
+        trips = read_tripinfo(tripinfo_file)
+        kpis.update({
+            'trips': len(trips),
+            'trip_duration': float(trips['duration'].mean()),
+            'trip_waiting_time': float(trips['waitingTime'].mean()),
+            'trip_time_loss': float(trips['timeLoss'].mean()),
+            'vehicle_km': float(trips['routeLength'].sum() / 1000),
+        })
+    if edgedata_file and os.path.exists(edgedata_file):
+        edges = edge_kpis(read_edgedata(edgedata_file))
+        kpis.update({
+            'edges_observed': int((edges['sampled_seconds'] > 0).sum()),
+            'edge_waiting_time': float(edges['waiting_time'].sum()),
+        })
+    return kpis
+
+
+def compare_runs(runs):
+    """
+    Side-by-side KPI table.
+
+    Args:
+        runs: {run_name: kpi dict from run_kpis}
+    Returns:
+        DataFrame with one row per run and a '<kpi>_change_%' column per KPI
+        relative to the first run
+    """
+    table = pd.DataFrame.from_dict(runs, orient='index')
+    base = table.iloc[0]
+    for column in list(table.columns):
+        table[f"{column}_change_%"] = (table[column] - base[column]) / abs(base[column]) * 100
+    return table
+
+
+if __name__ == "__main__":
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "output")
+    summary_file = os.path.join(output_dir, "summary.xml")
+    print(interval_kpis(read_summary(summary_file)).round(2).to_string())
+    kpis = run_kpis(summary_file, os.path.join(output_dir, "tripinfo.xml"),
+                    os.path.join(output_dir, "edgedata.xml"))
+    for name, value in kpis.items():
+        print(f"   {name}: {value:.2f}")
@@ -0,0 +1,96 @@
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+try:
+    import pyproj
+except ImportError:
+    pyproj = None
+
+EARTH_RADIUS_M = 6371000
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    """Great-circle distance in metres; all arguments broadcast as arrays of degrees."""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def equirectangular(lon1, lat1, lon2, lat2):
+    """Cheaper planar approximation of haversine, accurate at city scale."""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    x = (lon2 - lon1) * np.cos((lat1 + lat2) / 2)
+    y = lat2 - lat1
+    return EARTH_RADIUS_M * np.hypot(x, y)
+
+
+def polyline_length(lon, lat):
+    """Length in metres of one lon/lat polyline."""
+    lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+    return float(haversine(lon[:-1], lat[:-1], lon[1:], lat[1:]).sum())
+
+
+class NetProjection:
+    """
+    WGS84 <-> SUMO network coordinates, as defined by the net's <location> element.
+
+    SUMO stores x/y as projected metres (projParameter) shifted by netOffset.
+    Both directions take whole arrays and run in a single pyproj call.
+    """
+
+    def __init__(self, net_offset, proj_parameter):
+        self.offset_x, self.offset_y = net_offset
+        self.proj_parameter = proj_parameter
+
+        if proj_parameter == '!':
+            # Network is not georeferenced; coordinates are offset-only
+            self._forward = self._inverse = None
+            return
+        if pyproj is None:
+            raise ImportError("pyproj is required for georeferenced networks: pip install pyproj")
+        self._forward = pyproj.Transformer.from_crs("EPSG:4326", proj_parameter, always_xy=True)
+        self._inverse = pyproj.Transformer.from_crs(proj_parameter, "EPSG:4326", always_xy=True)
+
+    @classmethod
+    def from_net_file(cls, network_file):
+        """Read <location> from a .net.xml without parsing the rest of the network."""
+        for _, elem in ET.iterparse(network_file, events=('start',)):
+            if elem.tag == 'location':
+                offset = tuple(float(v) for v in elem.get('netOffset', '0,0').split(','))
+                return cls(offset, elem.get('projParameter', '!'))
+        raise ValueError(f"No <location> element in {network_file}")
+
+    def lonlat_to_xy(self, lon, lat):
+        lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+        if self._forward is None:
+            x, y = lon, lat
+        else:
+            x, y = self._forward.transform(lon, lat)
+        return np.asarray(x) + self.offset_x, np.asarray(y) + self.offset_y
+
+    def xy_to_lonlat(self, x, y):
+        x = np.asarray(x, dtype=float) - self.offset_x
+        y = np.asarray(y, dtype=float) - self.offset_y
+        if self._inverse is None:
+            return x, y
+        lon, lat = self._inverse.transform(x, y)
+        return np.asarray(lon), np.asarray(lat)
+
+    def project_polylines(self, polylines):
+        """
+        Project many lon/lat polylines in one pass.
+
+        Args:
+            polylines: {key: [(lon, lat), ...]}
+        Returns:
+            {key: (N, 2) array of SUMO x/y}
+        """
+        keys = [k for k, coords in polylines.items() if len(coords)]
+        if not keys:
+            return {}
+        lengths = [len(polylines[k]) for k in keys]
+        flat = np.array([c for k in keys for c in polylines[k]], dtype=float)
+        x, y = self.lonlat_to_xy(flat[:, 0], flat[:, 1])
+        xy = np.column_stack([x, y])
+        return dict(zip(keys, np.split(xy, np.cumsum(lengths)[:-1])))
@@ -0,0 +1,128 @@
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+
+import traci
+import traci.constants as tc
+
+
+def edge_free_flow(network_file):
+    """{edge_id: (length_m, max_lane_speed_mps)} for every normal edge of a .net.xml."""
+    edges = {}
+    for _, elem in ET.iterparse(network_file):
+        if elem.tag == 'edge':
+            if elem.get('function') != 'internal':
+                lanes = elem.findall('lane')
+                if lanes:
+                    edges[elem.get('id')] = (float(lanes[0].get('length')),
+                                             max(float(l.get('speed')) for l in lanes))
+            elem.clear()
+    return edges
+
+
+class TravelTimeRerouter:
+    """
+    Lets demand react to TomTom speeds.
+
+    Once per speed update, every mapped edge gets its TomTom travel time
+    (length / speed) through adaptTraveltime, which is what
+    rerouteTraveltime routes on. Only vehicles whose remaining route crosses
+    an edge slower than `slow_ratio` of free flow are queued, and the queue
+    is drained `batch_size` vehicles per step so a large update does not
+    stall a single step. Routes and route positions come from subscriptions
+    made on departure, so finding the affected vehicles costs no TraCI calls.
+    """
+
+    def __init__(self, network_file, slow_ratio=0.6, batch_size=100, min_interval=120):
+        self.free_flow = edge_free_flow(network_file)
+        self.slow_ratio = slow_ratio
+        self.batch_size = batch_size
+        self.min_interval = min_interval
+        self.slowed = frozenset()
+        self.pending = deque()
+        self.queued = set()
+        self.last_rerouted = {}
+        self.reports = []
+        self.started = False
+
+    def track_departures(self):
+        departed = list(traci.simulation.getDepartedIDList())
+        if not self.started:
+            # Vehicles already running, e.g. when resuming from a saved state
+            departed = list(traci.vehicle.getIDList())
+            self.started = True
+        for veh_id in departed:
+            traci.vehicle.subscribe(veh_id, [tc.VAR_EDGES, tc.VAR_ROUTE_INDEX])
+        for veh_id in traci.simulation.getArrivedIDList():
+            self.last_rerouted.pop(veh_id, None)
+
+    def update(self, edge_speeds, sim_time):
+        """
+        Push travel times for the given edges and queue affected vehicles.
+
+        Args:
+            edge_speeds: {edge_id: speed_mps} from the latest TomTom update
+            sim_time: Current simulation time in seconds
+        """
+        start = time.perf_counter()
+        slowed = set()
+        for edge_id, speed in edge_speeds.items():
+            if edge_id not in self.free_flow or speed <= 0:
+                continue
+            length, free_speed = self.free_flow[edge_id]
+            traci.edge.adaptTraveltime(edge_id, length / speed)
+            if speed < self.slow_ratio * free_speed:
+                slowed.add(edge_id)
+        self.slowed = frozenset(slowed)
+        efforts_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        candidates = 0
+        if self.slowed:
+            for veh_id, values in traci.vehicle.getAllSubscriptionResults().items():
+                route = values.get(tc.VAR_EDGES)
+                if route is None or veh_id in self.queued:
+                    continue
+                if sim_time - self.last_rerouted.get(veh_id, -self.min_interval) < self.min_interval:
+                    continue
+                # The current edge cannot be avoided any more
+                if not self.slowed.isdisjoint(route[values.get(tc.VAR_ROUTE_INDEX, 0) + 1:]):
+                    self.pending.append(veh_id)
+                    self.queued.add(veh_id)
+                    candidates += 1
+        select_ms = (time.perf_counter() - start) * 1000
+
+        self.reports.append({'time': sim_time, 'edges': len(edge_speeds), 'slowed': len(self.slowed),
+                             'queued': candidates, 'efforts_ms': efforts_ms, 'select_ms': select_ms,
+                             'rerouted': 0, 'reroute_ms': 0.0})
+
+    def step(self, sim_time):
+        """Track departures and reroute the next batch; call once per simulation step."""
+        self.track_departures()
+        if not self.pending:
+            return 0
+
+        start = time.perf_counter()
+        rerouted = 0
+        for _ in range(min(self.batch_size, len(self.pending))):
+            veh_id = self.pending.popleft()
+            self.queued.discard(veh_id)
+            try:
+                traci.vehicle.rerouteTraveltime(veh_id, currentTravelTimes=False)
+            except traci.exceptions.TraCIException:
+                # Vehicle left the network since it was queued
+                continue
+            self.last_rerouted[veh_id] = sim_time
+            rerouted += 1
+
+        report = self.reports[-1]
+        report['rerouted'] += rerouted
+        report['reroute_ms'] += (time.perf_counter() - start) * 1000
+        return rerouted
+
+    def print_report(self, last=1):
+        for r in self.reports[-last:]:
+            print(f"   🔀 Reroute @{r['time']}s: {r['slowed']}/{r['edges']} edges slowed, "
+                  f"{r['queued']} queued, {r['rerouted']} rerouted | "
+                  f"efforts {r['efforts_ms']:.1f} ms, select {r['select_ms']:.1f} ms, "
+                  f"reroute {r['reroute_ms']:.1f} ms")
@@ -5,22 +5,58 @@ from shapely.geometry import LineString, Point
 import pandas as pd
 from datetime import datetime
 import json
-import math
 import folium
 
+from Mapping_Store import MappingStore
+from Rerouting import TravelTimeRerouter
+from Instrumentation import Profiler
+from Projection import NetProjection, haversine, polyline_length
+from Path_Matcher import PathMatcher
+
 
 class GPSMapper:
     def __init__(self, network_file, tomtom_data_file):
 
-        self.net = sumolib.net.readNet(network_file)
-        self.edges = self.net.getEdges()
+        self.network_file = network_file
+        self._net = None
+        self._edge_shapes = None
+        self._projection = None
+        self._path_matcher = None
         
         self.tomtom_data = self.load_tomtom_data(tomtom_data_file)
         
-        self.edge_shapes = self.prepare_edge_shapes()
-        
         self.mapping = {}
         self.unmapped_segments = []
+    
+    # The network is only parsed when something actually needs edges, so a
+    # warm start from the mapping store never pays for readNet.
+    @property
+    def net(self):
+        if self._net is None:
+            self._net = sumolib.net.readNet(self.network_file)
+        return self._net
+    
+    @property
+    def projection(self):
+        if self._projection is None:
+            self._projection = NetProjection.from_net_file(self.network_file)
+        return self._projection
+    
+    @property
+    def path_matcher(self):
+        if self._path_matcher is None:
+            self._path_matcher = PathMatcher(self.net, self.projection)
+        return self._path_matcher
+    
+    @property
+    def edges(self):
+        return self.net.getEdges()
+    
+    @property
+    def edge_shapes(self):
+        if self._edge_shapes is None:
+            self._edge_shapes = self.prepare_edge_shapes()
+        return self._edge_shapes
         
     def load_tomtom_data(self, filepath):
         if filepath.endswith('.json'):
@@ -52,23 +88,21 @@ class GPSMapper:
         return edge_shapes
     
     def haversine_distance(self, coord1, coord2):
-
+        """Distance in metres between (lat, lon) pairs; also accepts arrays of them"""
         lat1, lon1 = coord1
         lat2, lon2 = coord2
-        
-        lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-        
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.asin(math.sqrt(a))
-        r = 6371000
-        return c * r
+        return haversine(lon1, lat1, lon2, lat2)
     
     def convert_sumo_to_gps(self, x, y):
-        return (y, x)
-        
-    def find_closest_edge(self, segment_coords, segment_id=""):
+        """SUMO x/y (scalars or arrays) to (lat, lon)"""
+        lon, lat = self.projection.xy_to_lonlat(x, y)
+        return (lat, lon)
+        
+    def find_closest_edge(self, segment_coords, segment_id="", max_distance=50, segment_xy=None):
+        """
+        Nearest edge to a lon/lat segment, compared in SUMO metric coordinates.
+        Pass segment_xy when the segment was already projected in a batch.
+        """
 
         best_match = None
         best_distance = float('inf')
@@ -77,10 +111,13 @@ class GPSMapper:
         if len(segment_coords) < 2:
             return None
             
-        segment_line = LineString(segment_coords)
+        if segment_xy is None:
+            lon, lat = zip(*segment_coords)
+            segment_xy = np.column_stack(self.projection.lonlat_to_xy(lon, lat))
+        segment_line = LineString(segment_xy)
         
         segment_bounds = segment_line.bounds
-        buffer_distance = 0.001
+        buffer_distance = max_distance
         
         for edge_id, edge_data in self.edge_shapes.items():
             edge_line = edge_data['linestring']
@@ -99,52 +136,85 @@ class GPSMapper:
                 best_edge_id = edge_id
                 best_match = edge_data
         
-        if best_distance < 50:
+        if best_distance < max_distance:
             return best_edge_id, best_distance
         else:
             return None, best_distance
     
-    def map_all_segments(self, max_distance=50):
-        print(f"\n🔍 Mapping {len(self.tomtom_data)} TomTom segments...")
+    def segment_coordinates(self, segment):
+        coords = []
         
+        if 'coordinates' in segment and isinstance(segment['coordinates'], list):
+            for coord in segment['coordinates']:
+                if isinstance(coord, dict):
+                    coords.append((coord['lon'], coord['lat']))
+                else:
+                    coords.append((coord[1], coord[0]))
+        
+        elif 'geometry.coordinates' in segment:
+            try:
+                coords_data = json.loads(segment['geometry.coordinates'])
+                for coord in coords_data:
+                    coords.append((coord[0], coord[1]))
+            except:
+                pass
+        
+        elif all(k in segment for k in ['start_lat', 'start_lon', 'end_lat', 'end_lon']):
+            coords = [
+                (segment['start_lon'], segment['start_lat']),
+                (segment['end_lon'], segment['end_lat'])
+            ]
+        
+        return coords
+    
+    def segment_geometries(self):
+        """{segment_id: [(lon, lat), ...]} for every TomTom segment"""
+        geometries = {}
         for idx, segment in self.tomtom_data.iterrows():
-            segment_id = segment.get('segmentId', f"segment_{idx}")
-            
-            coords = []
-            
-            if 'coordinates' in segment and isinstance(segment['coordinates'], list):
-                for coord in segment['coordinates']:
-                    if isinstance(coord, dict):
-                        coords.append((coord['lon'], coord['lat']))
-                    else:
-                        coords.append((coord[1], coord[0]))
-            
-            elif 'geometry.coordinates' in segment:
-                try:
-                    coords_data = json.loads(segment['geometry.coordinates'])
-                    for coord in coords_data:
-                        coords.append((coord[0], coord[1]))
-                except:
-                    pass
+            segment_id = str(segment.get('segmentId', f"segment_{idx}"))
+            geometries[segment_id] = self.segment_coordinates(segment)
+        return geometries
+    
+    def map_all_segments(self, max_distance=50, segment_ids=None, method='path'):
+        """
+        Map every segment, or only those in segment_ids (e.g. stale store entries).
+        method='path' maps each segment to an ordered edge path in one batch;
+        method='nearest' keeps the older single-closest-edge behaviour.
+        """
+        if segment_ids is not None:
+            segment_ids = set(segment_ids)
+        total = len(self.tomtom_data) if segment_ids is None else len(segment_ids)
+        print(f"\n🔍 Mapping {total} TomTom segments...")
+        
+        geometries = self.segment_geometries()
+        if segment_ids is not None:
+            geometries = {k: v for k, v in geometries.items() if k in segment_ids}
+        
+        if method == 'path':
+            return self.map_segment_paths(geometries, max_distance)
+        
+        projected = self.projection.project_polylines(geometries)
+        
+        for idx, segment in self.tomtom_data.iterrows():
+            segment_id = str(segment.get('segmentId', f"segment_{idx}"))
+            if segment_ids is not None and segment_id not in segment_ids:
+                continue
             
-            elif all(k in segment for k in ['start_lat', 'start_lon', 'end_lat', 'end_lon']):
-                coords = [
-                    (segment['start_lon'], segment['start_lat']),
-                    (segment['end_lon'], segment['end_lat'])
-                ]
+            coords = geometries[segment_id]
             
             if len(coords) < 2:
                 print(f"   ⚠️ Segment {segment_id}: Not enough coordinates")
                 self.unmapped_segments.append(segment_id)
                 continue
             
-            edge_id, distance = self.find_closest_edge(coords, segment_id)
+            edge_id, distance = self.find_closest_edge(coords, segment_id, max_distance,
+                                                       segment_xy=projected[segment_id])
             
             if edge_id:
                 self.mapping[segment_id] = {
                     'sumo_edge': edge_id,
                     'distance_m': distance,
-                    'segment_length': LineString(coords).length,
+                    'segment_length': polyline_length(*zip(*coords)),
                     'tomtom_speed': segment.get('currentSpeed', 50),
                     'coordinates': coords
                 }
@@ -156,10 +226,45 @@ class GPSMapper:
         print(f"\n📊 Mapping Summary:")
         print(f"   Mapped: {len(self.mapping)} segments")
         print(f"   Unmapped: {len(self.unmapped_segments)} segments")
-        print(f"   Success rate: {len(self.mapping)/len(self.tomtom_data)*100:.1f}%")
+        print(f"   Success rate: {len(self.mapping)/max(total, 1)*100:.1f}%")
+        
+        return self.mapping
+    
+    def map_segment_paths(self, geometries, max_distance=50):
+        self.path_matcher.max_distance = max_distance
+        matched = self.path_matcher.match(geometries)
+        speeds = self.segment_speeds()
+        
+        for segment_id, coords in geometries.items():
+            match = matched.get(segment_id)
+            if match is None:
+                self.unmapped_segments.append(segment_id)
+                continue
+            longest = int(np.argmax(match['lengths_m']))
+            self.mapping[segment_id] = {
+                'sumo_edge': match['edges'][longest],
+                'sumo_edges': match['edges'],
+                'edge_lengths_m': match['lengths_m'],
+                'distance_m': match['distance_m'],
+                'segment_length': polyline_length(*zip(*coords)),
+                'tomtom_speed': speeds.get(segment_id, 50),
+                'coordinates': coords
+            }
+        
+        n_edges = sum(len(m['sumo_edges']) for m in self.mapping.values())
+        print(f"\n📊 Mapping Summary:")
+        print(f"   Mapped: {len(self.mapping)} segments onto {n_edges} edge slots")
+        print(f"   Unmapped: {len(self.unmapped_segments)} segments")
+        print(f"   Success rate: {len(self.mapping)/max(len(geometries), 1)*100:.1f}%")
         
         return self.mapping
     
+    def segment_speeds(self):
+        speeds = {}
+        for idx, segment in self.tomtom_data.iterrows():
+            speeds[str(segment.get('segmentId', f"segment_{idx}"))] = segment.get('currentSpeed', 50)
+        return speeds
+    
     def visualize_mapping(self, output_file="mapping_visualization.html"):
         """Create interactive visualization of the mapping"""
         
@@ -173,12 +278,19 @@ class GPSMapper:
             print("   ⚠️ No coordinates for visualization")
             return
         
-        center_lat = all_coords[0][1]
-        center_lon = all_coords[0][0]
+        # Edge shapes are in SUMO x/y; convert them all to lat/lon in one pass
+        xy = np.array(all_coords, dtype=float)
+        lat, lon = self.convert_sumo_to_gps(xy[:, 0], xy[:, 1])
+        latlon = np.column_stack([lat, lon])
+        
+        center_lat, center_lon = latlon[0]
         m = folium.Map(location=[center_lat, center_lon], zoom_start=13)
         
+        start = 0
         for edge_id, edge_data in self.edge_shapes.items():
-            coords = [(y, x) for x, y in edge_data['shape']]
+            end = start + len(edge_data['shape'])
+            coords = latlon[start:end].tolist()
+            start = end
             folium.PolyLine(
                 coords,
                 color='blue',
@@ -198,7 +310,7 @@ class GPSMapper:
             ).add_to(m)
         
         for segment_id in self.unmapped_segments[:10]:  # Limit to first 10
-            segment = self.tomtom_data[self.tomtom_data['segmentId'] == segment_id]
+            segment = self.tomtom_data[self.tomtom_data['segmentId'].astype(str) == segment_id]
             if not segment.empty:
                 pass
         
@@ -214,6 +326,7 @@ class GPSMapper:
             mapping_list.append({
                 'tomtom_segment_id': segment_id,
                 'sumo_edge_id': data['sumo_edge'],
+                'sumo_edge_path': ' '.join(data.get('sumo_edges', [data['sumo_edge']])),
                 'distance_m': data['distance_m'],
                 'segment_length_m': data['segment_length'],
                 'tomtom_speed_kmh': data['tomtom_speed'],
@@ -232,7 +345,8 @@ class GPSMapper:
         return df
 
 class TomTomGPSSimulator:
-    def __init__(self, network_file, tomtom_file, config_file="config/run.sumocfg"):
+    def __init__(self, network_file, tomtom_file, config_file="config/run.sumocfg",
+                 mapping_store_file="segment_mapping_store.json"):
         self.network_file = network_file
         self.tomtom_file = tomtom_file
         self.config_file = config_file
@@ -243,21 +357,38 @@ class TomTomGPSSimulator:
         
         print("\n1. Creating GPS-based mapping...")
         self.mapper = GPSMapper(network_file, tomtom_file)
-        self.mapping = self.mapper.map_all_segments()
-        
-        self.mapper.save_mapping()
-        self.mapper.visualize_mapping()
+        self.mapping = self.load_or_create_mapping(mapping_store_file)
         
         self.edge_speeds = self.prepare_speed_data()
+        self.rerouter = TravelTimeRerouter(network_file)
+    
+    def load_or_create_mapping(self, mapping_store_file):
+        """Reuse stored mappings; only new/changed segments (or a changed network) are remapped"""
+        store = MappingStore(mapping_store_file)
+        geometries = self.mapper.segment_geometries()
+        stale = store.stale_segments(self.network_file, geometries)
+        
+        if stale:
+            self.mapper.map_all_segments(segment_ids=stale)
+            store.update(self.mapper.mapping, self.mapper.unmapped_segments, geometries)
+        
+        store.save()
+        self.mapper.mapping, self.mapper.unmapped_segments = store.mapping_for(geometries)
+        print(f"   Reused {len(geometries) - len(stale)} stored segment results, remapped {len(stale)}")
+        
+        if stale:
+            self.mapper.save_mapping()
+            self.mapper.visualize_mapping()
+        
+        return self.mapper.mapping
     
     def prepare_speed_data(self):
         edge_speeds = {}
         
         for segment_id, mapping in self.mapping.items():
-            edge_id = mapping['sumo_edge']
             
             segment_data = self.mapper.tomtom_data[
-                self.mapper.tomtom_data['segmentId'] == segment_id
+                self.mapper.tomtom_data['segmentId'].astype(str) == segment_id
             ]
             
             if not segment_data.empty:
@@ -266,14 +397,16 @@ class TomTomGPSSimulator:
                 
                 sim_time = self.time_to_seconds(timestamp)
                 
-                if edge_id not in edge_speeds:
-                    edge_speeds[edge_id] = []
-                
-                edge_speeds[edge_id].append({
-                    'time': sim_time,
-                    'speed_kmh': speed,
-                    'segment_id': segment_id
-                })
+                # A path-mapped segment drives every edge it spans
+                for edge_id in mapping.get('sumo_edges', [mapping['sumo_edge']]):
+                    if edge_id not in edge_speeds:
+                        edge_speeds[edge_id] = []
+                    
+                    edge_speeds[edge_id].append({
+                        'time': sim_time,
+                        'speed_kmh': speed,
+                        'segment_id': segment_id
+                    })
         
         for edge_id in edge_speeds:
             edge_speeds[edge_id].sort(key=lambda x: x['time'])
@@ -291,33 +424,58 @@ class TomTomGPSSimulator:
         except:
             return 0
     
-    def run_simulation(self):
+    def run_simulation(self, state_file=None, profiler=None, profile_file="traci_profile.prom"):
+        """
+        Run the simulation, optionally resuming from a saved state (see Snapshots.py).
+        With an Instrumentation.Profiler, TraCI calls and loop phases are timed
+        and written to profile_file (.prom or .jsonl).
+        """
         print("\n2. Starting SUMO simulation with TomTom speeds...")
+        profiler = (profiler or Profiler(enabled=False)).instrument()
         
-        traci.start(["sumo-gui", "-c", self.config_file])
-        
-        all_edges = traci.edge.getIDList()
-        
-        step = 0
-        last_update = 0
-        
-        while traci.simulation.getMinExpectedNumber() > 0 and step < 86400:  # Max 24 hours
-            traci.simulationStep()
+        try:
+            cmd = ["sumo-gui", "-c", self.config_file]
+            if state_file:
+                cmd += ["--load-state", state_file]
+            traci.start(cmd)
             
-            if step - last_update >= 30:
-                self.update_edge_speeds(step)
-                last_update = step
+            all_edges = traci.edge.getIDList()
             
-            if step % 60 == 0:
-                self.monitor_congestion(step)
+            step = int(traci.simulation.getTime())
+            last_update = step
             
-            step += 1
-        
-        traci.close()
+            while traci.simulation.getMinExpectedNumber() > 0 and step < 86400:  # Max 24 hours
+                with profiler.phase("sumo_step"):
+                    traci.simulationStep()
+                
+                if step - last_update >= 30:
+                    with profiler.phase("speed_update"):
+                        updated = self.update_edge_speeds(step)
+                        self.rerouter.update(updated, step)
+                    last_update = step
+                
+                with profiler.phase("rerouting"):
+                    self.rerouter.step(step)
+                
+                if step % 60 == 0:
+                    with profiler.phase("congestion_check"):
+                        self.monitor_congestion(step)
+                        self.rerouter.print_report()
+                
+                step += 1
+            
+        finally:
+            profiler.uninstrument()
+            if traci.isLoaded():
+                traci.close()
         print("\n✅ Simulation complete!")
+        profiler.report()
+        profiler.export(profile_file)
     
     def update_edge_speeds(self, sim_time):
+        """Blend TomTom speeds into the edges; returns {edge_id: new_speed_mps} of updated edges"""
         updates = 0
+        updated = {}
         
         for edge_id, speed_data in self.edge_speeds.items():
             closest = None
@@ -337,12 +495,15 @@ class TomTomGPSSimulator:
                     current_speed = traci.edge.getMaxSpeed(edge_id)
                     new_speed = current_speed * 0.8 + speed_mps * 0.2
                     traci.edge.setMaxSpeed(edge_id, new_speed)
+                    updated[edge_id] = new_speed
                     updates += 1
                 except:
                     pass
         
         if updates > 0:
             print(f"   Updated {updates} edges at time {sim_time}s")
+        
+        return updated
     
     def monitor_congestion(self, sim_time):
         """Monitor and log congestion"""
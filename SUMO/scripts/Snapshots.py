@@ -0,0 +1,189 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+import xml.etree.ElementTree as ET
+from multiprocessing import Pool
+
+import traci
+
+from Mapping_Store import file_fingerprint
+
+SNAPSHOT_DIR = "snapshots"
+INPUT_OPTIONS = ('net-file', 'route-files', 'additional-files')
+
+
+def config_input_files(config_file):
+    """Net, route and additional files referenced by a .sumocfg, resolved against its directory."""
+    base = os.path.dirname(config_file)
+    files = []
+    for _, elem in ET.iterparse(config_file):
+        if elem.tag in INPUT_OPTIONS:
+            files += [os.path.normpath(os.path.join(base, f.strip())) for f in elem.get('value').split(',')]
+    return files
+
+
+def repair_state(state_file):
+    """
+    Drop the empty state="" SUMO writes for actuated tlLogics without
+    detector-driven state; loading fails on it otherwise.
+
+    Seen with SUMO 1.28.0: saveState writes the attribute and --load-state
+    then stops with "Attribute 'state' in definition of tlLogic ... is empty".
+    """
+    with gzip.open(state_file, 'rt', encoding='utf-8') as f:
+        text = f.read()
+    fixed = text.replace(' state=""/>', '/>')
+    if fixed != text:
+        with gzip.open(state_file, 'wt', encoding='utf-8') as f:
+            f.write(fixed)
+
+
+def _run_fork(args):
+    cmd, run_fn, params = args
+    start = time.perf_counter()
+    traci.start(cmd)
+    load_s = time.perf_counter() - start
+    try:
+        result = run_fn(params)
+    finally:
+        traci.close()
+    return result, load_s, time.perf_counter() - start
+
+
+class ScenarioSnapshots:
+    """
+    Warmed-up simulation states for a scenario, saved with SUMO's saveState.
+
+    Snapshots are keyed by a fingerprint of the config and every input file
+    it references, so editing the network or routes invalidates them. A
+    sweep loads the same snapshot into each experiment run instead of
+    replaying the warm-up from step 0 every time.
+    """
+
+    def __init__(self, config_file, snapshot_dir=SNAPSHOT_DIR, sumo_binary="sumo", extra_args=()):
+        self.config_file = config_file
+        self.snapshot_dir = snapshot_dir
+        self.sumo_binary = sumo_binary
+        self.extra_args = list(extra_args)
+        self.meta_file = os.path.join(snapshot_dir, "snapshots.json")
+        self.meta = {}
+        if os.path.exists(self.meta_file):
+            with open(self.meta_file, 'r') as f:
+                self.meta = json.load(f)
+
+        digest = hashlib.sha1()
+        for path in [config_file] + config_input_files(config_file):
+            digest.update(file_fingerprint(path).encode('ascii'))
+        self.scenario_key = digest.hexdigest()[:12]
+
+    def sumo_cmd(self, state_file=None, binary=None):
+        cmd = [binary or self.sumo_binary, "-c", self.config_file] + self.extra_args
+        if state_file:
+            cmd += ["--load-state", state_file]
+        return cmd
+
+    def state_file(self, sim_time):
+        return os.path.join(self.snapshot_dir, f"{self.scenario_key}_{int(sim_time)}.xml.gz")
+
+    def ensure(self, times):
+        """
+        Make sure a snapshot exists for every time in `times`.
+
+        Missing ones are all written during a single warm-up run.
+
+        Returns:
+            {time: state_file}
+        """
+        files = {t: self.state_file(t) for t in times}
+        missing = sorted(t for t, path in files.items() if not os.path.exists(path))
+        if not missing:
+            return files
+
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        traci.start(self.sumo_cmd(), label="snapshot")
+        start = time.perf_counter()
+        try:
+            for t in missing:
+                traci.simulationStep(t)
+                path = files[t]
+                traci.simulation.saveState(path)
+                repair_state(path)
+                self.meta[os.path.basename(path)] = {'time': t, 'warmup_s': time.perf_counter() - start}
+                print(f"💾 Saved state at {t}s -> {path}")
+        finally:
+            traci.close()
+        self.save_meta()
+        return files
+
+    def save_meta(self):
+        with open(self.meta_file, 'w') as f:
+            json.dump(self.meta, f, indent=2)
+
+    def warmup_seconds(self, sim_time):
+        """Wall time it took to simulate from 0 to sim_time when the snapshot was made."""
+        return self.meta.get(os.path.basename(self.state_file(sim_time)), {}).get('warmup_s', 0.0)
+
+    def sweep(self, sim_time, run_fn, params_list, workers=1):
+        """
+        Fork one experiment run per entry of params_list from the snapshot at sim_time.
+
+        run_fn(params) is called with a TraCI connection already open on the
+        restored state and returns the run's result. With workers > 1, runs
+        go to a process pool (run_fn must then be a module-level function).
+        Each run writes its SUMO outputs with a "fork<i>_" prefix.
+
+        Returns:
+            (results, report) where report holds wall times and time saved
+        """
+        created = not os.path.exists(self.state_file(sim_time))
+        state_file = self.ensure([sim_time])[sim_time]
+        cmd = self.sumo_cmd(state_file)
+
+        start = time.perf_counter()
+        jobs = [(cmd + ["--output-prefix", f"fork{i}_"], run_fn, params)
+                for i, params in enumerate(params_list)]
+        if workers > 1:
+            with Pool(workers) as pool:
+                outcomes = pool.map(_run_fork, jobs)
+        else:
+            outcomes = [_run_fork(job) for job in jobs]
+        wall_s = time.perf_counter() - start
+
+        warmup_s = self.warmup_seconds(sim_time)
+        load_s = [load for _, load, _ in outcomes]
+        report = {
+            'snapshot_time': sim_time,
+            'runs': len(jobs),
+            'wall_s': wall_s,
+            'warmup_s': warmup_s,
+            'mean_load_s': sum(load_s) / max(len(load_s), 1),
+            # The warm-up is paid once (or not at all when the snapshot already existed)
+            'saved_s': warmup_s * (len(jobs) - (1 if created else 0)),
+        }
+        print(f"⏱  {report['runs']} runs from {sim_time}s in {wall_s:.1f}s; "
+              f"warm-up {warmup_s:.1f}s per run avoided, {report['saved_s']:.1f}s saved")
+        return [result for result, _, _ in outcomes], report
+
+
+def speed_factor_run(params):
+    """Example experiment: run `steps` steps with a speed factor and return the arrivals."""
+    traci.vehicletype.setSpeedFactor("DEFAULT_VEHTYPE", params['speed_factor'])
+    arrived = 0
+    for _ in range(params['steps']):
+        traci.simulationStep()
+        arrived += traci.simulation.getArrivedNumber()
+    return {'speed_factor': params['speed_factor'], 'arrived': arrived}
+
+
+if __name__ == "__main__":
+    sumo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    snapshots = ScenarioSnapshots(os.path.join(sumo_dir, "config", "run.sumocfg"),
+                                  os.path.join(sumo_dir, "config", SNAPSHOT_DIR),
+                                  extra_args=["--no-step-log", "--no-warnings"])
+    results, report = snapshots.sweep(900, speed_factor_run,
+                                      [{'speed_factor': f, 'steps': 600} for f in (0.8, 1.0, 1.2)],
+                                      workers=3)
+    for result in results:
+        print(result)
@@ -4,22 +4,48 @@ import time
 from datetime import datetime
 import numpy as np
 
+from Calibration import CalibrationReport, EdgeSpeedCollector, observed_grids
+from Instrumentation import Profiler
+from Network_Index import EdgeTlsIndex, net_file_from_config
+from Rerouting import TravelTimeRerouter
+
 class TomTomTrafficSimulator:
-    def __init__(self, tomtom_data_path, config_file="config/run.sumocfg"):
+    def __init__(self, tomtom_data_path, config_file="config/run.sumocfg", network_file=None,
+                 tls_extension=10, reroute_batch=100, speed_blend=0.3, calibration_interval=300,
+                 flow_counts_path=None):
         """
         Initialize simulator with TomTom speed data
         
         Args:
             tomtom_data_path: Path to CSV with TomTom segment speeds
             config_file: SUMO configuration file
+            network_file: SUMO network; defaults to the net-file of config_file
+            tls_extension: Seconds added to a green phase serving a congested edge
+            reroute_batch: Vehicles rerouted per step after a TomTom update
+            speed_blend: Weight of a new TomTom speed against the edge's current speed
+            calibration_interval: Seconds per bin when comparing simulated and TomTom speeds
+            flow_counts_path: Optional CSV of observed counts (edge_id, time in s, flow in veh/h);
+                GEH is only reported when given, since TomTom data has no flows
         """
         self.config_file = config_file
+        self.network_file = network_file or net_file_from_config(config_file)
+        self.tls_index = EdgeTlsIndex.from_net_file(self.network_file)
+        self.tls_extension = tls_extension
+        self.tls_extended_until = {}
+        self.speed_blend = speed_blend
+        self.calibration_interval = calibration_interval
+        self.calibration = None
+        self.rerouter = TravelTimeRerouter(self.network_file, batch_size=reroute_batch)
         self.tomtom_data = self.load_tomtom_data(tomtom_data_path)
         self.edge_speed_map = {}
         self.time_patterns = {}
         
         self.segment_to_edge = self.create_segment_mapping()
         
+        # Observations are fixed for the run; reports only redo the simulated side
+        self.observations = self.calibration_observations(flow_counts_path)
+        self.observed = None
+        
         self.stats = {
             'edge_speed_updates': 0,
             'vehicle_speed_updates': 0,
@@ -64,34 +90,76 @@ class TomTomTrafficSimulator:
         
         return example_mapping
     
-    def start_simulation(self):
-        """Start SUMO simulation with TomTom data"""
-        print("🚦 Starting SUMO simulation with TomTom data...")
-        
-        traci.start(["sumo-gui", "-c", self.config_file])
+    def start_simulation(self, state_file=None, run_name=None, profiler=None,
+                         profile_file="traci_profile.prom"):
+        """
+        Start SUMO simulation with TomTom data
         
-        self.initialize_edge_speeds()
+        Args:
+            state_file: Optional saved state (see Snapshots.py) to resume from
+                instead of replaying the warm-up from step 0
+            run_name: Name of the calibration report written at the end
+            profiler: Optional Instrumentation.Profiler; its histograms are
+                written to profile_file (.prom or .jsonl) at the end
+        """
+        print("🚦 Starting SUMO simulation with TomTom data...")
+        profiler = (profiler or Profiler(enabled=False)).instrument()
         
-        step = 0
-        while traci.simulation.getMinExpectedNumber() > 0:
-            traci.simulationStep()
-            
-            if step % 30 == 0:
-                self.update_speeds_from_tomtom(step)
+        try:
+            cmd = ["sumo-gui", "-c", self.config_file]
+            if state_file:
+                cmd += ["--load-state", state_file]
+            traci.start(cmd)
             
-            if step % 5 == 0:
-                self.apply_speeds_to_vehicles()
+            edges = sorted(set(self.segment_to_edge.values()) & set(traci.edge.getIDList()))
+            self.calibration = EdgeSpeedCollector(edges, self.calibration_interval)
+            self.calibration.subscribe()
+            self.observed = observed_grids(self.calibration, self.observations)
             
-            if step % 60 == 0:
-                self.collect_statistics(step)
+            self.initialize_edge_speeds()
             
-            self.check_for_congestion(step)
+            step = int(traci.simulation.getTime())
+            while traci.simulation.getMinExpectedNumber() > 0:
+                with profiler.phase("sumo_step"):
+                    traci.simulationStep()
+                
+                if step % 30 == 0:
+                    with profiler.phase("speed_update"):
+                        self.update_speeds_from_tomtom(step)
+                        self.rerouter.update(self.edge_speed_map, step)
+                
+                with profiler.phase("rerouting"):
+                    self.rerouter.step(step)
+                with profiler.phase("calibration"):
+                    self.calibration.sample(step)
+                
+                if step % 5 == 0:
+                    with profiler.phase("vehicle_control"):
+                        self.apply_speeds_to_vehicles()
+                
+                if step % 60 == 0:
+                    with profiler.phase("statistics"):
+                        self.collect_statistics(step)
+                        self.rerouter.print_report()
+                
+                with profiler.phase("congestion_check"):
+                    self.check_for_congestion(step)
+                
+                step += 1
             
-            step += 1
-        
-        traci.close()
+        finally:
+            profiler.uninstrument()
+            if traci.isLoaded():
+                traci.close()
         print("✅ Simulation complete!")
         self.print_statistics()
+        profiler.report()
+        profiler.export(profile_file)
+        
+        report_dir = self.calibration_report().write(run_name, {
+            'speed_blend': self.speed_blend, 'reroute_batch': self.rerouter.batch_size,
+            'tls_extension': self.tls_extension})
+        print(f"📐 Calibration report written to {report_dir}")
     
     def initialize_edge_speeds(self):
         """Initialize all edge speeds from TomTom data"""
@@ -143,7 +211,7 @@ class TomTomTrafficSimulator:
                 edge_id = self.segment_to_edge[segment_id]
                 
                 current_speed = self.edge_speed_map.get(edge_id, speed_mps)
-                new_speed = current_speed * 0.7 + speed_mps * 0.3
+                new_speed = current_speed * (1 - self.speed_blend) + speed_mps * self.speed_blend
                 
                 traci.edge.setMaxSpeed(edge_id, new_speed)
                 self.edge_speed_map[edge_id] = new_speed
@@ -174,6 +242,7 @@ class TomTomTrafficSimulator:
     
     def check_for_congestion(self, sim_time):
         critical_edges = ['edge1', 'edge2', 'edge3']
+        congested_edges = []
         
         for edge_id in critical_edges:
             if edge_id in self.edge_speed_map:
@@ -184,47 +253,63 @@ class TomTomTrafficSimulator:
                     print(f"⚠️  CONGESTION detected on {edge_id} at time {sim_time}s")
                     print(f"   Speed: {mean_speed:.1f} m/s, Vehicles: {vehicle_count}")
                     
-                    self.adapt_traffic_lights_for_congestion(edge_id)
+                    congested_edges.append(edge_id)
                     self.stats['congestion_changes'] += 1
+        
+        if congested_edges:
+            self.adapt_traffic_lights_for_congestion(congested_edges, sim_time)
     
-    def adapt_traffic_lights_for_congestion(self, congested_edge):
-
-        all_tls = traci.trafficlight.getIDList()
+    def adapt_traffic_lights_for_congestion(self, congested_edges, sim_time):
+        """
+        Extend the current phase of every TLS whose green links serve one of
+        the congested edges. Edges are resolved through the precomputed
+        edge -> (TLS, link indices) index, so only the affected signals are
+        queried, once each per step.
+        """
+        if isinstance(congested_edges, str):
+            congested_edges = [congested_edges]
         
-        for tl_id in all_tls:
-            controlled_lanes = traci.trafficlight.getControlledLanes(tl_id)
+        for tl_id, link_indices in self.tls_index.group_by_tls(congested_edges).items():
+            # Extend each phase once, not again on every congested step
+            if sim_time < self.tls_extended_until.get(tl_id, -1):
+                continue
             
-            for lane in controlled_lanes:
-                if congested_edge in lane:
-                    print(f"   Adjusting traffic light {tl_id} for congestion")
-                    
-                    current_phase = traci.trafficlight.getPhase(tl_id)
-                    remaining = traci.trafficlight.getPhaseDuration(tl_id)
-                    
-                    traci.trafficlight.setPhaseDuration(tl_id, remaining + 10)
-                    break
+            state = traci.trafficlight.getRedYellowGreenState(tl_id)
+            if not any(i < len(state) and state[i] in 'Gg' for i in link_indices):
+                continue
+            
+            print(f"   Adjusting traffic light {tl_id} for congestion")
+            remaining = traci.trafficlight.getNextSwitch(tl_id) - traci.simulation.getTime()
+            traci.trafficlight.setPhaseDuration(tl_id, remaining + self.tls_extension)
+            self.tls_extended_until[tl_id] = sim_time + remaining + self.tls_extension
+    
+    def calibration_observations(self, flow_counts_path=None):
+        """TomTom speeds per mapped edge, plus observed flows when a counts file is given"""
+        observed = self.tomtom_data[self.tomtom_data['segment_id'].isin(self.segment_to_edge.keys())]
+        observations = pd.DataFrame({
+            'edge_id': observed['segment_id'].map(self.segment_to_edge),
+            'time': observed['sim_time'],
+            'speed': observed['avg_speed_kmh'] * 0.27778,
+        })
+        if flow_counts_path:
+            counts = pd.read_csv(flow_counts_path, dtype={'edge_id': str})[['edge_id', 'time', 'flow']]
+            observations = pd.concat([observations, counts], ignore_index=True)
+        return observations
+    
+    def calibration_report(self):
+        """
+        Simulated edge speeds so far against the TomTom observations, on the calibration grid.
+        GEH is included only when observed flows were supplied (flow_counts_path).
+        """
+        return CalibrationReport(self.calibration, grids=self.observed)
     
     def collect_statistics(self, sim_time):
         print(f"\n📊 Statistics at {sim_time}s:")
         
-        total_error = 0
-        count = 0
-        
-        for edge_id, target_speed in self.edge_speed_map.items():
-            try:
-                actual_speed = traci.edge.getLastStepMeanSpeed(edge_id)
-                error = abs(actual_speed - target_speed)
-                total_error += error
-                count += 1
-                
-                if error > 5.0:
-                    print(f"   Edge {edge_id}: Target={target_speed:.1f}, Actual={actual_speed:.1f} (Δ={error:.1f})")
-            except:
-                pass
-        
-        if count > 0:
-            avg_error = total_error / count
-            print(f"   Average speed error: {avg_error:.2f} m/s")
+        summary = self.calibration_report().summary()
+        if summary['pairs'] > 0:
+            print(f"   Speed RMSE: {summary['speed_rmse']:.2f} m/s, MAPE: {summary['speed_mape']:.1f}% "
+                  f"over {summary['pairs']} edge-intervals")
     
     def print_statistics(self):
         print("\n" + "="*50)
@@ -1,9 +1,25 @@
+import os
+
 import traci
+import traci.constants as tc
+
+from Detectors import DETECTOR_FILE, DetectorState
+from Instrumentation import Profiler
+
+SUMO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 class SmartTrafficLight:
-    def __init__(self, junction_id):
+    def __init__(self, junction_id, detectors=None):
+        """
+        Args:
+            junction_id: Traffic light to control
+            detectors: Optional Detectors.DetectorState; queues are then read
+                from its subscribed E2 detectors instead of polling every lane
+        """
         self.junction_id = junction_id
+        self.detectors = detectors
         self.setup_traffic_light()
+        self.controlled_lanes = traci.trafficlight.getControlledLanes(self.junction_id)
     
     def setup_traffic_light(self):
 
@@ -34,11 +50,13 @@ class SmartTrafficLight:
     
     def get_waiting_vehicles(self):
         """Count waiting vehicles per approach"""
-        lanes = traci.trafficlight.getControlledLanes(self.junction_id)
         waiting = {}
         
-        for lane in lanes:
-            waiting_count = traci.lane.getLastStepHaltingNumber(lane)
+        for lane in self.controlled_lanes:
+            if self.detectors is not None and lane in self.detectors.lane_index:
+                waiting_count = self.detectors.lane_queue(lane)
+            else:
+                waiting_count = traci.lane.getLastStepHaltingNumber(lane)
             if "north" in lane or "N" in lane:
                 waiting["north"] = waiting.get("north", 0) + waiting_count
             elif "south" in lane or "S" in lane:
@@ -70,35 +88,181 @@ class SmartTrafficLight:
                 traci.trafficlight.setPhaseDuration(self.junction_id, remaining + 10)
                 print(f"Extended EW green at {self.junction_id}")
 
-def run_simulation():
+class EmergencyPreemption:
+    """
+    Clears the approach for emergency vehicles.
 
-    traci.start(["sumo-gui", "-c", "/home/akshit/Desktop/SUMO/config/run.sumocfg"])
+    Vehicles are classified once on departure (vClass cached per vehicle
+    type) and only emergency vehicles are subscribed, so the per-step cost
+    grows with the number of emergency vehicles, not with all traffic.
+    When one is within `lookahead` metres of its next traffic light and the
+    link it will use is not green, the TLS first runs the yellow phase that
+    follows a conflicting green, then switches to a phase that gives that
+    link green. The green is re-extended for as long as the vehicle is
+    still approaching.
+    """
     
-    junctions = traci.junction.getIDList()
-    print(f"Found junctions: {junctions[:5]}...")
+    def __init__(self, vclass="emergency", lookahead=150, min_hold=10):
+        self.vclass = vclass
+        self.lookahead = lookahead
+        self.min_hold = min_hold
+        self.type_class = {}
+        self.tracked = set()
+        self.preempted = {}
+        self.clearing = {}
+        self.program_states = {}
+        self.preemptions = 0
     
-    target_junction = junctions[0] if junctions else ""
+    def track_departures(self):
+        for veh_id in traci.simulation.getDepartedIDList():
+            type_id = traci.vehicle.getTypeID(veh_id)
+            if type_id not in self.type_class:
+                self.type_class[type_id] = traci.vehicletype.getVehicleClass(type_id)
+            if self.type_class[type_id] == self.vclass:
+                traci.vehicle.subscribe(veh_id, [tc.VAR_SPEED, tc.VAR_NEXT_TLS])
+                self.tracked.add(veh_id)
+        
+        for veh_id in traci.simulation.getArrivedIDList():
+            self.tracked.discard(veh_id)
     
-    if not target_junction:
-        print("No junctions found!")
-        return
+    def phase_states(self, tl_id):
+        """Signal state string of every phase of the running program"""
+        program = traci.trafficlight.getProgram(tl_id)
+        key = (tl_id, program)
+        if key not in self.program_states:
+            logic = next(l for l in traci.trafficlight.getAllProgramLogics(tl_id)
+                         if l.programID == program)
+            self.program_states[key] = [p.state for p in logic.phases]
+        return self.program_states[key]
     
-    smart_tl = SmartTrafficLight(target_junction)
+    def green_phase(self, tl_id, link_index):
+        """Index of the first phase of the running program that gives link_index green"""
+        states = self.phase_states(tl_id)
+        for wanted in ('G', 'g'):
+            for i, state in enumerate(states):
+                if link_index < len(state) and state[link_index] == wanted:
+                    return i
+        return None
     
-    step = 0
-    while step < 3600:
-        traci.simulationStep()
+    def clearance_phase(self, tl_id, target):
+        """
+        Yellow phase to run before switching to target, or None.
+
+        Needed when the current phase gives green to a link that target
+        stops; that is the yellow phase which follows it in the program.
+        """
+        states = self.phase_states(tl_id)
+        current = traci.trafficlight.getPhase(tl_id)
+        conflict = any(c in 'Gg' and t in 'rs' for c, t in zip(states[current], states[target]))
+        following = (current + 1) % len(states)
+        if conflict and 'y' in states[following].lower():
+            return following
+        return None
+    
+    def preempt(self, tl_id, phase, hold, veh_id, distance):
+        yellow = self.clearance_phase(tl_id, phase)
+        if yellow is None:
+            traci.trafficlight.setPhase(tl_id, phase)
+            traci.trafficlight.setPhaseDuration(tl_id, hold)
+        else:
+            traci.trafficlight.setPhase(tl_id, yellow)
+            now = traci.simulation.getTime()
+            self.clearing[tl_id] = (phase, now + traci.trafficlight.getPhaseDuration(tl_id))
+        self.preempted[tl_id] = veh_id
+        self.preemptions += 1
+        print(f"Preempted {tl_id} (phase {phase}{'' if yellow is None else f' after yellow {yellow}'}) "
+              f"for {veh_id}, {distance:.0f}m ahead")
+    
+    def step(self):
+        self.track_departures()
+        now = traci.simulation.getTime()
         
-        if step % 5 == 0:
-            smart_tl.adapt_timing()
+        # Switch to the emergency green once the clearance yellow has run
+        for tl_id, (phase, clear_at) in list(self.clearing.items()):
+            if now >= clear_at:
+                traci.trafficlight.setPhase(tl_id, phase)
+                traci.trafficlight.setPhaseDuration(tl_id, self.min_hold)
+                del self.clearing[tl_id]
         
-        for veh_id in traci.vehicle.getIDList():
-            if "emergency" in veh_id.lower() or "ambulance" in veh_id:
-                pass
+        for veh_id in self.tracked:
+            results = traci.vehicle.getSubscriptionResults(veh_id)
+            next_tls = results.get(tc.VAR_NEXT_TLS) if results else None
+            if not next_tls:
+                continue
+            
+            tl_id, link_index, distance, state = next_tls[0]
+            if distance > self.lookahead:
+                continue
+            speed = max(results.get(tc.VAR_SPEED, 0), 1.0)
+            needed = distance / speed + 5
+            
+            if self.preempted.get(tl_id) == veh_id:
+                if tl_id in self.clearing:
+                    continue
+                if state in 'Gg':
+                    # Still approaching: keep the green until it can arrive
+                    if traci.trafficlight.getNextSwitch(tl_id) - now < needed:
+                        traci.trafficlight.setPhaseDuration(tl_id, needed)
+                    continue
+                # The hold ran out before the vehicle got through; preempt again
+            elif state in 'Gg':
+                continue
+            
+            phase = self.green_phase(tl_id, link_index)
+            if phase is None:
+                continue
+            self.preempt(tl_id, phase, max(needed, self.min_hold), veh_id, distance)
         
-        step += 1
-    
-    traci.close()
+        # Release signals whose vehicle has passed or left
+        for tl_id, veh_id in list(self.preempted.items()):
+            results = traci.vehicle.getSubscriptionResults(veh_id) if veh_id in self.tracked else None
+            next_tls = results.get(tc.VAR_NEXT_TLS) if results else None
+            if not next_tls or next_tls[0][0] != tl_id:
+                del self.preempted[tl_id]
+                self.clearing.pop(tl_id, None)
+
+def run_simulation(profiler=None, profile_file="traci_profile.prom"):
+    profiler = (profiler or Profiler(enabled=False)).instrument()
+
+    try:
+        traci.start(["sumo-gui", "-c", "/home/akshit/Desktop/SUMO/config/run.sumocfg"])
+        
+        junctions = traci.junction.getIDList()
+        print(f"Found junctions: {junctions[:5]}...")
+        
+        target_junction = junctions[0] if junctions else ""
+        
+        if not target_junction:
+            print("No junctions found!")
+            return
+        
+        detectors = DetectorState(os.path.join(SUMO_DIR, DETECTOR_FILE))
+        detectors.subscribe()
+        smart_tl = SmartTrafficLight(target_junction, detectors)
+        preemption = EmergencyPreemption()
+        
+        step = 0
+        while step < 3600:
+            with profiler.phase("sumo_step"):
+                traci.simulationStep()
+            with profiler.phase("detectors"):
+                detectors.update()
+            
+            if step % 5 == 0:
+                with profiler.phase("signal_control"):
+                    smart_tl.adapt_timing()
+            
+            with profiler.phase("preemption"):
+                preemption.step()
+            
+            step += 1
+        
+    finally:
+        profiler.uninstrument()
+        if traci.isLoaded():
+            traci.close()
+    profiler.report()
+    profiler.export(profile_file)
 
 if __name__ == "__main__":
     run_simulation()
\ No newline at end of file
@@ -0,0 +1,265 @@
+"""
+Time the Pravah / SUMO hot paths on synthetic cities of several sizes.
+
+    python benchmarks/run_benchmarks.py --scales 1000 10000 100000
+
+Each run writes benchmarks/results/<commit>.json and compares it with the
+most recent earlier result file (or --baseline), flagging every case whose
+median time grew by more than --threshold. The exit code is 1 when there
+is a regression, so the script can gate a commit.
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from synthetic_city import SyntheticCity, network_geometries
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ('Pravah', 'Anomaly Detection', os.path.join('SUMO', 'scripts')):
+    sys.path.append(os.path.join(ROOT, folder))
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+NETWORK_FILE = os.path.join(ROOT, 'SUMO', 'network.net.xml')
+
+CASES = []
+
+
+def benchmark(name):
+    """
+    Register a case. The decorated setup(city, workdir) prepares its inputs
+    untimed and returns (run, items): run() is the timed call and items the
+    number of records it handles, for throughput.
+    """
+    def register(setup):
+        CASES.append((name, setup))
+        return setup
+    return register
+
+
+# ===================== CASES =====================
+
+_matcher = None
+
+
+@benchmark('segment_mapping')
+def segment_mapping(city, workdir):
+    global _matcher
+    import sumolib
+    from Path_Matcher import PathMatcher
+    from Projection import NetProjection
+
+    if _matcher is None:
+        net = sumolib.net.readNet(NETWORK_FILE)
+        _matcher = PathMatcher(net, NetProjection.from_net_file(NETWORK_FILE))
+    # The city grid lies outside the SUMO network, so segments are drawn from the network itself
+    geometries = network_geometries(_matcher.net, _matcher.projection, city.n)
+    return (lambda: _matcher.match(geometries)), len(geometries)
+
+
+@benchmark('junction_connectivity')
+def junction_connectivity(city, workdir):
+    from junction_finder import analyze_junction_flow
+
+    path = os.path.join(workdir, 'traffic_data.csv')
+    city.vertex_table().to_csv(path, index=False)
+    junction = len(city.node_lat) // 2
+    return (lambda: analyze_junction_flow(path, city.node_lat[junction], city.node_lon[junction], 100)), city.n
+
+
+@benchmark('junction_clustering')
+def junction_clustering(city, workdir):
+    from junction_clusters import JunctionIndex
+
+    ids = city.segment_ids.astype(str)
+    first, last = city.offsets[:-1], city.offsets[1:] - 1
+
+    def run():
+        JunctionIndex().add(ids, city.lat[first], city.lon[first], city.lat[last], city.lon[last])
+    return run, 2 * city.n
+
+
+@benchmark('congestion_ratios')
+def congestion_ratios(city, workdir):
+    from congestion_ratio_finder import congestion_ratio
+
+    free_flow = city.free_flow[:, None, None]
+    return (lambda: congestion_ratio(city.speeds, free_flow)), city.speeds.size
+
+
+@benchmark('anomaly_scoring')
+def anomaly_scoring(city, workdir, n_sweeps=12):
+    from AnomalyAlert import AnomalyAlert, CallbackSink
+    from BaselineStore import BaselineStore, COUNT, DAYS, FIELDS, HOURS, M2, MEAN
+
+    store = BaselineStore(os.path.join(workdir, 'baselines'))
+    store.segment_ids = [str(s) for s in city.segment_ids]
+    store.segment_index = {seg: i for i, seg in enumerate(store.segment_ids)}
+    store.array = np.zeros((city.n, len(DAYS), HOURS, len(FIELDS)))
+    days = min(city.speeds.shape[1], len(DAYS))
+    count = city.sample_size[:, :days].astype(float) + 1
+    store.array[:, :days, :, COUNT] = count
+    store.array[:, :days, :, MEAN] = city.speeds[:, :days]
+    store.array[:, :days, :, M2] = count * (0.12 * city.speeds[:, :days]) ** 2
+    store._thresholds()
+
+    alerts = []
+    detector = AnomalyAlert(store, CallbackSink(alerts.extend))
+    start = datetime(2024, 8, 5, 8, 0)  # a Monday
+    sweeps = [(start.replace(minute=5 * k), city.live_sweep(0, 8)) for k in range(n_sweeps)]
+
+    def run():
+        for timestamp, speeds in sweeps:
+            detector.process_sweep(store.segment_ids, speeds, timestamp)
+    return run, city.n * n_sweeps
+
+
+@benchmark('seed_extraction')
+def seed_extraction(city, workdir):
+    from extract_pravah_seed_points import extract_seed_points
+
+    export = os.path.join(workdir, 'export.csv')
+    city.export_frame(day=0, hours=(8, 9, 17, 18)).to_csv(export, index=False)
+    out = os.path.join(workdir, 'seed_points.csv')
+    return (lambda: extract_seed_points(export, out)), city.n * 4
+
+
+@benchmark('data_js_export')
+def data_js_export(city, workdir):
+    from map_related_file_generator import build_segments, write_data_js
+
+    seeds = city.seed_points()
+    traffic = city.export_frame(day=0, hours=(9,))[['segment_id', 'p50', 'p90']]
+    out = os.path.join(workdir, 'data.js')
+
+    def run():
+        write_data_js(build_segments(seeds.copy(), traffic.copy()), out)
+    return run, city.n
+
+
+# ===================== RUNNER =====================
+
+def git_commit():
+    try:
+        sha = subprocess.run(['git', 'rev-parse', '--short=10', 'HEAD'], cwd=ROOT, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{sha}-dirty" if dirty else sha
+
+
+def time_case(setup, city, workdir, repeats):
+    """Seconds per repeat of one case, with the cases' own printing suppressed."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        run, items = setup(city, workdir)
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+    return times, items
+
+
+def run_benchmarks(scales, cases=None, repeats=3, days=7, seed=0):
+    results = []
+    for scale in scales:
+        start = time.perf_counter()
+        city = SyntheticCity(scale, days=days, seed=seed)
+        print(f"\n🏙  {scale} segments, {days} days (generated in {time.perf_counter() - start:.2f}s)")
+        for name, setup in CASES:
+            if cases and name not in cases:
+                continue
+            row = {'case': name, 'scale': scale}
+            with tempfile.TemporaryDirectory() as workdir:
+                try:
+                    times, items = time_case(setup, city, workdir, repeats)
+                except ImportError as e:
+                    row['skipped'] = str(e)
+                    print(f"   {name:<24} skipped ({e})")
+                    results.append(row)
+                    continue
+            median = float(np.median(times))
+            row.update({'items': items, 'first_s': times[0], 'min_s': min(times), 'median_s': median,
+                        'items_per_s': items / median if median > 0 else None})
+            results.append(row)
+            print(f"   {name:<24} {median * 1e3:10.1f} ms median  {min(times) * 1e3:10.1f} ms min  "
+                  f"{items / median:14,.0f} items/s")
+    return results
+
+
+def previous_results(exclude):
+    paths = [p for p in glob.glob(os.path.join(RESULTS_DIR, '*.json')) if os.path.abspath(p) != exclude]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def compare(current, baseline, threshold=1.25):
+    """(case, scale, baseline_s, current_s, ratio) for every case slower than threshold x baseline."""
+    base = {(r['case'], r['scale']): r['median_s'] for r in baseline['results'] if 'median_s' in r}
+    regressions = []
+    for r in current['results']:
+        before = base.get((r['case'], r['scale']))
+        if before and 'median_s' in r and r['median_s'] > threshold * before:
+            regressions.append((r['case'], r['scale'], before, r['median_s'], r['median_s'] / before))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--cases', nargs='+', choices=[name for name, _ in CASES])
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', help="Result file to compare against (default: the latest one)")
+    parser.add_argument('--threshold', type=float, default=1.25)
+    parser.add_argument('--out', help="Result file (default: results/<commit>.json)")
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'params': {'scales': args.scales, 'repeats': args.repeats, 'days': args.days, 'seed': args.seed},
+        'results': run_benchmarks(args.scales, args.cases, args.repeats, args.days, args.seed),
+    }
+
+    out = os.path.abspath(args.out or os.path.join(RESULTS_DIR, f"{commit}.json"))
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📁 Results written to {out}")
+
+    baseline_file = args.baseline or previous_results(exclude=out)
+    if not baseline_file:
+        return 0
+    with open(baseline_file, 'r') as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.threshold)
+    print(f"Compared with {os.path.basename(baseline_file)} ({baseline.get('commit')})")
+    for case, scale, before, after, ratio in regressions:
+        print(f"   ⚠️  {case} @ {scale}: {before * 1e3:.1f} ms -> {after * 1e3:.1f} ms ({ratio:.2f}x)")
+    if not regressions:
+        print(f"   ✅ No case slower than {args.threshold:.2f}x")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+
+CENTER = (77.2090, 28.6139)  # lon, lat (New Delhi)
+METRES_PER_DEG_LAT = 111320.0
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+PERCENTILES = [5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75, 80, 85, 90, 95]
+# Standard normal quantiles of PERCENTILES
+Z_SCORES = np.array([-1.645, -1.282, -1.036, -0.842, -0.674, -0.524, -0.385, -0.253, -0.126, 0.0,
+                     0.126, 0.253, 0.385, 0.524, 0.674, 0.842, 1.036, 1.282, 1.645])
+EXPORT_COLUMNS = ['day', 'job_name', 'creation_time', 'distance_unit', 'included_speed_limits', 'network_name',
+                  'zone_id', 'probe_source', 'map_version', 'date_range_id', 'date_range_name', 'date_from',
+                  'date_to', 'time_set_id', 'time_set_name', 'time_set_days', 'time_set_times', 'segment_id',
+                  'new_segment_id', 'street_name', 'frc', 'speed_limit', 'distance_m', 'geometry_wkt',
+                  'harmonic_avg_speed', 'average_speed', 'median_speed', 'speed_stddev', 'sample_size',
+                  'normalized_sample_size', 'average_travel_time', 'median_travel_time', 'travel_time_stddev',
+                  'travel_time_ratio'] + [f"p{p}" for p in PERCENTILES]
+
+
+class SyntheticCity:
+    """
+    Reproducible street network and traffic in the shape of the Pravah exports.
+
+    Streets are the directed links of a rotated, jittered grid, each drawn as
+    a gently bowed polyline of 2-6 vertices, with every fifth row/column an
+    arterial. Traffic is an hourly speed cube (segment, weekday, hour) with a
+    morning and evening dip per segment, softer weekends and log-normal
+    noise. Everything is generated with array operations from one seed, so
+    100k segments over a week take a few seconds.
+    """
+
+    def __init__(self, n_segments, days=7, seed=0, center=CENTER, block_m=150.0, max_vertices=6):
+        self.n = n_segments
+        self.rng = np.random.default_rng(seed)
+        self.center = center
+        self._build_geometry(block_m, max_vertices)
+        self._build_speeds(days)
+
+    # ---------------- geometry ----------------
+
+    def _build_geometry(self, block_m, max_vertices):
+        rng = self.rng
+        # A g x g grid has 4 * g * (g - 1) directed links
+        g = int(np.ceil((1 + np.sqrt(1 + self.n)) / 2))
+        gx, gy = np.meshgrid(np.arange(g), np.arange(g), indexing='ij')
+        node_xy = np.column_stack([gx.ravel(), gy.ravel()]) * block_m
+        node_xy += rng.normal(0, 0.1 * block_m, node_xy.shape)
+        angle = rng.uniform(0, np.pi / 2)
+        rot = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+        node_xy = (node_xy - node_xy.mean(axis=0)) @ rot.T
+
+        node = np.arange(g * g).reshape(g, g)
+        horizontal = np.column_stack([node[:-1, :].ravel(), node[1:, :].ravel()])
+        vertical = np.column_stack([node[:, :-1].ravel(), node[:, 1:].ravel()])
+        links = np.concatenate([horizontal, vertical])
+        links = np.concatenate([links, links[:, ::-1]])
+        # Arterials: links running along every fifth grid line
+        line = np.concatenate([gy[:-1, :].ravel(), gx[:, :-1].ravel()])
+        line = np.concatenate([line, line])
+        keep = np.sort(rng.permutation(len(links))[:self.n])
+        links, arterial = links[keep], line[keep] % 5 == 0
+
+        # Interior vertices bowed off the straight link
+        n_vertices = rng.integers(2, max_vertices + 1, self.n)
+        self.offsets = np.concatenate([[0], np.cumsum(n_vertices)])
+        owner = np.repeat(np.arange(self.n), n_vertices)
+        t = (np.arange(len(owner)) - self.offsets[owner]) / (n_vertices[owner] - 1)
+        a, b = node_xy[links[owner, 0]], node_xy[links[owner, 1]]
+        direction = b - a
+        normal = np.column_stack([-direction[:, 1], direction[:, 0]]) / np.hypot(*direction.T)[:, None]
+        bow = rng.normal(0, 0.04 * block_m, self.n)[owner] * np.sin(np.pi * t)
+        xy = a + direction * t[:, None] + normal * bow[:, None]
+
+        lon0, lat0 = self.center
+        self.lat = lat0 + xy[:, 1] / METRES_PER_DEG_LAT
+        self.lon = lon0 + xy[:, 0] / (METRES_PER_DEG_LAT * np.cos(np.radians(lat0)))
+        self.node_lat = lat0 + node_xy[:, 1] / METRES_PER_DEG_LAT
+        self.node_lon = lon0 + node_xy[:, 0] / (METRES_PER_DEG_LAT * np.cos(np.radians(lat0)))
+
+        piece = np.hypot(*np.diff(xy, axis=0).T)
+        piece[self.offsets[1:-1] - 1] = 0  # pieces that would join two segments
+        self.distance_m = np.add.reduceat(np.append(piece, 0), self.offsets[:-1])
+
+        # TomTom-like 64-bit ids, unique and increasing
+        self.segment_ids = 1285520201700000000 + np.arange(self.n, dtype=np.int64) * 4096 \
+            + rng.integers(0, 4096, self.n)
+        self.frc = np.where(arterial, 2, rng.choice([4, 5, 6], self.n, p=[0.3, 0.5, 0.2]))
+        self.speed_limit = np.select([self.frc <= 2, self.frc == 4], [60, 40], 30)
+        self.street_name = np.where(arterial, np.char.add('Arterial Road ', (line[keep] // 5).astype(str)), '')
+
+    def geometries(self, ids=None):
+        """{segment_id: [(lon, lat), ...]} for all segments (or the given positions)."""
+        idx = range(self.n) if ids is None else ids
+        lonlat = list(zip(self.lon.tolist(), self.lat.tolist()))
+        return {int(self.segment_ids[i]): lonlat[self.offsets[i]:self.offsets[i + 1]]
+                for i in idx}
+
+    def wkt(self):
+        text = np.char.add(np.char.add(np.round(self.lon, 5).astype(str), ' '), np.round(self.lat, 5).astype(str))
+        return ["LINESTRING(" + ",".join(text[self.offsets[i]:self.offsets[i + 1]]) + ")" for i in range(self.n)]
+
+    def vertex_table(self):
+        """Every vertex as a (segment_id, lat, lon) row, in drawing order."""
+        return pd.DataFrame({'segment_id': np.repeat(self.segment_ids, np.diff(self.offsets)),
+                             'lat': self.lat, 'lon': self.lon})
+
+    def seed_points(self):
+        """Middle vertex of every segment, like extract_pravah_seed_points."""
+        mid = self.offsets[:-1] + np.diff(self.offsets) // 2
+        return pd.DataFrame({'segment_id': self.segment_ids, 'lat': self.lat[mid], 'lon': self.lon[mid]})
+
+    # ---------------- traffic ----------------
+
+    def _build_speeds(self, days):
+        rng = self.rng
+        self.free_flow = self.speed_limit * rng.uniform(0.75, 0.95, self.n)
+        hours = np.arange(24)
+        weekday = np.arange(days) % 7 < 5
+        arterial = (self.frc <= 2)[:, None]
+        morning = rng.uniform(0.1, 0.35, (self.n, 1)) + 0.15 * arterial
+        evening = rng.uniform(0.15, 0.4, (self.n, 1)) + 0.15 * arterial
+        peak_m = rng.normal(9.0, 0.5, (self.n, 1))
+        peak_e = rng.normal(18.5, 0.7, (self.n, 1))
+        dip = (morning * np.exp(-(hours - peak_m) ** 2 / 2.0)
+               + evening * np.exp(-(hours - peak_e) ** 2 / 3.0))
+        scale = np.where(weekday, 1.0, 0.5)[None, :, None]
+        profile = 1 - np.minimum(dip[:, None, :] * scale, 0.85)
+        noise = rng.lognormal(0, 0.08, (self.n, days, 24))
+        # (segment, day, hour) mean speed in km/h
+        self.speeds = (self.free_flow[:, None, None] * profile * noise).astype(np.float32)
+        demand = (1.2 - profile) * np.where(arterial, 600, 150)[:, :, None]
+        self.sample_size = rng.poisson(demand * np.where(weekday, 1.0, 0.7)[None, :, None]).astype(np.int32)
+
+    def live_sweep(self, day, hour, incident_share=0.01):
+        """Current speeds for one sweep, with a share of segments in a sharp slowdown."""
+        speeds = self.speeds[:, day, hour] * self.rng.lognormal(0, 0.05, self.n)
+        hit = self.rng.random(self.n) < incident_share
+        speeds[hit] *= 0.25
+        return speeds
+
+    def export_frame(self, day=0, hours=(9,)):
+        """Rows in the Pravah export schema for one weekday and the given hourly time sets."""
+        n_rows = self.n * len(hours)
+        seg = np.tile(np.arange(self.n), len(hours))
+        hour = np.repeat(np.asarray(hours), self.n)
+        mean = self.speeds[seg, day, hour].astype(float)
+        std = np.maximum(0.15 * mean, 1.0)
+        pct = np.clip(mean[:, None] + Z_SCORES[None, :] * std[:, None], 1, None).round()
+        travel_time = self.distance_m[seg] / (mean / 3.6)
+        free_time = self.distance_m[seg] / (self.free_flow[seg] / 3.6)
+        day_name = DAYS[day % 7]
+        time_sets = np.array([f"{h}:00-{h + 1}:00" for h in range(24)])
+        wkt = np.array(self.wkt(), dtype=object)
+
+        frame = pd.DataFrame({
+            'day': day_name, 'job_name': day_name, 'creation_time': '2026-01-13T00:00:00Z',
+            'distance_unit': 'KILOMETERS', 'included_speed_limits': 'ALL', 'network_name': 'synthetic',
+            'zone_id': 'Asia/Kolkata', 'probe_source': 'ALL', 'map_version': 'synthetic',
+            'date_range_id': 1, 'date_range_name': day_name, 'date_from': '2024-08-01', 'date_to': '2024-08-11',
+            'time_set_id': hour, 'time_set_name': time_sets[hour], 'time_set_days': day_name.upper(),
+            'time_set_times': time_sets[hour], 'segment_id': self.segment_ids[seg],
+            'new_segment_id': self.segment_ids[seg], 'street_name': self.street_name[seg],
+            'frc': self.frc[seg], 'speed_limit': self.speed_limit[seg],
+            'distance_m': self.distance_m[seg].round(2), 'geometry_wkt': wkt[seg],
+            'harmonic_avg_speed': (mean * 0.9).round(1), 'average_speed': mean.round(1),
+            'median_speed': pct[:, PERCENTILES.index(50)], 'speed_stddev': std.round(1),
+            'sample_size': self.sample_size[seg, day, hour], 'normalized_sample_size': 1.0,
+            'average_travel_time': travel_time.round(2), 'median_travel_time': travel_time.round(2),
+            'travel_time_stddev': (travel_time * 0.15).round(2),
+            'travel_time_ratio': (travel_time / free_time).round(2),
+        }, index=np.arange(n_rows))
+        for k, p in enumerate(PERCENTILES):
+            frame[f"p{p}"] = pct[:, k]
+        return frame[EXPORT_COLUMNS]
+
+
+def network_geometries(net, projection, n_segments, seed=0, max_edges=4, jitter_m=3.0):
+    """
+    TomTom-like segments drawn from a SUMO network, for benchmarking the matcher.
+
+    Each segment follows a random chain of up to max_edges connected edges,
+    converted to lon/lat with a few metres of GPS-style noise.
+    """
+    rng = np.random.default_rng(seed)
+    edges = [e for e in net.getEdges() if e.getFunction() != 'internal' and len(e.getShape()) >= 2]
+    geometries = {}
+    for k, start in enumerate(rng.integers(0, len(edges), n_segments)):
+        edge = edges[start]
+        shape = list(edge.getShape())
+        for _ in range(rng.integers(0, max_edges)):
+            outgoing = [e for e in edge.getOutgoing() if e.getFunction() != 'internal']
+            if not outgoing:
+                break
+            edge = outgoing[rng.integers(0, len(outgoing))]
+            shape += list(edge.getShape())[1:]
+        xy = np.asarray(shape, dtype=float) + rng.normal(0, jitter_m, (len(shape), 2))
+        lon, lat = projection.xy_to_lonlat(xy[:, 0], xy[:, 1])
+        geometries[f"synthetic_{k}"] = list(zip(lon.tolist(), lat.tolist()))
+    return geometries